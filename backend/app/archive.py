@@ -0,0 +1,213 @@
+"""
+Cold storage for completed debates
+Archiving a completed room packs its participants, turns, spectator votes
+and results into one document (collection: archives, compressed and chunked
+by the storage layer), deletes the individual documents and marks the room
+document with archived_at, leaving it as a stub for listings. The hot
+keyspace then grows with active debates, not with history.
+
+Reads go through room_documents(), room_result(), speaker_turns() and
+user_participations(): archived rooms are served from their archive (loaded
+once into archive_cache), other rooms from their collections.
+
+Run with:
+    python -m app.archive [--older-than-hours 24] [--limit 100] [--room ROOM_ID]
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Any, AsyncIterator
+from app.replit_db import DB, AsyncDB, Collections
+from app.query import Sort, run_query
+from app.models import DebateStatus
+from app.cache import archive_cache
+from app.write_buffer import write_buffer
+
+# Child collections packed into a room's archive (documents found by room_id)
+ARCHIVED_COLLECTIONS = (
+    Collections.PARTICIPANTS,
+    Collections.TURNS,
+    Collections.SPECTATOR_VOTES,
+    Collections.RESULTS,
+)
+
+# How often the background archiver looks for completed rooms
+ARCHIVE_INTERVAL_SECONDS = 3600
+
+
+# ==================== Archiving ====================
+
+def archive_room(room_id: str) -> Optional[Dict[str, int]]:
+    """
+    Archive one completed room; returns the number of documents moved per
+    collection (None if the room doesn't exist or isn't completed). Safe to
+    rerun: documents left behind by an interrupted run are merged into the
+    existing archive and then deleted.
+    """
+    room = DB.get(Collections.ROOMS, str(room_id))
+    if not room or room.get("status") != DebateStatus.COMPLETED.value:
+        return None
+    room_id = str(room["id"])
+
+    # Buffered votes and turn feedback belong in the archive
+    write_buffer.flush()
+    children = {collection: DB.find(collection, {"room_id": room_id}, limit=None)
+                for collection in ARCHIVED_COLLECTIONS}
+
+    archive = DB.get(Collections.ARCHIVES, room_id)
+    if archive is None or any(children.values()):
+        archive = archive or {"id": room_id, "room_id": room_id}
+        for collection, docs in children.items():
+            merged = {str(doc["id"]): doc for doc in archive.get(collection, [])}
+            merged.update((str(doc["id"]), doc) for doc in docs)
+            archive[collection] = list(merged.values())
+        archive["archived_at"] = datetime.utcnow().isoformat()
+        DB.insert(Collections.ARCHIVES, archive)
+
+    _index_user_archives(room_id, archive[Collections.PARTICIPANTS])
+    # From here on reads are served from the archive, so the documents can go
+    if not room.get("archived_at"):
+        DB.update(Collections.ROOMS, room_id, {"archived_at": archive["archived_at"]})
+    for collection, docs in children.items():
+        DB.delete_many(collection, [doc["id"] for doc in docs])
+    return {collection: len(docs) for collection, docs in children.items()}
+
+
+def _index_user_archives(room_id: str, participants: List[Dict[str, Any]]):
+    """Add the room to the archived room lists of its human participants"""
+    user_ids = list(dict.fromkeys(
+        str(p["user_id"]) for p in participants if p.get("user_id") and not p.get("is_ai")))
+    existing = DB.get_many(Collections.USER_ARCHIVES, user_ids)
+    updates = {user_id: {"room_ids": doc["room_ids"] + [room_id]}
+               for user_id, doc in existing.items() if room_id not in doc["room_ids"]}
+    if updates:
+        DB.update_many(Collections.USER_ARCHIVES, updates)
+    missing = [{"id": user_id, "room_ids": [room_id]} for user_id in user_ids if user_id not in existing]
+    if missing:
+        DB.insert_many(Collections.USER_ARCHIVES, missing)
+
+
+def archive_completed(older_than_hours: float = 24, limit: Optional[int] = None) -> int:
+    """Archive rooms completed more than older_than_hours ago; returns how many were archived"""
+    cutoff = (datetime.utcnow() - timedelta(hours=older_than_hours)).isoformat()
+    due = []
+    for batch in DB.iter_batches(Collections.ROOMS, {"status": DebateStatus.COMPLETED.value}):
+        # A room is last updated when it completes
+        due.extend(str(room["id"]) for room in batch if not room.get("archived_at")
+                   and (room.get("updated_at") or room.get("created_at") or "") <= cutoff)
+    archived = 0
+    for room_id in due[:limit]:
+        if archive_room(room_id) is not None:
+            archived += 1
+    return archived
+
+
+async def run_archiver(older_than_hours: float, interval_seconds: float = ARCHIVE_INTERVAL_SECONDS):
+    """Background task: archive completed rooms every interval_seconds"""
+    while True:
+        try:
+            archived = await asyncio.get_running_loop().run_in_executor(
+                None, archive_completed, older_than_hours)
+            if archived:
+                print(f"🗄️  Archived {archived} completed debates")
+        except Exception as e:
+            print(f"⚠️  Archiving completed debates failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+# ==================== Reads ====================
+
+def is_archived(room: Optional[Dict[str, Any]]) -> bool:
+    return bool(room and room.get("archived_at"))
+
+
+async def load_archives(room_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Archives of the given rooms, keyed by room ID (cached; treat them as read-only)"""
+    found, missing = {}, []
+    for room_id in dict.fromkeys(str(r) for r in room_ids):
+        archive = archive_cache.get(f"archive_{room_id}")
+        if archive is None:
+            missing.append(room_id)
+        else:
+            found[room_id] = archive
+    if missing:
+        for room_id, archive in (await AsyncDB.get_many(Collections.ARCHIVES, missing)).items():
+            archive_cache.set(f"archive_{room_id}", archive, tags=[f"room:{room_id}"])
+            found[room_id] = archive
+    return found
+
+
+async def load_archive(room_id: str) -> Optional[Dict[str, Any]]:
+    """Archive of one room, or None if it has none"""
+    return (await load_archives([room_id])).get(str(room_id))
+
+
+async def room_documents(
+    room: Dict[str, Any],
+    collection: str,
+    filter: Optional[Dict[str, Any]] = None,
+    sort: Optional[Sort] = None
+) -> List[Dict[str, Any]]:
+    """All of a room's documents in one child collection, from its archive once archived"""
+    if is_archived(room):
+        archive = await load_archive(room["id"])
+        docs, _ = run_query(archive.get(collection, []) if archive else [], filter, sort)
+        return docs
+    return await AsyncDB.find(collection, {**(filter or {}), "room_id": room["id"]}, sort=sort, limit=None)
+
+
+async def room_result(room: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """A room's result document (None until judged)"""
+    if is_archived(room):
+        results = await room_documents(room, Collections.RESULTS)
+        return results[0] if results else None
+    return await AsyncDB.find_one(Collections.RESULTS, {"room_id": room["id"]})
+
+
+async def speaker_turns(room: Optional[Dict[str, Any]], participant_id: str) -> AsyncIterator[Dict[str, Any]]:
+    """A participant's turns in a room (streamed for live rooms)"""
+    if is_archived(room):
+        for turn in await room_documents(room, Collections.TURNS, {"speaker_id": participant_id}):
+            yield turn
+        return
+    async for turn in AsyncDB.iter(Collections.TURNS, {"speaker_id": participant_id}):
+        yield turn
+
+
+async def user_archives(user_id: str) -> List[Dict[str, Any]]:
+    """Archives of the rooms a user took part in"""
+    index = await AsyncDB.get(Collections.USER_ARCHIVES, str(user_id))
+    if not index:
+        return []
+    return list((await load_archives(index["room_ids"])).values())
+
+
+async def user_participations(user_id: str, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """A user's participant documents in live and archived rooms"""
+    filter = {**(filter or {}), "user_id": str(user_id)}
+    participants = await AsyncDB.find(Collections.PARTICIPANTS, filter, limit=None)
+    for archive in await user_archives(user_id):
+        participants.extend(run_query(archive[Collections.PARTICIPANTS], filter)[0])
+    return participants
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive completed debates into cold storage")
+    parser.add_argument("--older-than-hours", type=float, default=24,
+                        help="only archive rooms completed at least this long ago")
+    parser.add_argument("--limit", type=int, default=None, help="archive at most this many rooms")
+    parser.add_argument("--room", help="archive this room only")
+    args = parser.parse_args()
+
+    if args.room:
+        moved = archive_room(args.room)
+        if moved is None:
+            raise SystemExit(f"❌ Room {args.room} doesn't exist or isn't completed")
+        print(f"✅ Archived room {args.room}: {moved}")
+        return
+    archived = archive_completed(args.older_than_hours, args.limit)
+    print(f"🏁 Archived {archived} completed debates")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Storage micro-benchmarks for Oratio
+Run from the backend directory:
+    python -m app.benchmarks ids [--total 5000] [--threads 8] [--latency-ms 1]
+    python -m app.benchmarks ids --url http://127.0.0.1:8765   # against app.replit_db_server
+    python -m app.benchmarks codecs [--iterations 20000]
+    python -m app.benchmarks records [--turns 60] [--votes 300]
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any
+from app.replit_db import IdAllocator, ID_BLOCK_SIZE
+from app.replit_db_client import ReplitDBClient
+from app.records import Turn, Participant, Room, Vote
+from app.serialization import CODECS, ZSTD_AVAILABLE, encode_document, decode_document, compress_value
+
+
+class LatencyStore(dict):
+    """In-memory store that sleeps on every read/write to model KV round trips"""
+
+    def __init__(self, latency_ms: float = 0.0):
+        super().__init__()
+        self.latency = latency_ms / 1000
+        self.ops = 0
+
+    def _round_trip(self):
+        self.ops += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get(self, key, default=None):
+        self._round_trip()
+        return super().get(key, default)
+
+    def __setitem__(self, key, value):
+        self._round_trip()
+        super().__setitem__(key, value)
+
+
+class CountingStore:
+    """Counts reads/writes made against another store (e.g. a Replit DB endpoint)"""
+
+    def __init__(self, store):
+        self.store = store
+        self.ops = 0
+
+    def get(self, key, default=None):
+        self.ops += 1
+        return self.store.get(key, default)
+
+    def __setitem__(self, key, value):
+        self.ops += 1
+        self.store[key] = value
+
+
+def _counter_allocate(store, collection: str) -> str:
+    """Previous scheme: read-modify-write of the counter on every insert"""
+    counter_key = f"_{collection}_counter"
+    current = store.get(counter_key, 0)
+    store[counter_key] = current + 1
+    return str(current + 1)
+
+
+def bench_id_allocator(
+    total: int = 5000,
+    threads: int = 8,
+    latency_ms: float = 1.0,
+    block_size: int = ID_BLOCK_SIZE,
+    url: Optional[str] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Allocate total IDs from concurrent threads with the per-insert counter
+    and with the hi/lo allocator; report throughput, store round trips and
+    duplicate IDs handed out. With url, the store is that Replit DB endpoint
+    instead of a simulated latency.
+    """
+    results = {}
+    for scheme in ("counter", "hilo"):
+        store = CountingStore(ReplitDBClient(url)) if url else LatencyStore(latency_ms)
+        allocator = IdAllocator(block_size=block_size, store=store)
+        collection = f"bench_{scheme}_{time.time_ns()}"
+
+        if scheme == "counter":
+            def allocate(_):
+                return _counter_allocate(store, collection)
+        else:
+            def allocate(_):
+                return allocator.allocate(collection)[0]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            ids = list(executor.map(allocate, range(total)))
+        elapsed = time.perf_counter() - start
+
+        results[scheme] = {
+            "ids_per_sec": round(total / elapsed),
+            "store_ops": store.ops,
+            "duplicates": total - len(set(ids)),
+        }
+    return results
+
+
+def sample_turn() -> Dict[str, Any]:
+    """A scored turn as stored by submit_turn and the round analysis"""
+    return {
+        "id": "1842",
+        "room_id": "317",
+        "speaker_id": "955",
+        "content": ("Universal basic income would stabilise household demand during "
+                    "automation-driven transitions, as the Finnish and Kenyan pilots show. ") * 8,
+        "audio_url": None,
+        "round_number": 2,
+        "turn_number": 3,
+        "ai_feedback": {
+            "logic": 78, "credibility": 71, "rhetoric": 83,
+            "strengths": ["Clear thesis", "Uses pilot study evidence", "Anticipates cost objection"],
+            "weaknesses": ["Generalises from small samples", "No funding mechanism"],
+            "feedback": "Strong framing; quantify the fiscal trade-offs next time. " * 3,
+            "fact_checks": [{"claim": "Finland ran a UBI pilot", "verdict": "true", "confidence": 0.94}],
+        },
+        "timestamp": "2026-10-18T14:03:11.512345",
+        "created_at": "2026-10-18T14:03:11.512401",
+    }
+
+
+def sample_result() -> Dict[str, Any]:
+    """A results document as written by generate_debate_results"""
+    scores, feedback = {}, {}
+    for pid in ("955", "956", "957", "958"):
+        scores[pid] = {"logic": 74.5, "credibility": 68.25, "rhetoric": 80.0,
+                       "weighted_total": 73.7875, "total": 73.7875}
+        feedback[pid] = {
+            "strengths": ["Clear thesis", "Good rebuttals", "Confident delivery"],
+            "weaknesses": ["Thin sourcing", "Ran long in round 2"],
+            "improvements": ["Focus on providing more evidence to support your claims"] * 3,
+            "alternative_arguments": ["Use analogy or real-world examples to make your argument more relatable"] * 3,
+            "ai_insights": "Consistently strong structure; evidence quality dipped in the final round. " * 4,
+        }
+    return {
+        "id": "88", "room_id": "317", "winner_id": "955",
+        "summary": "A close debate on universal basic income decided on evidence quality. " * 12,
+        "scores": scores, "feedback": feedback,
+        "timestamp": "2026-10-18T14:20:00.000000",
+    }
+
+
+def _per_op_us(func, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def bench_codecs(iterations: int = 20000) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    Encode/decode cost (microseconds per document) and stored size for each
+    codec (and orjson + zstd, if installed) on a turn and a results
+    document. replit_bytes is the size after the Replit DB client JSON-quotes
+    the stored string.
+    """
+    results = {}
+    for doc_name, doc in (("turn", sample_turn()), ("result", sample_result())):
+        results[doc_name] = {}
+        for name, codec in CODECS.items():
+            encoded = encode_document(doc, codec)
+            results[doc_name][name] = {
+                "encode_us": round(_per_op_us(lambda: encode_document(doc, codec), iterations), 2),
+                "decode_us": round(_per_op_us(lambda: decode_document(encoded), iterations), 2),
+                "bytes": len(encoded.encode()),
+                "replit_bytes": len(json.dumps(encoded).encode()),
+            }
+        if ZSTD_AVAILABLE:
+            encoded = compress_value(encode_document(doc, CODECS["orjson"]))
+            results[doc_name]["orjson+zstd"] = {
+                "encode_us": round(_per_op_us(lambda: compress_value(encode_document(doc, CODECS["orjson"])), iterations), 2),
+                "decode_us": round(_per_op_us(lambda: decode_document(encoded), iterations), 2),
+                "bytes": len(encoded.encode()),
+                "replit_bytes": len(json.dumps(encoded).encode()),
+            }
+    return results
+
+
+def sample_room_values(turns: int = 60, votes: int = 300) -> Dict[str, List[str]]:
+    """Stored values of one room: the room, four debaters, its turns and spectator votes"""
+    room = {"id": "317", "topic": "Universal basic income should replace targeted welfare",
+            "description": "Round-robin debate", "scheduled_time": "2026-10-18T14:00:00",
+            "duration_minutes": 30, "mode": "text", "type": "individual", "visibility": "public",
+            "rounds": 3, "status": "completed", "host_id": "12", "resources": [],
+            "room_code": "K7Q2XZ", "is_training": False,
+            "created_at": "2026-10-18T13:55:02.120391", "_version": 4}
+    speakers = ["955", "956", "957", "958"]
+    participants = [
+        {"id": pid, "user_id": str(12 + i), "room_id": "317", "team": None, "role": "debater",
+         "is_ready": True, "score": {"logic": 74.5, "credibility": 68.25, "rhetoric": 80.0},
+         "xp_earned": 0, "created_at": "2026-10-18T13:56:40.003112", "_version": 3}
+        for i, pid in enumerate(speakers)
+    ]
+    turn_docs = []
+    for i in range(turns):
+        turn = sample_turn()
+        turn.update(id=str(1800 + i), speaker_id=speakers[i % 4],
+                    round_number=i // 4 + 1, turn_number=i % 4 + 1, _version=2)
+        turn_docs.append(turn)
+    vote_docs = [
+        {"id": str(5000 + i), "room_id": "317", "spectator_id": str(200 + i % 40),
+         "target_id": speakers[i % 4], "reaction_type": "🔥" if i % 3 else "👏",
+         "created_at": "2026-10-18T14:05:12.551203", "_version": 1}
+        for i in range(votes)
+    ]
+    return {name: [encode_document(doc) for doc in docs] for name, docs in (
+        ("rooms", [room]), ("participants", participants), ("turns", turn_docs), ("votes", vote_docs))}
+
+
+def _retained_bytes(build) -> int:
+    """Bytes still allocated after build() returns (held by its result)"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return after - before
+
+
+def bench_records(turns: int = 60, votes: int = 300, iterations: int = 200) -> Dict[str, Dict[str, Any]]:
+    """
+    Memory held by one decoded room (room, participants, turns, votes) as
+    plain dicts versus records, and the cost of decoding it each way.
+    """
+    values = sample_room_values(turns, votes)
+    record_types = {"rooms": Room, "participants": Participant, "turns": Turn, "votes": Vote}
+
+    def as_dicts():
+        return {name: [decode_document(v) for v in stored] for name, stored in values.items()}
+
+    def as_records():
+        return {name: [record_types[name].decode(v) for v in stored] for name, stored in values.items()}
+
+    return {
+        name: {
+            "bytes": _retained_bytes(build),
+            "decode_us": round(_per_op_us(build, iterations), 1),
+        }
+        for name, build in (("dicts", as_dicts), ("records", as_records))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Oratio storage benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    ids_parser = subparsers.add_parser("ids", help="ID allocation throughput")
+    ids_parser.add_argument("--total", type=int, default=5000)
+    ids_parser.add_argument("--threads", type=int, default=8)
+    ids_parser.add_argument("--latency-ms", type=float, default=1.0)
+    ids_parser.add_argument("--block-size", type=int, default=ID_BLOCK_SIZE)
+    ids_parser.add_argument("--url", help="Replit DB endpoint to run against (e.g. app.replit_db_server)")
+
+    codecs_parser = subparsers.add_parser("codecs", help="Document codec cost and size")
+    codecs_parser.add_argument("--iterations", type=int, default=20000)
+
+    records_parser = subparsers.add_parser("records", help="Memory per cached room: dicts vs records")
+    records_parser.add_argument("--turns", type=int, default=60)
+    records_parser.add_argument("--votes", type=int, default=300)
+
+    args = parser.parse_args()
+    if args.benchmark == "ids":
+        results = bench_id_allocator(args.total, args.threads, args.latency_ms, args.block_size, args.url)
+        for scheme, stats in results.items():
+            print(f"{scheme:>8}: {stats['ids_per_sec']:>9} ids/s  "
+                  f"{stats['store_ops']:>6} store ops  {stats['duplicates']:>5} duplicates")
+    elif args.benchmark == "codecs":
+        for doc_name, codecs in bench_codecs(args.iterations).items():
+            print(f"{doc_name}:")
+            for name, stats in codecs.items():
+                print(f"  {name:>8}: encode {stats['encode_us']:>7} us  decode {stats['decode_us']:>7} us  "
+                      f"{stats['bytes']:>6} bytes  ({stats['replit_bytes']} as stored in Replit DB)")
+    elif args.benchmark == "records":
+        results = bench_records(args.turns, args.votes)
+        for name, stats in results.items():
+            print(f"{name:>8}: {stats['bytes']:>9} bytes per room  decode {stats['decode_us']:>8} us")
+        saved = 1 - results["records"]["bytes"] / results["dicts"]["bytes"]
+        print(f"records hold {saved:.0%} less memory")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,586 @@
 """
 Simple in-memory cache for frequently accessed data
+Caches are LRU-bounded by entry count and (estimated) size, and entries
+expire on the monotonic clock. A background sweeper drops expired entries
+from every cache, so keys that are never read again don't pile up.
+Concurrent misses for a key share one load (get_or_load and @cached), so
+an invalidated hot key doesn't send every waiting client to storage.
+
+Entries carry tags naming what they were built from (room:<id>,
+user:<id>); the change feed invalidates by tag, so a cached view is
+invalidated by any write to a room or user it depends on.
+
+With SHARED_CACHE_PATH set, the caches are backed by a second tier shared
+by the worker processes on this host (app/shared_cache.py): in-process
+misses are looked up there, loads are written through, and invalidations
+reach the other workers' in-process caches.
 """
-from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+import asyncio
+import contextvars
+import functools
+import heapq
+import inspect
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Tuple, Callable, Awaitable, Union, Iterable, Set
+import orjson
+from fastapi import Response
+from app.changes import change_feed, ChangeEvent
+from app.config import settings
+from app.replit_db import Collections
+from app.shared_cache import SharedCacheTier
+
+# Expired entries are swept from all caches this often
+SWEEP_INTERVAL_SECONDS = 5.0
+
+# Tag invalidations remembered per cache, to keep loads that started before
+# one from caching their (outdated) result
+RECENT_TAG_INVALIDATIONS = 1024
+
+# Tags of a cache entry: a list, or a function of the loaded value
+Tags = Union[Iterable[str], Callable[[Any], Iterable[str]], None]
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory held by a cached value: its JSON size (records via to_dict)"""
+    try:
+        return len(orjson.dumps(value, default=_serializable))
+    except TypeError:
+        return sys.getsizeof(value)
+
+
+def _serializable(value: Any) -> Any:
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return str(value)
 
 
 class SimpleCache:
-    """Thread-safe simple cache with TTL"""
-    
-    def __init__(self, ttl_seconds: int = 60):
-        self.cache: Dict[str, Dict[str, Any]] = {}
+    """
+    Thread-safe LRU cache with per-entry TTL, bounded by entries and bytes.
+    An entry stored with stale_ttl_seconds stays servable that much longer
+    past its TTL (or after invalidate()): get_or_load() returns it at once,
+    flagged stale, while one background load refreshes it. Entries stored
+    with tags are invalidated together by invalidate_tag(). With a shared
+    tier, the cache's entries are shared with other processes under name.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = 60,
+        max_entries: int = 10000,
+        max_bytes: int = 32 * 1024 * 1024,
+        stale_ttl_seconds: float = 0,
+        name: Optional[str] = None,
+        shared: Optional[SharedCacheTier] = None
+    ):
+        if shared is not None and not name:
+            raise ValueError("A cache backed by a shared tier needs a name")
+        self.name = name
+        self.shared = shared
         self.ttl_seconds = ttl_seconds
-    
+        self.stale_ttl_seconds = stale_ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        # key -> (value, fresh until, expires, size, tags), least recently used first
+        self._entries: "OrderedDict[str, Tuple[Any, float, float, int, Tuple[str, ...]]]" = OrderedDict()
+        # tag -> keys of the entries carrying it
+        self._tags: Dict[str, Set[str]] = {}
+        # Count of tag invalidations, and the most recent ones as (count, tag)
+        self._epoch = 0
+        self._recent_tags: deque = deque(maxlen=RECENT_TAG_INVALIDATIONS)
+        # (expires, key) for the sweeper; entries replaced since are skipped
+        self._expiry: List[Tuple[float, str]] = []
+        # key -> task loading it (get_or_load); a key invalidated while loading is dropped here
+        self._loading: Dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "shared_hits": 0, "misses": 0, "stale_hits": 0, "evictions": 0,
+                       "expirations": 0, "coalesced": 0}
+        _register(self)
+        if shared is not None:
+            shared.subscribe(self._apply_shared)
+
     def get(self, key: str) -> Optional[Any]:
-        """Get value from cache if not expired"""
-        if key in self.cache:
-            entry = self.cache[key]
-            if datetime.utcnow() < entry['expires']:
-                return entry['value']
-            else:
-                del self.cache[key]
+        """Get value from cache if fresh (from the shared tier on an in-process miss)"""
+        with self._lock:
+            entry = self._fresh(key)
+            if entry is not None:
+                return entry[0]
+            missing = key not in self._entries
+        if missing and self.shared is not None:
+            entry = self._fill_from_shared(key)
+            if entry is not None and time.monotonic() < entry[1]:
+                return entry[0]
+        with self._lock:
+            self._stats["misses"] += 1
         return None
-    
-    def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None):
-        """Set value in cache with TTL"""
+
+    def _fresh(self, key: str) -> Optional[tuple]:
+        """The entry if fresh, counted as a hit; drops it if expired (caller holds the lock)"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            now = time.monotonic()
+            if now < entry[1]:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry
+            if now >= entry[2]:
+                self._remove(key)
+                self._stats["expirations"] += 1
+        return None
+
+    def _fill_from_shared(self, key: str) -> Optional[tuple]:
+        """Copy an entry from the shared tier into this process (fresh ones count as shared hits)"""
+        epoch = self._epoch
+        entry = self.shared.get(self.name, key)
+        if entry is None:
+            return None
+        with self._lock:
+            if (key in self._entries or entry[3] > self.max_bytes
+                    or self._tags_invalidated_since(epoch, entry[4])):
+                return None
+            self._store(key, *entry)
+            if time.monotonic() < entry[1]:
+                self._stats["shared_hits"] += 1
+        return entry
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl_seconds: Optional[float] = None,
+        stale_ttl_seconds: Optional[float] = None,
+        tags: Tags = None
+    ):
+        """Set value in cache with TTL (values larger than max_bytes are not cached)"""
+        size = estimate_size(value)
+        tags = _resolve_tags(tags, value)
+        position = self.shared.position() if self.shared is not None else None
+        with self._lock:
+            stored = self._put(key, value, ttl_seconds, stale_ttl_seconds, size, tags)
+        if stored is not None and position is not None:
+            self._write_through(key, value, *stored, tags, position)
+
+    def _put(
+        self,
+        key: str,
+        value: Any,
+        ttl_seconds: Optional[float],
+        stale_ttl_seconds: Optional[float],
+        size: int,
+        tags: Tuple[str, ...]
+    ) -> Optional[Tuple[float, float]]:
+        """Store an entry with TTLs; returns (fresh until, expires), or None if too large (caller holds the lock)"""
         ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
-        self.cache[key] = {
-            'value': value,
-            'expires': datetime.utcnow() + timedelta(seconds=ttl)
-        }
-    
-    def delete(self, key: str):
-        """Delete value from cache"""
-        if key in self.cache:
-            del self.cache[key]
-    
+        stale_ttl = stale_ttl_seconds if stale_ttl_seconds is not None else self.stale_ttl_seconds
+        fresh_until = time.monotonic() + ttl
+        expires = fresh_until + stale_ttl
+        self._remove(key)
+        if size > self.max_bytes:
+            return None
+        self._store(key, value, fresh_until, expires, size, tags)
+        return fresh_until, expires
+
+    def _store(self, key: str, value: Any, fresh_until: float, expires: float, size: int, tags: Tuple[str, ...]):
+        """Store an entry and evict down to the bounds (caller holds the lock)"""
+        self._remove(key)
+        self._entries[key] = (value, fresh_until, expires, size, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        self.bytes += size
+        heapq.heappush(self._expiry, (expires, key))
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._stats["evictions"] += 1
+        # Replaced entries leave stale heap items; rebuild before they dominate
+        if len(self._expiry) > 2 * len(self._entries) + 64:
+            self._expiry = [(entry[2], k) for k, entry in self._entries.items()]
+            heapq.heapify(self._expiry)
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl_seconds: Optional[float] = None,
+        stale_ttl_seconds: Optional[float] = None,
+        tags: Tags = None
+    ) -> Any:
+        """
+        Cached value, or the result of awaiting loader() (cached unless None).
+        Concurrent misses for the same key await one loader call (single
+        flight); if the key is invalidated while it runs, its result is
+        returned to the waiting callers but not cached. A stale entry is
+        returned immediately while the load runs in the background.
+        tags (a list, or a function of the loaded value) are attached to
+        the stored entry. cache_status is set to "hit", "stale" or "miss".
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._fresh(key)
+            missing = entry is None and key not in self._entries and key not in self._loading
+        if entry is None and missing and self.shared is not None:
+            # Another worker may have loaded it (a stale shared entry is served stale below)
+            entry = self._fill_from_shared(key)
+            if entry is not None and time.monotonic() >= entry[1]:
+                entry = None
+        if entry is not None:
+            cache_status.set("hit")
+            return entry[0]
+
+        with self._lock:
+            entry = self._entries.get(key)
+            now = time.monotonic()
+            if entry is not None and now < entry[1]:
+                # Stored by another caller meanwhile
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                cache_status.set("hit")
+                return entry[0]
+            stale = entry is not None and now < entry[2]
+
+            task = self._loading.get(key)
+            if task is None or task.get_loop() is not loop:
+                task = self._loading[key] = loop.create_task(self._load(
+                    key, loader, ttl_seconds, stale_ttl_seconds, tags, self._epoch, check_shared=not missing))
+                # Background refreshes may finish unobserved; their errors are handled in _load
+                task.add_done_callback(_retrieve_exception)
+            elif not stale:
+                self._stats["coalesced"] += 1
+
+            if stale:
+                self._entries.move_to_end(key)
+                self._stats["stale_hits"] += 1
+                cache_status.set("stale")
+                return entry[0]
+            self._stats["misses"] += 1
+        cache_status.set("miss")
+        # Shielded: a caller that goes away doesn't cancel the load for the others
+        return await asyncio.shield(task)
+
+    async def _load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl_seconds: Optional[float],
+        stale_ttl_seconds: Optional[float],
+        tags: Tags,
+        epoch: int,
+        check_shared: bool = True
+    ) -> Any:
+        task = asyncio.current_task()
+        position = self.shared.position() if self.shared is not None else None
+        if check_shared and self.shared is not None:
+            entry = self.shared.get(self.name, key)
+            if entry is not None and time.monotonic() < entry[1]:
+                # Another worker already reloaded it (shared entries are marked stale on invalidation)
+                with self._lock:
+                    if self._loading.get(key) is task:
+                        del self._loading[key]
+                        if entry[3] <= self.max_bytes and not self._tags_invalidated_since(epoch, entry[4]):
+                            self._store(key, *entry)
+                            self._stats["shared_hits"] += 1
+                return entry[0]
+        try:
+            value = await loader()
+        except BaseException:
+            # Stop serving a stale value whose refresh fails (e.g. the room was deleted)
+            with self._lock:
+                if self._loading.get(key) is task:
+                    del self._loading[key]
+                    self._remove(key)
+            raise
+        size = estimate_size(value) if value is not None else 0
+        tags = _resolve_tags(tags, value) if value is not None else ()
+        stored = None
+        with self._lock:
+            if self._loading.get(key) is task:
+                del self._loading[key]
+                if value is not None and not self._tags_invalidated_since(epoch, tags):
+                    stored = self._put(key, value, ttl_seconds, stale_ttl_seconds, size, tags)
+        if stored is not None and position is not None:
+            self._write_through(key, value, *stored, tags, position)
+        return value
+
+    def _write_through(self, key: str, value: Any, fresh_until: float, expires: float,
+                       tags: Tuple[str, ...], position: int):
+        """
+        Copy an entry to the shared tier off the calling thread (in order, on
+        one writer thread); skipped there if invalidated since position
+        """
+        _shared_writer.submit(self.shared.set, self.name, key, value, fresh_until, expires, tags, position)
+
+    def _tags_invalidated_since(self, epoch: int, tags: Tuple[str, ...]) -> bool:
+        """Whether any of tags was invalidated after epoch (caller holds the lock)"""
+        if self._epoch == epoch or not tags:
+            return False
+        recent = self._recent_tags
+        if len(recent) == recent.maxlen and recent[0][0] > epoch + 1:
+            return True  # some invalidations since epoch are forgotten: assume one matched
+        return any(count > epoch and tag in tags for count, tag in recent)
+
+    def invalidate(self, key: str, broadcast: bool = True):
+        """
+        Mark an entry out of date: entries with a stale window keep being
+        served (stale) by get_or_load() until refreshed, others are deleted.
+        With broadcast, also in the shared tier and the other processes.
+        """
+        with self._lock:
+            self._invalidate(key, time.monotonic())
+        if broadcast and self.shared is not None:
+            self.shared.invalidate(self.name, key)
+
+    def _invalidate(self, key: str, now: float):
+        """invalidate() with the lock held"""
+        self._loading.pop(key, None)
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        if now < entry[2] and entry[2] > entry[1]:
+            self._entries[key] = (entry[0], 0.0, *entry[2:])
+        else:
+            self._remove(key)
+
+    def invalidate_tag(self, tag: str, drop: bool = False, broadcast: bool = True) -> int:
+        """
+        Invalidate (or with drop, delete) every entry carrying tag, and keep
+        loads already running from caching results tagged with it; returns
+        how many entries were affected. With broadcast, also in the shared
+        tier and the other processes.
+        """
+        with self._lock:
+            self._epoch += 1
+            self._recent_tags.append((self._epoch, tag))
+            keys = list(self._tags.get(tag, ()))
+            now = time.monotonic()
+            for key in keys:
+                if drop:
+                    self._remove(key)
+                    self._loading.pop(key, None)
+                else:
+                    self._invalidate(key, now)
+        if broadcast and self.shared is not None:
+            self.shared.invalidate_tag(tag, drop, ns=self.name)
+        return len(keys)
+
+    def delete(self, key: str, broadcast: bool = True):
+        """Delete value from cache (with broadcast, also from the shared tier and the other processes)"""
+        with self._lock:
+            self._remove(key)
+            self._loading.pop(key, None)
+        if broadcast and self.shared is not None:
+            self.shared.invalidate(self.name, key, drop=True)
+
+    def _apply_shared(self, kind: str, ns: Optional[str], target: str, drop: bool):
+        """Apply an invalidation broadcast by another process"""
+        if ns is not None and ns != self.name:
+            return
+        if kind == "tag":
+            self.invalidate_tag(target, drop, broadcast=False)
+        elif drop:
+            self.delete(target, broadcast=False)
+        else:
+            self.invalidate(target, broadcast=False)
+
     def clear(self):
-        """Clear all cache"""
-        self.cache.clear()
+        """Clear all cache (this process's entries and the shared tier's)"""
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._loading.clear()
+            self._expiry.clear()
+            self.bytes = 0
+        if self.shared is not None:
+            self.shared.clear(self.name)
+
+    def _remove(self, key: str):
+        """Drop an entry (caller holds the lock)"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[3]
+            for tag in entry[4]:
+                keys = self._tags[tag]
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def sweep(self) -> int:
+        """Drop expired entries; returns how many were dropped"""
+        now = time.monotonic()
+        dropped = 0
+        with self._lock:
+            expiry, entries = self._expiry, self._entries
+            while expiry and expiry[0][0] <= now:
+                expires, key = heapq.heappop(expiry)
+                entry = entries.get(key)
+                if entry is not None and entry[2] == expires:
+                    self._remove(key)
+                    dropped += 1
+            self._stats["expirations"] += dropped
+        return dropped
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.bytes, "tags": len(self._tags),
+                    "max_entries": self.max_entries, "max_bytes": self.max_bytes, **self._stats}
+
 
+# Outcome of the last get_or_load() in this context: "hit", "stale" or "miss"
+cache_status: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("cache_status", default=None)
+
+
+def _resolve_tags(tags: Tags, value: Any) -> Tuple[str, ...]:
+    """Tags for an entry holding value"""
+    if tags is None:
+        return ()
+    return tuple(dict.fromkeys(tags(value) if callable(tags) else tags))
+
+
+def _retrieve_exception(task: asyncio.Task):
+    if not task.cancelled():
+        task.exception()
+
+
+# Every live cache, swept by one daemon thread
+_caches: "weakref.WeakSet[SimpleCache]" = weakref.WeakSet()
+_sweeper: Optional[threading.Thread] = None
+_sweeper_lock = threading.Lock()
+
+
+def _register(cache: SimpleCache):
+    global _sweeper
+    with _sweeper_lock:
+        _caches.add(cache)
+        if _sweeper is None:
+            _sweeper = threading.Thread(target=_sweep_forever, daemon=True, name="cache-sweeper")
+            _sweeper.start()
+
+
+def _shared_tiers(caches: Iterable[SimpleCache]) -> List[SharedCacheTier]:
+    return list({id(cache.shared): cache.shared for cache in caches if cache.shared is not None}.values())
+
+
+def _sweep_forever():
+    while True:
+        time.sleep(SWEEP_INTERVAL_SECONDS)
+        caches = list(_caches)
+        for cache in [*caches, *_shared_tiers(caches)]:
+            try:
+                cache.sweep()
+            except Exception as e:
+                print(f"⚠️  Cache sweep failed: {e}")
+
+
+# Write-throughs to shared tiers, applied in order off the request path
+_shared_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-cache-writer")
+
+
+def flush_shared_writes():
+    """Wait for the write-throughs queued so far to reach the shared tier"""
+    _shared_writer.submit(lambda: None).result()
+
+
+def invalidate_tag(tag: str, drop: bool = False) -> int:
+    """Invalidate (or delete) the entries carrying tag in every cache, shared tiers and other processes included"""
+    caches = list(_caches)
+    affected = sum(cache.invalidate_tag(tag, drop, broadcast=False) for cache in caches)
+    for tier in _shared_tiers(caches):
+        tier.invalidate_tag(tag, drop)
+    return affected
+
+
+# Keyword argument through which FastAPI hands @cached route handlers their Response
+_RESPONSE_PARAM = "cache_response"
+
+
+def cached(
+    cache: SimpleCache,
+    key: Union[str, Callable[..., str]],
+    ttl_seconds: Optional[float] = None,
+    stale_ttl_seconds: Optional[float] = None,
+    tags: Iterable[Union[str, Callable[[Any], Iterable[str]]]] = ()
+):
+    """
+    Decorator for async functions (e.g. route handlers): results are served
+    from cache under key, a format string over the function's arguments
+    ("transcript_{room_id}") or a function of them, and concurrent misses
+    share one call (see SimpleCache.get_or_load). With stale_ttl_seconds,
+    an outdated result is served while it is refreshed. tags are format
+    strings over the arguments ("room:{room_id}") or functions of the
+    result returning more tags. Route responses carry X-Cache: hit, stale
+    or miss.
+    """
+    tag_templates = [tag for tag in tags if isinstance(tag, str)]
+    tag_functions = [tag for tag in tags if not isinstance(tag, str)]
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            response = kwargs.pop(_RESPONSE_PARAM, None)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            cache_key = key(*args, **kwargs) if callable(key) else key.format(**bound.arguments)
+            static_tags = [tag.format(**bound.arguments) for tag in tag_templates]
+            value = await cache.get_or_load(
+                cache_key, lambda: func(*args, **kwargs), ttl_seconds, stale_ttl_seconds,
+                lambda result: static_tags + [tag for f in tag_functions for tag in f(result)])
+            if response is not None:
+                response.headers["X-Cache"] = cache_status.get()
+            return value
+
+        # FastAPI injects parameters annotated Response; direct callers can omit it
+        wrapper.__signature__ = signature.replace(parameters=[
+            *signature.parameters.values(),
+            inspect.Parameter(_RESPONSE_PARAM, inspect.Parameter.KEYWORD_ONLY, default=None, annotation=Response)])
+        return wrapper
+    return decorator
+
+
+# Second tier shared by this host's worker processes (None when SHARED_CACHE_PATH is unset)
+shared_tier = (SharedCacheTier(settings.SHARED_CACHE_PATH, settings.SHARED_CACHE_MAX_MB * 1024 * 1024)
+               if settings.SHARED_CACHE_PATH else None)
 
 # Global cache instances
-user_cache = SimpleCache(ttl_seconds=300)  # 5 minutes for user data
-room_cache = SimpleCache(ttl_seconds=30)   # 30 seconds for room data (increased for better performance)
+user_cache = SimpleCache(ttl_seconds=300, max_entries=20000, max_bytes=16 * 1024 * 1024,
+                         name="user", shared=shared_tier)  # 5 minutes for user data
+room_cache = SimpleCache(ttl_seconds=30, max_entries=10000, max_bytes=64 * 1024 * 1024,
+                         name="room", shared=shared_tier)  # 30 seconds for room data (increased for better performance)
+archive_cache = SimpleCache(ttl_seconds=3600, max_entries=500, max_bytes=64 * 1024 * 1024,
+                            name="archive", shared=shared_tier)  # 1 hour for archived rooms (they no longer change)
+
+
+def _invalidate_room(event: ChangeEvent):
+    """Room writes change every view built from the room"""
+    # A deleted room's views must not be served stale
+    invalidate_tag(f"room:{event.id}", drop=event.doc is None)
+
+
+def _invalidate_room_documents(event: ChangeEvent):
+    """Turn, participant and archive writes change their room's views"""
+    for room_id in event.values("room_id"):
+        invalidate_tag(f"room:{room_id}")
+
+
+def _invalidate_user(event: ChangeEvent):
+    """User writes change the cached profile and views showing the user"""
+    invalidate_tag(f"user:{event.id}", drop=event.doc is None)
+
+
+# Invalidate from the storage change feed, so every write path is covered
+change_feed.subscribe(_invalidate_room, collection=Collections.ROOMS)
+change_feed.subscribe(_invalidate_room_documents, collection=Collections.TURNS)
+change_feed.subscribe(_invalidate_room_documents, collection=Collections.PARTICIPANTS)
+change_feed.subscribe(_invalidate_room_documents, collection=Collections.ARCHIVES)
+change_feed.subscribe(_invalidate_user, collection=Collections.USERS)
@@ -0,0 +1,128 @@
+"""
+In-process change feed for Oratio storage
+Storage backends publish a ChangeEvent after every insert, update and
+delete. Subscribers filter by collection, operation and fields, so cache
+invalidation and real-time fan-out react to one stream instead of being
+repeated by hand after each write.
+"""
+import asyncio
+import threading
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, Callable, Iterable, List, FrozenSet
+
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    """One document write (doc is None on delete, previous is None on insert)"""
+    op: str
+    collection: str
+    id: str
+    doc: Optional[Dict[str, Any]]
+    previous: Optional[Dict[str, Any]]
+
+    @property
+    def changed_fields(self) -> FrozenSet[str]:
+        """Fields whose value differs between previous and doc"""
+        before, after = self.previous or {}, self.doc or {}
+        return frozenset(k for k in before.keys() | after.keys() if before.get(k) != after.get(k))
+
+    def values(self, field: str) -> List[Any]:
+        """Distinct non-None values of field before and after the write"""
+        found = []
+        for doc in (self.previous, self.doc):
+            value = doc.get(field) if doc else None
+            if value is not None and value not in found:
+                found.append(value)
+        return found
+
+
+@dataclass(frozen=True)
+class _Subscription:
+    handler: Callable
+    collection: Optional[str]
+    fields: Optional[FrozenSet[str]]
+    ops: Optional[FrozenSet[str]]
+    is_async: bool
+
+    def wants(self, event: ChangeEvent) -> bool:
+        """Whether event passes this subscription's filters"""
+        if self.collection is not None and event.collection != self.collection:
+            return False
+        if self.ops is not None and event.op not in self.ops:
+            return False
+        return self.fields is None or bool(self.fields & event.changed_fields)
+
+
+class ChangeFeed:
+    """
+    Publish/subscribe hub for document changes.
+    Sync handlers run inline in the writing thread, so they complete before
+    the write returns (used for cache invalidation). Async handlers are
+    scheduled on the application's event loop, also from executor threads.
+    Handler errors are logged and never fail the write.
+    """
+
+    def __init__(self):
+        self._subscriptions: List[_Subscription] = []
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def subscribe(
+        self,
+        handler: Callable[[ChangeEvent], Any],
+        collection: Optional[str] = None,
+        fields: Optional[Iterable[str]] = None,
+        ops: Optional[Iterable[str]] = None
+    ) -> Callable[[], None]:
+        """Register handler(event) for matching changes; returns an unsubscribe function"""
+        subscription = _Subscription(
+            handler=handler,
+            collection=collection,
+            fields=frozenset(fields) if fields is not None else None,
+            ops=frozenset(ops) if ops is not None else None,
+            is_async=asyncio.iscoroutinefunction(handler),
+        )
+        with self._lock:
+            self._subscriptions = self._subscriptions + [subscription]
+
+        def unsubscribe():
+            with self._lock:
+                self._subscriptions = [s for s in self._subscriptions if s is not subscription]
+        return unsubscribe
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        """Event loop that async handlers run on when changes come from other threads"""
+        self._loop = loop
+
+    def publish(self, op: str, collection: str, doc: Optional[Dict[str, Any]] = None,
+                previous: Optional[Dict[str, Any]] = None):
+        """Notify subscribers of one document write"""
+        subscriptions = self._subscriptions
+        if not subscriptions:
+            return
+        event = ChangeEvent(op, collection, str((doc or previous)["id"]), doc, previous)
+        for subscription in subscriptions:
+            if subscription.wants(event):
+                self._dispatch(subscription, event)
+
+    def _dispatch(self, subscription: _Subscription, event: ChangeEvent):
+        """Run one handler, scheduling async handlers on the event loop"""
+        try:
+            if not subscription.is_async:
+                subscription.handler(event)
+                return
+            try:
+                asyncio.get_running_loop().create_task(subscription.handler(event))
+            except RuntimeError:
+                if self._loop is not None and not self._loop.is_closed():
+                    asyncio.run_coroutine_threadsafe(subscription.handler(event), self._loop)
+        except Exception as e:
+            print(f"⚠️  Change handler {getattr(subscription.handler, '__name__', subscription.handler)} failed: {e}")
+
+
+# Process-wide feed that every storage backend publishes to
+change_feed = ChangeFeed()
@@ -0,0 +1,38 @@
+"""
+Compression dictionary training for Oratio
+Trains a zstd dictionary on a collection's stored documents (turn content by
+default) and makes it the collection's active dictionary. Small documents
+share most of their structure and vocabulary, so a dictionary compresses
+them far better than zstd alone. The collection must be listed in
+COMPRESS_COLLECTIONS for new writes to be compressed.
+
+Run with:
+    python -m app.compression_dict [--collection turns] [--size 16384] [--rewrite]
+"""
+import argparse
+from app.replit_db import ReplitDB, COMPRESSED_COLLECTIONS
+from app.serialization import ZSTD_AVAILABLE
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train a zstd dictionary on stored documents")
+    parser.add_argument("--collection", default="turns")
+    parser.add_argument("--size", type=int, default=16384, help="dictionary size in bytes")
+    parser.add_argument("--samples", type=int, default=2000, help="documents to train on")
+    parser.add_argument("--rewrite", action="store_true", help="recompress existing documents")
+    args = parser.parse_args()
+
+    if not ZSTD_AVAILABLE:
+        raise SystemExit("❌ zstandard is not installed (pip install zstandard)")
+    if args.collection not in COMPRESSED_COLLECTIONS:
+        print(f"⚠️  {args.collection} is not in COMPRESS_COLLECTIONS; its values stay uncompressed")
+
+    dict_id = ReplitDB.train_compression_dictionary(args.collection, args.size, args.samples)
+    print(f"✅ Trained dictionary {dict_id} for {args.collection}")
+    if args.rewrite:
+        rewritten = ReplitDB.reencode_collection(args.collection)
+        print(f"🏁 Recompressed {rewritten} {args.collection} documents")
+
+
+if __name__ == "__main__":
+    main()
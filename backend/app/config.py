@@ -12,8 +12,54 @@ class Settings(BaseSettings):
     REPL_SLUG: str = os.getenv("REPL_SLUG", "oratio")
     REPL_OWNER: str = os.getenv("REPL_OWNER", "")
 
-    # Database - Pure Replit DB (optimized)
-    DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./oratio.db")
+    # Storage backend: Replit DB by default, or SQLite with a sqlite:/// URL
+    # (e.g. sqlite:///./oratio.db), or a Replit DB wire-protocol endpoint with
+    # replit+http://host:port (e.g. python -m app.replit_db_server)
+    DATABASE_URL: str = os.getenv("DATABASE_URL", "replit://")
+
+    # Codec for values written to Replit DB: orjson, msgpack or json
+    STORAGE_CODEC: str = os.getenv("STORAGE_CODEC", "orjson")
+
+    # zstd-compress values of these collections (comma-separated, needs the
+    # zstandard package) once they reach COMPRESS_MIN_BYTES. Train a
+    # dictionary on existing documents with `python -m app.compression_dict`
+    COMPRESS_COLLECTIONS: str = os.getenv("COMPRESS_COLLECTIONS", "")
+    COMPRESS_MIN_BYTES: int = int(os.getenv("COMPRESS_MIN_BYTES", "512"))
+
+    # Values larger than this are split into chunks of this size, stored
+    # under separate keys and fetched concurrently
+    VALUE_CHUNK_BYTES: int = int(os.getenv("VALUE_CHUNK_BYTES", str(256 * 1024)))
+
+    # Store turns, participants and votes under room:<room_id>:... keys
+    # (run `python -m app.migrate_keys` when switching)
+    ROOM_SCOPED_KEYS: bool = os.getenv("ROOM_SCOPED_KEYS", "false").lower() in ("1", "true", "yes")
+
+    # Spread Replit DB keys over several shards by consistent hashing:
+    # comma-separated [name=]url entries (memory://, local:///dir,
+    # sqlite:///path or a Replit DB URL). Append shards and run `python -m app.rebalance_shards`
+    REPLIT_DB_SHARDS: str = os.getenv("REPLIT_DB_SHARDS", "")
+
+    # Persist the local fallback store (used when Replit DB is unavailable)
+    # as a snapshot + append-only log in this directory; empty = in-memory
+    LOCAL_STORE_DIR: str = os.getenv("LOCAL_STORE_DIR", "")
+    # fsync the log on every write (slower; otherwise synced on compaction/exit)
+    LOCAL_STORE_FSYNC: bool = os.getenv("LOCAL_STORE_FSYNC", "false").lower() in ("1", "true", "yes")
+
+    # Archive completed debates this many hours after they end (packs the
+    # room's documents into one compressed archive; `python -m app.archive`
+    # runs it by hand); 0 = never archive automatically
+    ARCHIVE_AFTER_HOURS: float = float(os.getenv("ARCHIVE_AFTER_HOURS", "0"))
+
+    # After a write, serve the previous debate transcript for up to this many
+    # seconds while one background load rebuilds it; 0 = rebuild before
+    # responding. Debate status is always rebuilt (it drives turn-taking)
+    ROOM_CACHE_STALE_SECONDS: float = float(os.getenv("ROOM_CACHE_STALE_SECONDS", "0"))
+
+    # Back the in-process caches with a tier shared by the worker processes
+    # on this host: a SQLite file, best on tmpfs (e.g. /dev/shm/oratio-cache.db).
+    # Invalidations are broadcast to every worker; empty = per-process caches only
+    SHARED_CACHE_PATH: str = os.getenv("SHARED_CACHE_PATH", "")
+    SHARED_CACHE_MAX_MB: int = int(os.getenv("SHARED_CACHE_MAX_MB", "256"))
 
     # Use Gemini AI exclusively
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
@@ -45,6 +91,10 @@ class Settings(BaseSettings):
     MAX_FILE_SIZE_MB: int = 50
     ALLOWED_FILE_EXTENSIONS: List[str] = ["pdf", "mp3", "wav", "ogg"]
 
+    # Token for internal endpoints such as /api/utils/storage-metrics (sent as
+    # X-Metrics-Token); without one they are only served outside production
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = 60
 
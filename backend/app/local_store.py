@@ -0,0 +1,214 @@
+"""
+Durable local key-value store for self-hosted deployments
+Used instead of the in-memory dict when Replit DB is unavailable and
+LOCAL_STORE_DIR is set. Keys live in a dict, so reads run at dict speed;
+every write is also appended to an operation log, and the log is
+periodically compacted into a snapshot. Startup loads the snapshot and
+replays the log (both memory-mapped).
+
+Files in the store directory (one JSON array per line):
+
+    snapshot        ["s", key, value] for every key at the last compaction
+    log             ["s", key, value] / ["d", key] since then
+    log.compacting  the previous log, while a compaction is writing the snapshot
+
+A write is in the OS page cache when the call returns, so it survives a
+process crash; with fsync=True it is also on disk. A torn last line (crash
+mid-append) is dropped on load.
+"""
+import atexit
+import mmap
+import os
+import shutil
+import threading
+from typing import List, Dict, Any, Iterator
+import orjson
+
+# Compact once the log is this large and larger than the last snapshot
+COMPACT_MIN_BYTES = 8 * 1024 * 1024
+
+SNAPSHOT_FILE = "snapshot"
+LOG_FILE = "log"
+COMPACTING_LOG_FILE = "log.compacting"
+
+
+def _lines(path: str) -> Iterator[bytes]:
+    """Lines of a file, read through a memory map when it is not empty"""
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield from iter(mm.readline, b"")
+    except FileNotFoundError:
+        return
+
+
+class LogStore:
+    """Dict-like key-value store persisted as a snapshot plus an append-only log"""
+
+    # Reads are served from memory and appends are buffered writes
+    blocking = False
+    # One process owns the directory
+    shared = False
+
+    def __init__(self, directory: str, fsync: bool = False, compact_min_bytes: int = COMPACT_MIN_BYTES):
+        self.directory = directory
+        self.fsync = fsync
+        self.compact_min_bytes = compact_min_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._data: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._compacting = False
+
+        self._snapshot_bytes = self._replay(self._path(SNAPSHOT_FILE))
+        self._replay(self._path(COMPACTING_LOG_FILE))
+        self._log_bytes = self._replay(self._path(LOG_FILE), truncate_torn=True)
+        self._log = open(self._path(LOG_FILE), "ab")
+        atexit.register(self.close)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    # ==================== Loading ====================
+
+    def _replay(self, path: str, truncate_torn: bool = False) -> int:
+        """Apply a snapshot or log file to memory; returns the bytes of complete records"""
+        data = self._data
+        good = 0
+        for line in _lines(path):
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                break
+            if record[0] == "s":
+                data[record[1]] = record[2]
+            else:
+                data.pop(record[1], None)
+            good += len(line)
+
+        if truncate_torn and os.path.exists(path) and os.path.getsize(path) > good:
+            print(f"⚠️  Dropping a torn record at the end of {path}")
+            with open(path, "r+b") as f:
+                f.truncate(good)
+        return good
+
+    # ==================== Writes ====================
+
+    def _append(self, records: List[list]):
+        """Append records to the log (caller holds the lock)"""
+        payload = b"".join(orjson.dumps(record) + b"\n" for record in records)
+        self._log.write(payload)
+        self._log.flush()
+        if self.fsync:
+            os.fsync(self._log.fileno())
+        self._log_bytes += len(payload)
+        if (self._log_bytes >= self.compact_min_bytes
+                and self._log_bytes >= self._snapshot_bytes and not self._compacting):
+            self._compacting = True
+            threading.Thread(target=self._compact_quietly, daemon=True, name="log-store-compact").start()
+
+    def __setitem__(self, key: str, value: Any):
+        with self._lock:
+            self._append([["s", key, value]])
+            self._data[key] = value
+
+    def set_bulk(self, values: Dict[str, Any]):
+        """Write many keys with one log append"""
+        with self._lock:
+            self._append([["s", key, value] for key, value in values.items()])
+            self._data.update(values)
+
+    update = set_bulk
+
+    def __delitem__(self, key: str):
+        with self._lock:
+            if key not in self._data:
+                raise KeyError(key)
+            self._append([["d", key]])
+            del self._data[key]
+
+    # ==================== Reads ====================
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._data.get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._data)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def prefix(self, prefix: str) -> List[str]:
+        """Keys starting with prefix"""
+        with self._lock:
+            return [key for key in self._data if key.startswith(prefix)]
+
+    # ==================== Compaction ====================
+
+    def compact(self):
+        """
+        Write the current state as the snapshot and drop the log it covers.
+        Writes continue during compaction: the log is rotated under the lock
+        and the snapshot is written from a copy of the keyspace.
+        """
+        with self._compact_lock:
+            log, compacting = self._path(LOG_FILE), self._path(COMPACTING_LOG_FILE)
+            with self._lock:
+                self._log.close()
+                if os.path.exists(compacting):
+                    # An earlier compaction didn't finish: its log is kept until a snapshot covers it
+                    with open(compacting, "ab") as target, open(log, "rb") as source:
+                        shutil.copyfileobj(source, target)
+                    os.remove(log)
+                else:
+                    os.replace(log, compacting)
+                self._log = open(log, "ab")
+                self._log_bytes = 0
+                state = dict(self._data)
+
+            temp = self._path(SNAPSHOT_FILE + ".tmp")
+            size = 0
+            with open(temp, "wb") as f:
+                for key, value in state.items():
+                    line = orjson.dumps(["s", key, value]) + b"\n"
+                    f.write(line)
+                    size += len(line)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp, self._path(SNAPSHOT_FILE))
+            os.remove(compacting)
+            self._snapshot_bytes = size
+
+    def _compact_quietly(self):
+        """Background compaction: failures are logged and retried after more writes"""
+        try:
+            self.compact()
+        except Exception as e:
+            print(f"⚠️  Local store compaction failed: {e}")
+        finally:
+            self._compacting = False
+
+    def close(self):
+        """Flush and sync the log"""
+        with self._lock:
+            if not self._log.closed:
+                self._log.flush()
+                os.fsync(self._log.fileno())
+                self._log.close()
+
+
+__all__ = ["LogStore", "COMPACT_MIN_BYTES"]
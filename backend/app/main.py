@@ -4,8 +4,13 @@ from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from datetime import datetime
+import asyncio
 from app.config import settings
-from app.replit_db import REPLIT_DB_AVAILABLE
+from app.replit_db import REPLIT_DB_AVAILABLE, STORAGE_BACKEND, without_version
+from app.changes import change_feed
+from app.write_buffer import async_write_buffer
+from app.storage_metrics import RouteContextMiddleware
+from app.archive import run_archiver
 from app.gemini_ai import GEMINI_AVAILABLE, REPLIT_AI_AVAILABLE
 from app.replit_auth import REPLIT_AUTH_AVAILABLE
 import os
@@ -15,12 +20,19 @@ from app.routers import auth, rooms, participants, spectators, debate, ai, train
 from app.socketio_app import sio
 import socketio
 
+class APIResponse(ORJSONResponse):
+    """orjson response without storage-internal fields (document versions)"""
+
+    def render(self, content) -> bytes:
+        return super().render(without_version(content))
+
+
 # Create FastAPI app with orjson for 3-5x faster JSON serialization
 app = FastAPI(
     title="Oratio - AI Debate Platform",
     description="Backend API for Oratio debate platform with AI judging",
     version="1.0.0",
-    default_response_class=ORJSONResponse  # Use orjson for all responses (3-5x faster)
+    default_response_class=APIResponse  # Use orjson for all responses (3-5x faster)
 )
 
 # Mount Socket.IO
@@ -55,6 +67,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Attribute storage calls to the route being served (see /api/utils/storage-metrics)
+app.add_middleware(RouteContextMiddleware)
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(rooms.router)
@@ -76,12 +91,19 @@ async def startup():
     print("🚀 Oratio API Starting...")
     print("=" * 60)
 
+    # Writes made on executor threads schedule async change handlers here
+    change_feed.bind_loop(asyncio.get_running_loop())
+
+    # Move completed debates to cold storage (ARCHIVE_AFTER_HOURS)
+    if settings.ARCHIVE_AFTER_HOURS > 0:
+        asyncio.create_task(run_archiver(settings.ARCHIVE_AFTER_HOURS))
+
     # Detect if running on Render
     is_render = os.getenv("RENDER") == "true"
 
     # Check features availability
     features = {
-        "Database": "✅ Replit DB" if REPLIT_DB_AVAILABLE else "⚠️  In-memory",
+        "Database": {"replit": "✅ Replit DB", "sqlite": "✅ SQLite", "sharded": "✅ Sharded KV", "local": "✅ Local log store"}.get(STORAGE_BACKEND, "⚠️  In-memory"),
         "AI Provider": "✅ Gemini AI (Primary)" if GEMINI_AVAILABLE else
         ("✅ Replit AI (Fallback)" if REPLIT_AI_AVAILABLE else "⚠️  Static responses"),
         "Backend": "✅ Render (Production)" if is_render else "✅ Replit (Dev)",
@@ -103,6 +125,8 @@ async def startup():
 async def shutdown():
     """Run on application shutdown"""
     print("👋 Shutting down Oratio API...")
+    # Commit writes still inside the coalescing window
+    await async_write_buffer.flush()
 
 
 # Health check endpoint
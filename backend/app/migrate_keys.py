@@ -0,0 +1,63 @@
+"""
+Key layout migration for Oratio
+Rewrites the documents of room-owned collections (ROOM_SCOPED) between the
+flat layout (collection:id) and the room-scoped layout
+(room:<room_id>:<kind>:<id>) used when ROOM_SCOPED_KEYS is enabled.
+
+Run with:
+    python -m app.migrate_keys          # flat -> room-scoped
+    python -m app.migrate_keys --flat   # room-scoped -> flat
+"""
+import sys
+from typing import Dict
+from app.replit_db import ReplitDB, ROOM_SCOPED, db, doc_cache
+from app.serialization import decode_document
+
+
+def migrate_key_layout(room_scoped: bool = True) -> Dict[str, int]:
+    """
+    Move every ROOM_SCOPED document to the requested layout.
+    Safe to re-run: each document is written to its new key (and locator)
+    before the old key is deleted, and already-moved documents are skipped.
+    """
+    moved = {}
+    for collection in ROOM_SCOPED:
+        moved[collection] = 0
+        if room_scoped:
+            for key in ReplitDB._keys_with_prefix(f"{collection}:"):
+                value = db.get(key)
+                if not value:
+                    continue
+                doc_id = key[len(collection) + 1:]
+                doc = decode_document(ReplitDB._resolve_chunks(collection, [doc_id], [key], [value])[0])
+                if doc.get("room_id") is None:
+                    continue
+                new_key = ReplitDB._room_key(collection, doc["room_id"], doc_id)
+                db[new_key] = value
+                db[ReplitDB._locator_key(collection, doc_id)] = new_key
+                del db[key]
+                moved[collection] += 1
+        else:
+            prefix = f"_loc:{collection}:"
+            for locator_key in ReplitDB._keys_with_prefix(prefix):
+                doc_id = locator_key[len(prefix):]
+                room_key = db.get(locator_key)
+                value = db.get(room_key) if room_key else None
+                if value:
+                    db[ReplitDB._make_key(collection, doc_id)] = value
+                    del db[room_key]
+                    moved[collection] += 1
+                del db[locator_key]
+
+    doc_cache.clear()
+    ReplitDB._locators.clear()
+    return moved
+
+
+if __name__ == "__main__":
+    to_room_scoped = "--flat" not in sys.argv[1:]
+    layout = "room-scoped" if to_room_scoped else "flat"
+    migrated = migrate_key_layout(to_room_scoped)
+    for name, total in migrated.items():
+        print(f"✅ Moved {total} {name} documents to the {layout} layout")
+    print(f"🏁 Key migration complete ({sum(migrated.values())} documents)")
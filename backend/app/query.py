@@ -0,0 +1,118 @@
+"""
+Query engine for Oratio storage backends
+Runs filter -> sort -> cursor/offset -> limit -> projection over a stream of
+documents, and encodes opaque keyset cursors for pagination.
+"""
+import base64
+from itertools import islice
+from typing import Optional, List, Dict, Any, Iterable, Tuple
+import orjson
+
+ASCENDING = 1
+DESCENDING = -1
+
+# [(field, ASCENDING | DESCENDING), ...]
+Sort = List[Tuple[str, int]]
+
+
+def matches(doc: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+    """Equality match of every filter field"""
+    return all(doc.get(k) == v for k, v in filter.items()) if filter else True
+
+
+def order_value(value: Any) -> Tuple:
+    """Total order over JSON values: None < numbers < strings < objects/arrays"""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (bool, int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (3, orjson.dumps(value, option=orjson.OPT_SORT_KEYS).decode())
+
+
+def effective_sort(sort: Optional[Sort]) -> Sort:
+    """Requested sort with id as the final tie-breaker, so every position is unique"""
+    sort = list(sort or [])
+    if not any(field == "id" for field, _ in sort):
+        sort.append(("id", ASCENDING))
+    return sort
+
+
+def sort_documents(docs: List[Dict[str, Any]], sort: Sort) -> List[Dict[str, Any]]:
+    """Sort in place by several fields (stable sort, least significant field first)"""
+    for field, direction in reversed(sort):
+        docs.sort(key=lambda d: order_value(d.get(field)), reverse=direction == DESCENDING)
+    return docs
+
+
+def _is_after(doc: Dict[str, Any], position: List[Any], sort: Sort) -> bool:
+    """Whether doc sorts strictly after the cursor position"""
+    for (field, direction), cursor_value in zip(sort, position):
+        a, b = order_value(doc.get(field)), order_value(cursor_value)
+        if a != b:
+            return (a > b) if direction == ASCENDING else (a < b)
+    return False
+
+
+def encode_cursor(doc: Dict[str, Any], sort: Sort) -> str:
+    """Opaque cursor pointing just after doc"""
+    position = [doc.get(field) for field, _ in sort]
+    return base64.urlsafe_b64encode(orjson.dumps(position)).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Position stored in a cursor; ValueError if it is malformed"""
+    try:
+        position = orjson.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(position, list):
+        raise ValueError("Invalid cursor")
+    return position
+
+
+def project(doc: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """Keep only the requested fields (id is always kept)"""
+    if not fields:
+        return doc
+    return {f: doc[f] for f in ("id", *fields) if f in doc}
+
+
+def run_query(
+    docs: Iterable[Dict[str, Any]],
+    filter: Optional[Dict[str, Any]] = None,
+    sort: Optional[Sort] = None,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    fields: Optional[List[str]] = None,
+    cursor: Optional[str] = None,
+    paginate: bool = False,
+    presorted: bool = False
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Evaluate a query over docs (in storage order, or already in sort order when
+    presorted). Unsorted, non-paginated queries stop reading docs as soon as
+    the page is full. Returns the page and, when paginating, the next cursor.
+    """
+    matching = (doc for doc in docs if matches(doc, filter))
+
+    if sort or paginate or cursor:
+        order = effective_sort(sort)
+        if not presorted:
+            matching = iter(sort_documents(list(matching), order))
+        if cursor:
+            position = decode_cursor(cursor)
+            matching = (doc for doc in matching if _is_after(doc, position, order))
+    else:
+        order = None
+
+    stop = None if limit is None else offset + limit + (1 if paginate else 0)
+    page = list(islice(matching, offset, stop))
+
+    next_cursor = None
+    if paginate and limit is not None and len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor(page[-1], order)
+
+    return [project(doc, fields) for doc in page], next_cursor
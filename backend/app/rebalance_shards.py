@@ -0,0 +1,29 @@
+"""
+Shard rebalancing for Oratio
+After appending shards to REPLIT_DB_SHARDS, moves every key that the hash
+ring now assigns to another shard. Run it before serving traffic on the
+new shard list (keys that have not moved yet are not found).
+
+Run with:
+    python -m app.rebalance_shards
+"""
+from typing import Dict
+from app.replit_db import ReplitDB, db, doc_cache
+from app.sharding import ShardedStore, rebalance
+
+
+def rebalance_shards() -> Dict[str, int]:
+    """Rebalance the configured sharded store; returns keys moved per shard"""
+    if not isinstance(db, ShardedStore):
+        raise RuntimeError("Storage is not sharded (set REPLIT_DB_SHARDS)")
+    moved = rebalance(db)
+    doc_cache.clear()
+    ReplitDB._locators.clear()
+    return moved
+
+
+if __name__ == "__main__":
+    moved = rebalance_shards()
+    for name, total in moved.items():
+        print(f"✅ Moved {total} keys off shard {name}")
+    print(f"🏁 Rebalance complete ({sum(moved.values())} keys across {len(moved)} shards)")
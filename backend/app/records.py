@@ -0,0 +1,160 @@
+"""
+Compact typed records for hot documents
+Turns, participants, rooms and spectator votes are loaded in bulk for every
+room view and results computation. As plain dicts each one carries its own
+hash table; these records keep known fields in __slots__, intern short
+repeated strings (IDs, roles, statuses) and put unknown fields in `extra`,
+so to_dict() gives back exactly the stored document.
+
+Records are read-only once built (they are shared through caches); use
+replace() to derive a changed copy.
+"""
+import sys
+from typing import List, Dict, Any, Iterable, Tuple, FrozenSet, Union
+from app.replit_db import VERSION_FIELD
+from app.serialization import decode_document
+
+
+class Record:
+    """Base class: subclasses list their stored fields in FIELDS (and __slots__)"""
+
+    __slots__ = ("extra",)
+
+    # Stored field names, in the order to_dict() emits them
+    FIELDS: Tuple[str, ...] = ()
+    # Fields whose string values repeat across documents and are interned
+    INTERNED: FrozenSet[str] = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._field_set = frozenset(cls.FIELDS)
+        # Slot descriptors' setters: the cheapest way to fill a read-only record
+        cls._setters = {name: cls.__dict__[name].__set__ for name in cls.FIELDS}
+
+    @classmethod
+    def from_dict(cls, doc: Dict[str, Any]):
+        """Build a record from a decoded document (fields absent from doc stay absent)"""
+        record = _new(cls)
+        setters, interned = cls._setters, cls.INTERNED
+        extra = None
+        for key, value in doc.items():
+            setter = setters.get(key)
+            if setter is not None:
+                if type(value) is str and key in interned:
+                    value = _intern(value)
+                setter(record, value)
+            elif extra is None:
+                extra = {key: value}
+            else:
+                extra[key] = value
+        _set_extra(record, extra)
+        return record
+
+    @classmethod
+    def from_dicts(cls, docs: Iterable[Dict[str, Any]]) -> list:
+        """Build records from many decoded documents"""
+        from_dict = cls.from_dict
+        return [from_dict(doc) for doc in docs]
+
+    @classmethod
+    def decode(cls, value: Union[str, bytes]):
+        """Build a record straight from a stored value (any codec)"""
+        if isinstance(value, bytes):
+            value = value.decode()
+        return cls.from_dict(decode_document(value))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The stored document (nested values are shared, not copied)"""
+        doc = {}
+        for name in self.FIELDS:
+            try:
+                doc[name] = getattr(self, name)
+            except AttributeError:
+                pass
+        if self.extra:
+            doc.update(self.extra)
+        return doc
+
+    def replace(self, **changes):
+        """Copy of this record with some fields changed"""
+        return type(self).from_dict({**self.to_dict(), **changes})
+
+    # ==================== Dict-style reads ====================
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """Field value, or default when the document doesn't have it"""
+        if name in self._field_set:
+            return getattr(self, name, default)
+        return self.extra.get(name, default) if self.extra else default
+
+    def __getitem__(self, name: str) -> Any:
+        value = self.get(name, _MISSING)
+        if value is _MISSING:
+            raise KeyError(name)
+        return value
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name, _MISSING) is not _MISSING
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError(f"{type(self).__name__} records are read-only; use replace()")
+
+    def __eq__(self, other) -> bool:
+        return type(other) is type(self) and other.to_dict() == self.to_dict()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+_MISSING = object()
+_new = object.__new__
+_intern = sys.intern
+_set_extra = Record.__dict__["extra"].__set__
+
+
+class Turn(Record):
+    """A debate turn (collection: turns)"""
+
+    FIELDS = ("id", "room_id", "speaker_id", "content", "audio_url", "round_number",
+              "turn_number", "ai_feedback", "timestamp", "created_at", "updated_at", VERSION_FIELD)
+    INTERNED = frozenset({"id", "room_id", "speaker_id"})
+    __slots__ = FIELDS
+
+
+class Participant(Record):
+    """A room participant, human or AI (collection: participants)"""
+
+    FIELDS = ("id", "room_id", "user_id", "username", "team", "role", "position", "is_ready",
+              "is_ai", "score", "xp_earned", "reaction_count", "joined_at", "created_at", "updated_at", VERSION_FIELD)
+    INTERNED = frozenset({"id", "room_id", "user_id", "team", "role"})
+    __slots__ = FIELDS
+
+
+class Room(Record):
+    """A debate room (collection: rooms)"""
+
+    FIELDS = ("id", "topic", "description", "scheduled_time", "duration_minutes", "mode", "type",
+              "visibility", "rounds", "status", "host_id", "resources", "room_code", "is_training",
+              "created_at", "updated_at", VERSION_FIELD)
+    INTERNED = frozenset({"id", "mode", "type", "visibility", "status", "host_id"})
+    __slots__ = FIELDS
+
+
+class Vote(Record):
+    """A spectator reaction (collection: spectator_votes)"""
+
+    FIELDS = ("id", "room_id", "spectator_id", "target_id", "reaction_type", "timestamp",
+              "created_at", "updated_at", VERSION_FIELD)
+    INTERNED = frozenset({"id", "room_id", "spectator_id", "target_id", "reaction_type"})
+    __slots__ = FIELDS
+
+
+def group_by(records: Iterable[Record], field: str) -> Dict[Any, List[Record]]:
+    """Records grouped by one field's value, in one pass"""
+    groups: Dict[Any, List[Record]] = {}
+    for record in records:
+        groups.setdefault(record.get(field), []).append(record)
+    return groups
+
+
+__all__ = ["Record", "Turn", "Participant", "Room", "Vote", "group_by"]
@@ -17,7 +17,7 @@ except ImportError:
     REPLIT_AUTH_AVAILABLE = False
     print("⚠️  Replit Auth not available, using simple token auth")
 
-from app.replit_db import DB, Collections
+from app.replit_db import AsyncDB, Collections
 
 security = HTTPBearer(auto_error=False)
 
@@ -49,12 +49,12 @@ class ReplitAuth:
         return None
 
     @staticmethod
-    def create_or_get_user(replit_username: str) -> Dict[str, Any]:
+    async def create_or_get_user(replit_username: str) -> Dict[str, Any]:
         """
         Create user or get existing user from Replit auth
         """
         # Check if user exists
-        existing_user = DB.find_one(
+        existing_user = await AsyncDB.find_one(
             Collections.USERS,
             {"username": replit_username}
         )
@@ -74,10 +74,10 @@ class ReplitAuth:
             "bio": None
         }
 
-        return DB.insert(Collections.USERS, new_user)
+        return await AsyncDB.insert(Collections.USERS, new_user)
 
     @staticmethod
-    def create_session(user_id: str) -> str:
+    async def create_session(user_id: str) -> str:
         """
         Create session token for user
         """
@@ -87,36 +87,36 @@ class ReplitAuth:
             "user_id": user_id,
             "expires_at": None  # Sessions don't expire in demo
         }
-        DB.insert(Collections.SESSIONS, session_data)
+        await AsyncDB.insert(Collections.SESSIONS, session_data)
         return token
 
     @staticmethod
-    def get_user_from_token(token: str) -> Optional[Dict[str, Any]]:
+    async def get_user_from_token(token: str) -> Optional[Dict[str, Any]]:
         """
         Get user from session token
         """
-        session = DB.get(Collections.SESSIONS, token)
+        session = await AsyncDB.get(Collections.SESSIONS, token)
         if not session:
             return None
 
         user_id = session.get("user_id")
         if not user_id:
             return None
-        return DB.get(Collections.USERS, str(user_id))
+        return await AsyncDB.get(Collections.USERS, str(user_id))
 
     @staticmethod
-    def simple_auth_register(username: str, email: str, password: str) -> Dict[str, Any]:
+    async def simple_auth_register(username: str, email: str, password: str) -> Dict[str, Any]:
         """
         Simple registration for local development (when Replit Auth unavailable)
         """
         try:
             # Check if user exists
-            existing = DB.find_one(Collections.USERS, {"email": email})
+            existing = await AsyncDB.find_one(Collections.USERS, {"email": email})
             if existing:
                 raise HTTPException(
                     status_code=400, detail="User already exists")
 
-            existing_username = DB.find_one(
+            existing_username = await AsyncDB.find_one(
                 Collections.USERS, {"username": username})
             if existing_username:
                 raise HTTPException(
@@ -135,13 +135,13 @@ class ReplitAuth:
                 "bio": None
             }
 
-            user = DB.insert(Collections.USERS, new_user)
+            user = await AsyncDB.insert(Collections.USERS, new_user)
             if not user or "id" not in user:
                 print(f"❌ Registration failed: user insert returned {user}")
                 raise Exception("Failed to create user")
 
             print(f"✅ User registered: {user['username']} (id: {user['id']})")
-            token = ReplitAuth.create_session(str(user["id"]))
+            token = await ReplitAuth.create_session(str(user["id"]))
 
             return {"user": user, "token": token}
         except HTTPException:
@@ -151,15 +151,15 @@ class ReplitAuth:
             raise Exception(f"Registration failed: {str(e)}")
 
     @staticmethod
-    def simple_auth_login(email: str, password: str) -> Dict[str, Any]:
+    async def simple_auth_login(email: str, password: str) -> Dict[str, Any]:
         """
         Simple login for local development
         """
-        user = DB.find_one(Collections.USERS, {"email": email})
+        user = await AsyncDB.find_one(Collections.USERS, {"email": email})
         if not user or user.get("password_hash") != password:
             raise HTTPException(status_code=401, detail="Invalid credentials")
 
-        token = ReplitAuth.create_session(user["id"])
+        token = await ReplitAuth.create_session(user["id"])
         return {"user": user, "token": token}
 
 
@@ -175,14 +175,14 @@ async def get_current_user(
     if REPLIT_AUTH_AVAILABLE:
         replit_user = ReplitAuth.get_current_user_from_replit()
         if replit_user:
-            return ReplitAuth.create_or_get_user(replit_user["username"])
+            return await ReplitAuth.create_or_get_user(replit_user["username"])
 
     # Fall back to token auth
     if not credentials:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
     token = credentials.credentials
-    user = ReplitAuth.get_user_from_token(token)
+    user = await ReplitAuth.get_user_from_token(token)
 
     if not user:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
@@ -2,10 +2,30 @@
 Replit Database wrapper for Oratio
 Uses Replit's built-in key-value database instead of SQL
 """
+import asyncio
+import base64
+import contextlib
+import contextvars
+import functools
+import hashlib
 import json
-from typing import Optional, List, Dict, Any
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Tuple, Iterable
 from datetime import datetime
 import os
+from app.config import settings
+from app import serialization
+from app.serialization import encode_document, decode_document, compress_value, ZSTD_AVAILABLE
+from app.changes import change_feed, INSERT, UPDATE, DELETE
+from app.query import ASCENDING, DESCENDING, Sort, matches, run_query
+from app.sharding import ShardedStore
+from app.replit_db_client import ReplitDBClient
+from app.local_store import LogStore
+from app.storage_metrics import instrumented, tally, payload_size
 
 # Try to import Replit DB, fallback to dict for local development
 try:
@@ -13,117 +33,1381 @@ try:
     REPLIT_DB_AVAILABLE = True
     print("✅ Using Replit Database")
 except ImportError:
-    # Fallback to in-memory dict for local development
-    db = {}
     REPLIT_DB_AVAILABLE = False
-    print("⚠️  Replit DB not available, using in-memory storage (data will not persist)")
+    if settings.LOCAL_STORE_DIR:
+        # Durable local store for self-hosted deployments
+        db = LogStore(settings.LOCAL_STORE_DIR, fsync=settings.LOCAL_STORE_FSYNC)
+        print(f"✅ Replit DB not available, using local storage in {settings.LOCAL_STORE_DIR} ({len(db)} keys)")
+    else:
+        # Fallback to in-memory dict for local development
+        db = {}
+        print("⚠️  Replit DB not available, using in-memory storage (data will not persist)")
+
+# DATABASE_URL=replit+http://host:port talks the Replit DB wire protocol to
+# that endpoint (e.g. the local stand-in, python -m app.replit_db_server)
+if settings.DATABASE_URL.startswith("replit+http"):
+    db = ReplitDBClient(settings.DATABASE_URL[len("replit+"):])
+    print(f"✅ Using Replit DB endpoint {db.url}")
+
+# Optionally spread keys over several shards (REPLIT_DB_SHARDS)
+if settings.REPLIT_DB_SHARDS:
+    db = ShardedStore.from_setting(settings.REPLIT_DB_SHARDS)
+    print(f"✅ Sharding storage keys over {len(db.shards)} shards: {', '.join(db.shards)}")
+
+# Bulk operations dispatch their per-key HTTP round trips concurrently
+_bulk_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="replit-db")
+
+# AsyncReplitDB runs blocking storage calls here, off the event loop
+_async_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="replit-db-async")
+
+# Serializes in-process read-modify-write of counters and index id lists
+# (process-local stores only, and this worker's own counter slots on shared
+# ones; see ReplitDB.SHARED_STORE), which may now run concurrently on
+# executor threads
+_rmw_lock = threading.RLock()
+
+# Per-document locks (striped by key) that make version checks and
+# increments atomic within the process
+_doc_locks = [threading.RLock() for _ in range(64)]
+
+# Document field holding its version, bumped on every write
+VERSION_FIELD = "_version"
+
+
+def without_version(value: Any) -> Any:
+    """
+    value with the version field removed from every document in it (dicts
+    and lists are copied only where one is removed): versions are a storage
+    detail, kept out of API responses and broadcasts
+    """
+    if isinstance(value, dict):
+        stripped = {key: without_version(item) for key, item in value.items() if key != VERSION_FIELD}
+        if len(stripped) == len(value) and all(stripped[key] is value[key] for key in stripped):
+            return value
+        return stripped
+    if isinstance(value, list):
+        stripped = [without_version(item) for item in value]
+        return value if all(new is old for new, old in zip(stripped, value)) else stripped
+    return value
+
+
+def _doc_lock(key: str) -> threading.RLock:
+    """Lock guarding read-modify-write of one document key"""
+    return _doc_locks[hash(key) % len(_doc_locks)]
+
+
+@contextlib.contextmanager
+def _doc_locks_for(keys: List[str]):
+    """Hold the locks of many document keys (acquired in a fixed order)"""
+    with contextlib.ExitStack() as stack:
+        for index in sorted({hash(key) % len(_doc_locks) for key in keys}):
+            stack.enter_context(_doc_locks[index])
+        yield
+
+
+def apply_update(doc: Dict[str, Any], data: Dict[str, Any], now: str):
+    """Merge data into doc and bump its version"""
+    version = doc.get(VERSION_FIELD, 0)
+    doc.update(data)
+    doc[VERSION_FIELD] = version + 1
+    doc["updated_at"] = now
+
+
+class VersionConflict(Exception):
+    """An update expected a document version that is no longer current"""
+
+    def __init__(self, collection: str, id: str, expected: int, actual: int):
+        super().__init__(
+            f"{collection}:{id} is at version {actual}, expected {expected}")
+        self.collection = collection
+        self.id = id
+        self.expected = expected
+        self.actual = actual
+
+
+# IDs reserved per counter update by the hi/lo allocator
+ID_BLOCK_SIZE = 100
+
+# Digits of the random worker suffix of IDs allocated from stores without
+# atomic updates (two workers share one with odds 1 in 10**WORKER_ID_DIGITS)
+WORKER_ID_DIGITS = 8
+
+
+class IdAllocator:
+    """
+    Hi/lo ID allocator.
+    Reserves blocks of IDs per process by advancing the collection counter
+    (_{collection}_counter, the highest reserved ID), then hands IDs out from
+    memory. Unused IDs of a block are skipped after a restart, so IDs stay
+    unique but may have gaps.
+
+    Stores with an atomic increment (incr(), e.g. SQLite shards) reserve a
+    block in one write transaction, so workers never share one; process-local
+    stores reserve under a process lock. Replit DB has no atomic update, so
+    two workers can reserve the same block there: their IDs are kept apart by
+    a random per-process suffix of WORKER_ID_DIGITS digits (IDs stay numeric).
+    """
+
+    def __init__(self, block_size: int = ID_BLOCK_SIZE, store=None):
+        self.block_size = block_size
+        self._store = store
+        self._blocks: Dict[str, Tuple[int, int, str]] = {}  # collection -> (next, last, suffix)
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        """Backing key-value store (the module-level db unless overridden)"""
+        return db if self._store is None else self._store
+
+    def allocate(self, collection: str, count: int = 1) -> List[str]:
+        """Hand out count unique IDs, reserving new blocks as needed"""
+        ids: List[str] = []
+        with self._lock:
+            while len(ids) < count:
+                next_id, last_id, suffix = self._blocks.get(collection, (1, 0, ""))
+                if next_id > last_id:
+                    next_id, last_id, suffix = self._reserve(
+                        collection, max(self.block_size, count - len(ids)))
+                take = min(last_id - next_id + 1, count - len(ids))
+                ids.extend(f"{i}{suffix}" for i in range(next_id, next_id + take))
+                self._blocks[collection] = (next_id + take, last_id, suffix)
+        return ids
+
+    def _reserve(self, collection: str, size: int) -> Tuple[int, int, str]:
+        """Claim the next block of size IDs; returns (first, last, ID suffix)"""
+        counter_key = f"_{collection}_counter"
+        store = _store_of(self.store, counter_key)
+        if hasattr(store, "incr"):
+            last = store.incr(counter_key, size)
+            return last - size + 1, last, ""
+        with _rmw_lock:
+            # Never below our own last block: a racing worker may have set the counter back
+            current = max(int(store.get(counter_key) or 0), self._blocks.get(collection, (1, 0, ""))[1])
+            store[counter_key] = current + size
+        shared = getattr(store, "shared", not isinstance(store, dict))
+        return current + 1, current + size, worker_id() if shared else ""
+
+    def _after_fork(self):
+        """Forget the parent's blocks in a forked child"""
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+
+def _store_of(store, key: str):
+    """The store that holds key (its shard, for a sharded store)"""
+    if isinstance(store, ShardedStore):
+        return store.shards[store.shard_of(key)]
+    return store
+
+
+_worker_id = ""
+
+
+def worker_id() -> str:
+    """
+    Random ID of this process (WORKER_ID_DIGITS digits), naming what it
+    writes to stores without atomic updates: its IDs and counter slots
+    """
+    global _worker_id
+    if not _worker_id:
+        _worker_id = str(secrets.randbelow(10 ** WORKER_ID_DIGITS)).zfill(WORKER_ID_DIGITS)
+    return _worker_id
+
+
+def _after_fork():
+    global _worker_id
+    _worker_id = ""
+    _id_allocator._after_fork()
+
+
+_id_allocator = IdAllocator()
+# A forked worker must not hand out IDs from its parent's blocks, or share its worker ID
+os.register_at_fork(after_in_child=_after_fork)
+
+# Resolved room-scoped locators kept in memory (they only change if a
+# document moves to another room)
+LOCATOR_CACHE_SIZE = 50000
+_locator_lock = threading.Lock()
+
+
+def _id_order(doc_id: str) -> Tuple[int, str]:
+    """Sort key putting numeric IDs in numeric order"""
+    return (len(doc_id), doc_id)
+
+
+# Documents fetched per storage round trip while evaluating a find
+QUERY_BATCH_SIZE = 100
+
+# Large values: a value longer than VALUE_CHUNK_BYTES is stored as the
+# manifest "c1:<count>:<digest>" with its pieces under
+# _chunk:collection:id:<digest>:<n>. Chunks are content-addressed, so a reader
+# never mixes pieces of two versions; it retries if they were replaced.
+CHUNKED_TAG = "c1"
+CHUNK_READ_RETRIES = 3
+
+# Collections whose values are zstd-compressed (settings.COMPRESS_COLLECTIONS)
+COMPRESSED_COLLECTIONS = {c.strip() for c in settings.COMPRESS_COLLECTIONS.split(",") if c.strip()}
+if COMPRESSED_COLLECTIONS and not ZSTD_AVAILABLE:
+    print("⚠️  COMPRESS_COLLECTIONS is set but zstandard is not installed; values are stored uncompressed")
+    COMPRESSED_COLLECTIONS = set()
+# Room archives (Collections.ARCHIVES, see app.archive) are large and write-once
+if ZSTD_AVAILABLE:
+    COMPRESSED_COLLECTIONS.add("archives")
+
+# Trained compression dictionaries are stored in the keyspace as _zdict:<id>
+serialization.dictionary_loader = lambda dict_id: base64.b64decode(db.get(f"_zdict:{dict_id}") or "")
+
+# Decoded-document cache bounds
+DOC_CACHE_SIZE = 5000
+DOC_CACHE_TTL_SECONDS = 5
+
+
+def _copy_document(value):
+    """Copy a decoded JSON document (dicts and lists are copied, scalars shared)"""
+    if type(value) is dict:
+        return {k: _copy_document(v) if type(v) in (dict, list) else v for k, v in value.items()}
+    return [_copy_document(v) if type(v) in (dict, list) else v for v in value]
+
+
+class DocumentCache:
+    """
+    Size-bounded LRU of decoded documents keyed by storage key (collection:id).
+    ReplitDB keeps it write-through on insert/update/delete. Documents are
+    copied on the way in and out, so callers can mutate what they get.
+    Entries expire after ttl_seconds, which bounds staleness against writes
+    made by other worker processes.
+    """
+
+    def __init__(self, max_entries: int = DOC_CACHE_SIZE, ttl_seconds: float = DOC_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Copy of the cached document, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            doc = entry[1]
+        return _copy_document(doc)
+
+    def put(self, key: str, doc: Dict[str, Any]):
+        """Cache a copy of doc, evicting the least recently used entries"""
+        entry = (time.monotonic() + self.ttl_seconds, _copy_document(doc))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: str):
+        """Drop one cached document"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_prefix(self, prefix: str):
+        """Drop every cached document whose key starts with prefix"""
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+
+    def clear(self):
+        """Drop all cached documents"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+        }
+
+
+doc_cache = DocumentCache()
 
 
 class ReplitDB:
     """
     Wrapper around Replit Database for structured data storage.
     Collections are stored with prefixed keys: collection_name:id
+    With ROOM_SCOPED_KEYS, room-owned collections (ROOM_SCOPED) are stored
+    under room:<room_id>:<kind>:<id> so a room's documents are one prefix
+    listing, with _loc:collection:id -> key locators for lookups by ID
+    Secondary indexes are stored as _idx:collection:field:value -> [ids] in
+    process-local stores; in stores other processes write to as well
+    (SHARED_STORE) each entry is its own key, _idx:collection:field:value:id,
+    so concurrent writers never overwrite each other's entries
+    Documents are encoded with the configured codec (app.serialization),
+    optionally zstd-compressed, and split into chunks when very large
+
+    Every insert/update/delete is published to app.changes.change_feed.
+
+    Every document carries a version (_version) bumped on each write.
+    update(..., expected_version=n) is a compare-and-set, atomic within the
+    process; Replit DB has no server-side CAS, so across workers only the
+    SQLite backend gives the same guarantee.
+    increment() updates counter fields (COUNTERS). On a SHARED_STORE the
+    delta goes to a counter key, _ctr:collection:id:field:slot, which reads
+    add to the stored field: slot 0 updated with the store's atomic incr()
+    where it has one (SQLite shards), otherwise one slot per worker
+    (worker_id()) that only that worker writes, so no increment is lost.
     """
 
+    # Replit DB calls are blocking HTTP requests; the in-memory dict is not
+    # (a sharded store blocks unless every shard is in memory)
+    BLOCKING_IO = getattr(db, "blocking", REPLIT_DB_AVAILABLE)
+
+    # Whether other processes (workers, the archiver, CLI tools) may write to
+    # the store too: Replit DB and SQLite files are shared, the in-memory dict
+    # and the local log store belong to one process
+    SHARED_STORE = getattr(db, "shared", REPLIT_DB_AVAILABLE)
+
+    # (collection, field) pairs whose index is known to be built
+    _ready_indexes = set()
+
+    # Resolved _loc:collection:id -> room-scoped storage key
+    _locators: Dict[str, str] = {}
+
+    # Active compression dictionary ID per collection (0 = none)
+    _dictionary_ids: Dict[str, int] = {}
+
     @staticmethod
     def _generate_id(collection: str) -> str:
         """Generate unique ID for a collection"""
-        counter_key = f"_{collection}_counter"
-        current = db.get(counter_key, 0)
-        new_id = current + 1
-        db[counter_key] = new_id
-        return str(new_id)
+        return ReplitDB._generate_ids(collection, 1)[0]
+
+    @staticmethod
+    def _generate_ids(collection: str, count: int) -> List[str]:
+        """Generate count unique IDs from the per-process hi/lo allocator"""
+        return _id_allocator.allocate(collection, count)
+
+    @staticmethod
+    def reserve_ids(collection: str, count: int) -> List[str]:
+        """Reserve count IDs for documents inserted later (e.g. by a write buffer)"""
+        return ReplitDB._generate_ids(collection, count)
 
     @staticmethod
     def _make_key(collection: str, id: str) -> str:
-        """Create key for storage"""
+        """Create key for storage (flat layout; also the cache and lock key)"""
         return f"{collection}:{id}"
 
+    # ==================== Key layout ====================
+
+    @staticmethod
+    def _room_scoped(collection: str) -> bool:
+        """Whether the collection uses the room-scoped key layout"""
+        return ROOM_SCOPED_KEYS and collection in ROOM_SCOPED
+
+    @staticmethod
+    def _room_key(collection: str, room_id: Any, id: str) -> str:
+        """Room-scoped storage key: room:<room_id>:<kind>:<id>"""
+        return f"room:{room_id}:{ROOM_SCOPED[collection]}:{id}"
+
+    @staticmethod
+    def _locator_key(collection: str, id: str) -> str:
+        """Key pointing from a document ID to its room-scoped storage key"""
+        return f"_loc:{collection}:{id}"
+
+    @staticmethod
+    def _home_key(collection: str, doc: Dict[str, Any]) -> str:
+        """Storage key a document belongs at under the active layout"""
+        doc_id = str(doc["id"])
+        if ReplitDB._room_scoped(collection) and doc.get("room_id") is not None:
+            return ReplitDB._room_key(collection, doc["room_id"], doc_id)
+        return ReplitDB._make_key(collection, doc_id)
+
+    @staticmethod
+    def _remember_locator(locator_key: str, key: Optional[str]):
+        """Cache (or with key=None, forget) a resolved locator"""
+        with _locator_lock:
+            if key is None:
+                ReplitDB._locators.pop(locator_key, None)
+                return
+            ReplitDB._locators[locator_key] = key
+            while len(ReplitDB._locators) > LOCATOR_CACHE_SIZE:
+                ReplitDB._locators.pop(next(iter(ReplitDB._locators)))
+
+    @staticmethod
+    def _storage_keys(collection: str, ids: List[str]) -> Dict[str, str]:
+        """Where each document is stored (its flat key unless a locator says otherwise)"""
+        keys = {doc_id: ReplitDB._make_key(collection, doc_id) for doc_id in ids}
+        if not ReplitDB._room_scoped(collection):
+            return keys
+
+        unresolved = []
+        for doc_id in keys:
+            located = ReplitDB._locators.get(ReplitDB._locator_key(collection, doc_id))
+            if located:
+                keys[doc_id] = located
+            else:
+                unresolved.append(doc_id)
+
+        locator_keys = [ReplitDB._locator_key(collection, doc_id) for doc_id in unresolved]
+        for doc_id, locator_key, located in zip(unresolved, locator_keys, ReplitDB._get_raw_many(locator_keys)):
+            if located:
+                keys[doc_id] = located
+                ReplitDB._remember_locator(locator_key, located)
+        return keys
+
+    @staticmethod
+    def _keys_with_prefix(prefix: str) -> List[str]:
+        """Keys starting with prefix, via the store's native prefix query when it has one"""
+        if hasattr(db, "prefix"):
+            keys = list(db.prefix(prefix))
+        else:
+            keys = [k for k in list(db.keys()) if k.startswith(prefix)]
+        tally(keys_scanned=len(keys))
+        return keys
+
+    @staticmethod
+    def _ids_with_prefix(prefix: str) -> List[str]:
+        """Document IDs of the keys <prefix><id>"""
+        return [key[len(prefix):] for key in ReplitDB._keys_with_prefix(prefix)]
+
+    @staticmethod
+    def _collection_ids(collection: str) -> List[str]:
+        """IDs of every document in a collection, in ID order"""
+        ids = ReplitDB._ids_with_prefix(f"{collection}:")
+        if ReplitDB._room_scoped(collection):
+            ids = list(dict.fromkeys(ids + ReplitDB._ids_with_prefix(f"_loc:{collection}:")))
+        return sorted(ids, key=_id_order)
+
+    @staticmethod
+    def _room_ids(collection: str, room_id: Any) -> List[str]:
+        """IDs of a room's documents, from one prefix listing of its room-scoped keys"""
+        prefix = ReplitDB._room_key(collection, room_id, "")
+        return sorted(ReplitDB._ids_with_prefix(prefix), key=_id_order)
+
     @staticmethod
+    def collection_of_key(key: str) -> Optional[str]:
+        """Collection a document key belongs to (None for counters, indexes and locators)"""
+        if key.startswith("_"):
+            return None
+        if key.startswith("room:"):
+            parts = key.split(":")
+            kind = parts[2] if len(parts) >= 4 else None
+            return next((c for c, k in ROOM_SCOPED.items() if k == kind), None)
+        collection, sep, _ = key.partition(":")
+        return collection if sep else None
+
+    @staticmethod
+    def _write_documents(
+        collection: str,
+        docs: List[Dict[str, Any]],
+        current_keys: Optional[Dict[str, str]] = None,
+        new_ids: Iterable[str] = ()
+    ):
+        """
+        Store documents at their home keys in one batch, with locators for
+        room-scoped keys; documents whose home key changed are moved.
+        new_ids are IDs just generated, with no stored value to replace.
+        """
+        current_keys = current_keys or {}
+        new_ids = set(new_ids)
+        replaced = [doc for doc in docs if str(doc["id"]) not in new_ids]
+        replaced_chunks = ReplitDB._stored_chunks(
+            collection, {str(doc["id"]): current_keys.get(str(doc["id"])) or ReplitDB._home_key(collection, doc)
+                         for doc in replaced})
+        values: Dict[str, str] = {}
+        stale_keys = []
+        for doc in docs:
+            doc_id = str(doc["id"])
+            flat_key = ReplitDB._make_key(collection, doc_id)
+            locator_key = ReplitDB._locator_key(collection, doc_id)
+            key = ReplitDB._home_key(collection, doc)
+            ReplitDB._pack(collection, doc_id, key, ReplitDB._encode(collection, doc), values)
+
+            old_key = current_keys.get(doc_id)
+            if old_key and old_key != key:
+                stale_keys.append(old_key)
+                if old_key != flat_key and key == flat_key:
+                    stale_keys.append(locator_key)
+                    ReplitDB._remember_locator(locator_key, None)
+            if key != flat_key:
+                values[locator_key] = key
+                ReplitDB._remember_locator(locator_key, key)
+        # A rewrite with the same content keeps its chunks
+        stale_keys.extend(chunk_key for chunk_key in replaced_chunks if chunk_key not in values)
+
+        ReplitDB._set_raw_many(values)
+        ReplitDB._delete_raw_many(stale_keys)
+        for doc in docs:
+            cache_key = ReplitDB._make_key(collection, str(doc["id"]))
+            if ReplitDB._counted(collection):
+                # Written without its counter keys; the next read adds them
+                doc_cache.invalidate(cache_key)
+            else:
+                doc_cache.put(cache_key, doc)
+
+    @staticmethod
+    def _remove_documents(collection: str, storage_keys: Dict[str, str]):
+        """Delete documents (and their locators and chunks) stored at the given keys"""
+        keys = list(storage_keys.values()) + ReplitDB._stored_chunks(collection, storage_keys)
+        for doc_id, key in storage_keys.items():
+            if key != ReplitDB._make_key(collection, doc_id):
+                locator_key = ReplitDB._locator_key(collection, doc_id)
+                keys.append(locator_key)
+                ReplitDB._remember_locator(locator_key, None)
+            if ReplitDB._counted(collection):
+                keys.extend(ReplitDB._keys_with_prefix(ReplitDB._counter_prefix(collection, doc_id)))
+        ReplitDB._delete_raw_many(keys)
+        for doc_id in storage_keys:
+            doc_cache.invalidate(ReplitDB._make_key(collection, doc_id))
+
+    # ==================== Documents ====================
+
+    @staticmethod
+    @instrumented("insert")
     def insert(collection: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """Insert document into collection"""
+        new_ids = []
         if "id" not in data:
             data["id"] = ReplitDB._generate_id(collection)
+            new_ids.append(data["id"])
 
         if "created_at" not in data:
             data["created_at"] = datetime.utcnow().isoformat()
+        data.setdefault(VERSION_FIELD, 1)
 
-        key = ReplitDB._make_key(collection, str(data["id"]))
-        db[key] = json.dumps(data)
+        ReplitDB._write_documents(collection, [data], new_ids=new_ids)
+        ReplitDB._index_apply(collection, adds=ReplitDB._index_entries(collection, data))
+        change_feed.publish(INSERT, collection, data)
         return data
 
     @staticmethod
+    @instrumented("get")
     def get(collection: str, id: str) -> Optional[Dict[str, Any]]:
         """Get document by ID"""
-        key = ReplitDB._make_key(collection, id)
-        value = db.get(key)
-        return json.loads(value) if value else None
+        doc = doc_cache.get(ReplitDB._make_key(collection, id))
+        if doc is not None:
+            tally(cache_hits=1)
+            return doc
+        return ReplitDB._load(collection, str(id))[0]
 
     @staticmethod
-    def update(collection: str, id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Update document"""
-        existing = ReplitDB.get(collection, id)
-        if not existing:
-            return None
+    def _load(collection: str, id: str, counters: bool = True) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Fetch and decode a document from storage, refreshing the cache; also returns its storage key"""
+        docs, storage_keys = ReplitDB._fetch_many(collection, [id], counters=counters)
+        return docs.get(id), storage_keys[id]
+
+    @staticmethod
+    def cache_stats() -> Dict[str, Any]:
+        """Decoded-document cache hit/miss counters"""
+        return doc_cache.stats()
+
+    @staticmethod
+    @instrumented("update")
+    def update(
+        collection: str,
+        id: str,
+        data: Dict[str, Any],
+        expected_version: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Update document.
+        With expected_version, only applies if the stored document is still at
+        that version (documents written before versioning are at 0), and
+        raises VersionConflict otherwise.
+        """
+        id = str(id)
+        with _doc_lock(ReplitDB._make_key(collection, id)):
+            # Merge onto the stored version, not a possibly stale cached copy
+            # (without its counter keys, which stay separate)
+            existing, storage_key = ReplitDB._load(collection, id, counters=False)
+            if not existing:
+                return None
+
+            version = existing.get(VERSION_FIELD, 0)
+            if expected_version is not None and version != expected_version:
+                raise VersionConflict(collection, id, expected_version, version)
 
-        existing.update(data)
-        existing["updated_at"] = datetime.utcnow().isoformat()
+            previous = dict(existing)
+            apply_update(existing, data, datetime.utcnow().isoformat())
+            ReplitDB._write_documents(collection, [existing], {id: storage_key})
 
-        key = ReplitDB._make_key(collection, id)
-        db[key] = json.dumps(existing)
+            changed = [f for f in INDEXES.get(collection, ())
+                       if previous.get(f) != existing.get(f)]
+            if changed:
+                ReplitDB._index_apply(
+                    collection,
+                    removes=ReplitDB._index_entries(collection, previous, changed),
+                    adds=ReplitDB._index_entries(collection, existing, changed)
+                )
+            if ReplitDB._counted(collection):
+                ReplitDB._add_counters(collection, {id: existing})
+        change_feed.publish(UPDATE, collection, existing, previous)
         return existing
 
     @staticmethod
+    @instrumented("increment")
+    def increment(collection: str, id: str, field: str, delta: float = 1) -> Optional[Dict[str, Any]]:
+        """Atomically add delta to a counter field (see COUNTERS; missing counts as 0)"""
+        id = str(id)
+        if field not in COUNTERS.get(collection, ()):
+            raise ValueError(f"{collection}.{field} is not a counter field (see COUNTERS)")
+        if ReplitDB._counted(collection):
+            previous = ReplitDB.get(collection, id)
+            if not previous:
+                return None
+            ReplitDB._add_to_counter(collection, id, field, delta)
+            doc = ReplitDB._load(collection, id)[0]
+            if doc:
+                change_feed.publish(UPDATE, collection, doc, previous)
+            return doc
+        with _doc_lock(ReplitDB._make_key(collection, id)):
+            existing, _ = ReplitDB._load(collection, id)
+            if not existing:
+                return None
+            return ReplitDB.update(
+                collection, id, {field: (existing.get(field) or 0) + delta},
+                expected_version=existing.get(VERSION_FIELD, 0))
+
+    @staticmethod
+    @instrumented("delete")
     def delete(collection: str, id: str) -> bool:
         """Delete document"""
-        key = DB._make_key(collection, id)
-        if key in db:
-            del db[key]
-            return True
-        return False
+        id = str(id)
+        with _doc_lock(ReplitDB._make_key(collection, id)):
+            existing, storage_key = ReplitDB._load(collection, id)
+            if not existing:
+                return False
+            ReplitDB._remove_documents(collection, {id: storage_key})
+            ReplitDB._index_apply(
+                collection, removes=ReplitDB._index_entries(collection, existing))
+        change_feed.publish(DELETE, collection, previous=existing)
+        return True
 
     @staticmethod
-    def find(collection: str, filter: Optional[Dict[str, Any]] = None, limit: int = 100) -> List[Dict[str, Any]]:
-        """Find documents matching filter"""
-        results = []
-        prefix = f"{collection}:"
+    @instrumented("find")
+    def find(
+        collection: str,
+        filter: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = 100,
+        sort: Optional[Sort] = None,
+        offset: int = 0,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Find documents matching filter.
+        The filter is applied before sort, offset and limit (limit=None for
+        all matches); sort is [(field, ASCENDING | DESCENDING), ...] and
+        fields projects each result down to those fields plus id.
+        """
+        docs, _ = ReplitDB._query(collection, filter, limit, sort, offset, fields)
+        return docs
 
-        # Get all keys for this collection
-        keys = [k for k in db.keys() if k.startswith(prefix)]
-
-        for key in keys[:limit]:
-            value = db.get(key)
-            if value:
-                doc = json.loads(value)
-
-                # Apply filter if provided
-                if filter:
-                    matches = all(doc.get(k) == v for k, v in filter.items())
-                    if matches:
-                        results.append(doc)
-                else:
-                    results.append(doc)
-
-        return results
+    @staticmethod
+    @instrumented("find_page")
+    def find_page(
+        collection: str,
+        filter: Optional[Dict[str, Any]] = None,
+        limit: int = 100,
+        sort: Optional[Sort] = None,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        One page of a find, resumed from cursor.
+        Returns {"items": [...], "next_cursor": str | None}; pass next_cursor
+        back to get the following page. Raises ValueError on a bad cursor.
+        """
+        docs, next_cursor = ReplitDB._query(
+            collection, filter, limit, sort, 0, fields, cursor=cursor, paginate=True)
+        return {"items": docs, "next_cursor": next_cursor}
 
     @staticmethod
+    @instrumented("find_one")
     def find_one(collection: str, filter: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Find single document"""
-        results = ReplitDB.find(collection, filter, limit=1000)
+        results = ReplitDB.find(collection, filter, limit=1)
         return results[0] if results else None
 
     @staticmethod
+    @instrumented("count")
     def count(collection: str, filter: Optional[Dict[str, Any]] = None) -> int:
         """Count documents"""
-        return len(ReplitDB.find(collection, filter))
+        filter = filter or {}
+        if filter and all(f in INDEXES.get(collection, ()) for f in filter):
+            # Fully indexed filters are answered from the id lists alone
+            return len(ReplitDB._candidate_ids(collection, filter))
+        return len(ReplitDB.find(collection, filter, limit=None))
+
+    @staticmethod
+    def _query(
+        collection: str,
+        filter: Optional[Dict[str, Any]],
+        limit: Optional[int],
+        sort: Optional[Sort],
+        offset: int,
+        fields: Optional[List[str]],
+        cursor: Optional[str] = None,
+        paginate: bool = False
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Run a query over the collection's candidate documents"""
+        ids = ReplitDB._candidate_ids(collection, filter or {})
+        docs = (doc for batch in ReplitDB._iter_batches(collection, ids) for doc in batch)
+        return run_query(docs, filter, sort, offset, limit, fields, cursor=cursor, paginate=paginate)
+
+    @staticmethod
+    def _candidate_ids(collection: str, filter: Dict[str, Any]) -> List[str]:
+        """
+        Ids that may match filter: the intersection (smallest first) of the
+        room's key listing for room-scoped collections and the id lists of
+        the filter's indexed fields, or the whole collection
+        """
+        id_lists = []
+        indexed = [f for f in filter if f in INDEXES.get(collection, ())]
+        if ReplitDB._room_scoped(collection) and isinstance(filter.get("room_id"), str):
+            id_lists.append(ReplitDB._room_ids(collection, filter["room_id"]))
+            indexed = [f for f in indexed if f != "room_id"]
+        if not indexed and not id_lists:
+            return ReplitDB._collection_ids(collection)
+
+        for field in indexed:
+            ReplitDB._ensure_index(collection, field)
+        id_lists.extend(ReplitDB._index_id_lists(collection, [(field, filter[field]) for field in indexed]))
+        id_lists.sort(key=len)
+
+        candidate_ids = id_lists[0]
+        for ids in id_lists[1:]:
+            if not candidate_ids:
+                break
+            id_set = set(ids)
+            candidate_ids = [i for i in candidate_ids if i in id_set]
+        return candidate_ids
 
     @staticmethod
+    def _iter_batches(collection: str, ids: List[str], batch_size: int = QUERY_BATCH_SIZE, fill_cache: bool = True):
+        """Yield the documents for ids in order, one fetched batch (list) at a time"""
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start:start + batch_size]
+            docs = ReplitDB._load_many(collection, chunk, use_cache=True, fill_cache=fill_cache)
+            yield [docs[doc_id] for doc_id in chunk if docs.get(doc_id)]
+
+    @staticmethod
+    @instrumented("iter")
+    def iter(collection: str, filter: Optional[Dict[str, Any]] = None, batch_size: int = QUERY_BATCH_SIZE):
+        """Lazily yield documents matching filter, fetched and decoded a batch at a time"""
+        for batch in ReplitDB.iter_batches(collection, filter, batch_size):
+            yield from batch
+
+    @staticmethod
+    @instrumented("iter_batches")
+    def iter_batches(collection: str, filter: Optional[Dict[str, Any]] = None, batch_size: int = QUERY_BATCH_SIZE):
+        """
+        Lazily yield lists of documents matching filter, one storage batch at a time.
+        Only one batch is decoded at a time and scanned documents are not
+        added to the document cache, so full scans neither grow memory nor
+        evict hot documents.
+        """
+        ids = ReplitDB._candidate_ids(collection, filter or {})
+        for batch in ReplitDB._iter_batches(collection, ids, batch_size, fill_cache=False):
+            batch = [doc for doc in batch if matches(doc, filter)]
+            if batch:
+                yield batch
+
+    @staticmethod
+    @instrumented("reencode_collection")
+    def reencode_collection(collection: str) -> int:
+        """Rewrite every document of a collection with the active codec, compression and chunking"""
+        rewritten = 0
+        ids = ReplitDB._collection_ids(collection)
+        for start in range(0, len(ids), QUERY_BATCH_SIZE):
+            batch = ids[start:start + QUERY_BATCH_SIZE]
+            storage_keys = ReplitDB._storage_keys(collection, batch)
+            keys = [storage_keys[doc_id] for doc_id in batch]
+            values = ReplitDB._resolve_chunks(collection, batch, keys, ReplitDB._get_raw_many(keys))
+            for doc_id, key, value in zip(batch, keys, values):
+                if value:
+                    doc = decode_document(value)
+                    if ReplitDB._encode(collection, doc) != value:
+                        ReplitDB._write_documents(collection, [doc], {doc_id: key})
+                        rewritten += 1
+        return rewritten
+
+    @staticmethod
+    @instrumented("clear_collection")
     def clear_collection(collection: str):
         """Clear all documents in collection"""
-        prefix = f"{collection}:"
-        keys_to_delete = [k for k in db.keys() if k.startswith(prefix)]
-        for key in keys_to_delete:
-            del db[key]
+        prefixes = (f"{collection}:", f"_idx:{collection}:", f"_idx_ready:{collection}:",
+                    f"_chunk:{collection}:", f"_ctr:{collection}:")
+        keys_to_delete = [key for prefix in prefixes for key in ReplitDB._keys_with_prefix(prefix)]
+        locator_keys = ReplitDB._keys_with_prefix(f"_loc:{collection}:")
+        keys_to_delete += [key for key in ReplitDB._get_raw_many(locator_keys) if key]
+        keys_to_delete += locator_keys
+        for key in dict.fromkeys(keys_to_delete):
+            if key in db:
+                del db[key]
+        doc_cache.invalidate_prefix(f"{collection}:")
+        with _locator_lock:
+            ReplitDB._locators.clear()
+        ReplitDB._ready_indexes = {
+            ready for ready in ReplitDB._ready_indexes if ready[0] != collection}
+
+    # ==================== Counters ====================
+
+    @staticmethod
+    def _counted(collection: str) -> bool:
+        """Whether the collection's counter fields live in counter keys"""
+        return ReplitDB.SHARED_STORE and collection in COUNTERS
+
+    @staticmethod
+    def _counter_prefix(collection: str, id: str) -> str:
+        return f"_ctr:{collection}:{id}:"
+
+    @staticmethod
+    def _add_to_counter(collection: str, id: str, field: str, delta: float):
+        """Add delta to this worker's slot of a counter (slot 0 where the store has incr())"""
+        key = f"{ReplitDB._counter_prefix(collection, id)}{field}:0"
+        store = _store_of(db, key)
+        if hasattr(store, "incr"):
+            store.incr(key, delta)
+            return
+        # Only this worker writes its slot, so the read-modify-write just has
+        # to be atomic within the process
+        key = f"{ReplitDB._counter_prefix(collection, id)}{field}:{worker_id()}"
+        with _rmw_lock:
+            db[key] = json.dumps(json.loads(db.get(key) or "0") + delta)
+
+    @staticmethod
+    def _add_counters(collection: str, docs: Dict[str, Dict[str, Any]]):
+        """Add each document's counter keys to its fields (in place)"""
+        prefixes = [ReplitDB._counter_prefix(collection, doc_id) for doc_id in docs]
+        if ReplitDB.BLOCKING_IO and len(prefixes) > 1:
+            listings = list(_bulk_executor.map(ReplitDB._keys_with_prefix, prefixes))
+        else:
+            listings = [ReplitDB._keys_with_prefix(prefix) for prefix in prefixes]
+        keys = [key for listing in listings for key in listing]
+        if not keys:
+            return
+        values = dict(zip(keys, ReplitDB._get_raw_many(keys)))
+        for doc, prefix, listing in zip(docs.values(), prefixes, listings):
+            for key in listing:
+                if values[key] is not None:
+                    field = key[len(prefix):].rpartition(":")[0]
+                    doc[field] = (doc.get(field) or 0) + json.loads(values[key])
+
+    # ==================== Large values ====================
+
+    @staticmethod
+    def _dictionary_id(collection: str) -> int:
+        """Active compression dictionary of a collection (read once per process)"""
+        dict_id = ReplitDB._dictionary_ids.get(collection)
+        if dict_id is None:
+            dict_id = ReplitDB._dictionary_ids[collection] = int(db.get(f"_zdict_active:{collection}") or 0)
+        return dict_id
+
+    @staticmethod
+    def _encode(collection: str, doc: Dict[str, Any]) -> str:
+        """Storage value of a document, compressed if its collection is configured for it"""
+        value = encode_document(doc)
+        if collection in COMPRESSED_COLLECTIONS and len(value) >= settings.COMPRESS_MIN_BYTES:
+            value = compress_value(value, ReplitDB._dictionary_id(collection))
+        return value
+
+    @staticmethod
+    def train_compression_dictionary(collection: str, size: int = 16384, max_samples: int = 2000) -> int:
+        """
+        Train a zstd dictionary on a collection's documents, store it and make
+        it the collection's active dictionary; returns its ID. Values written
+        afterwards use it (other processes pick it up when they restart), and
+        reencode_collection() recompresses existing ones.
+        """
+        samples = []
+        for batch in ReplitDB.iter_batches(collection):
+            samples.extend(encode_document(doc).encode() for doc in batch)
+            if len(samples) >= max_samples:
+                break
+        data = serialization.train_dictionary(samples[:max_samples], size)
+        dict_id = serialization.register_dictionary(data)
+        db[f"_zdict:{dict_id}"] = base64.b64encode(data).decode("ascii")
+        db[f"_zdict_active:{collection}"] = str(dict_id)
+        ReplitDB._dictionary_ids[collection] = dict_id
+        return dict_id
+
+    @staticmethod
+    def _chunk_key(collection: str, id: str, digest: str, index: int) -> str:
+        return f"_chunk:{collection}:{id}:{digest}:{index}"
+
+    @staticmethod
+    def _pack(collection: str, id: str, key: str, value: str, values: Dict[str, str]) -> List[str]:
+        """Add a document's value to a write batch, chunked if it is too large"""
+        size = settings.VALUE_CHUNK_BYTES
+        if len(value) <= size:
+            values[key] = value
+            return
+
+        digest = hashlib.blake2b(value.encode(), digest_size=8).hexdigest()
+        pieces = [value[start:start + size] for start in range(0, len(value), size)]
+        for index, piece in enumerate(pieces):
+            values[ReplitDB._chunk_key(collection, id, digest, index)] = piece
+        values[key] = f"{CHUNKED_TAG}:{len(pieces)}:{digest}"
+
+    @staticmethod
+    def _stored_chunks(collection: str, storage_keys: Dict[str, str]) -> List[str]:
+        """
+        Keys of the chunks that the values stored now (by ID, at storage_keys)
+        point to, read from their manifests rather than remembered: another
+        process may have written them
+        """
+        chunk_keys = []
+        ids = list(storage_keys)
+        for doc_id, value in zip(ids, ReplitDB._get_raw_many([storage_keys[i] for i in ids])):
+            if value and value.startswith(f"{CHUNKED_TAG}:"):
+                _, count, digest = value.split(":")
+                chunk_keys.extend(ReplitDB._chunk_key(collection, doc_id, digest, i) for i in range(int(count)))
+        return chunk_keys
+
+    @staticmethod
+    def _resolve_chunks(collection: str, ids: List[str], keys: List[str], values: List[Optional[str]]) -> List[Optional[str]]:
+        """Replace chunk manifests among values (stored at keys) with the reassembled values"""
+        values = list(values)
+        for _ in range(CHUNK_READ_RETRIES):
+            manifests = [i for i, value in enumerate(values)
+                         if value and value.startswith(f"{CHUNKED_TAG}:")]
+            if not manifests:
+                return values
+
+            # Every chunk of every manifest in one concurrent read
+            layout = []
+            for i in manifests:
+                _, count, digest = values[i].split(":")
+                layout.append((i, digest, [ReplitDB._chunk_key(collection, ids[i], digest, n)
+                                           for n in range(int(count))]))
+            pieces = iter(ReplitDB._get_raw_many([k for _, _, chunk_keys in layout for k in chunk_keys]))
+
+            torn = []
+            for i, digest, chunk_keys in layout:
+                parts = [next(pieces) for _ in chunk_keys]
+                value = "".join(parts) if all(part is not None for part in parts) else None
+                if value is not None and hashlib.blake2b(value.encode(), digest_size=8).hexdigest() == digest:
+                    values[i] = value
+                else:
+                    torn.append(i)
+            if not torn:
+                return values
+
+            # Rewritten while we read it: fetch the current manifests again
+            for i, value in zip(torn, ReplitDB._get_raw_many([keys[i] for i in torn])):
+                values[i] = value
+        raise RuntimeError(f"Could not read a consistent version of chunked {collection} documents")
+
+    # ==================== Bulk operations ====================
+
+    @staticmethod
+    def _get_raw_many(keys: List[str]) -> List[Optional[str]]:
+        """Fetch raw values for many keys, concurrently against Replit DB"""
+        if ReplitDB.BLOCKING_IO and len(keys) > 1:
+            values = list(_bulk_executor.map(db.get, keys))
+        else:
+            values = [db.get(key) for key in keys]
+        tally(keys_read=len(keys), bytes_read=sum(payload_size(value) for value in values))
+        return values
+
+    @staticmethod
+    def _set_raw_many(values: Dict[str, str]):
+        """Write many keys, in a single request when the client supports it"""
+        if not values:
+            return
+        tally(keys_written=len(values), bytes_written=sum(payload_size(value) for value in values.values()))
+        if hasattr(db, "set_bulk"):
+            db.set_bulk(values)
+        else:
+            db.update(values)
+
+    @staticmethod
+    def _delete_raw_many(keys: List[str]):
+        """Delete many keys (missing keys are ignored), concurrently against Replit DB"""
+        def delete(key: str):
+            try:
+                del db[key]
+            except KeyError:
+                pass
+
+        if ReplitDB.BLOCKING_IO and len(keys) > 1:
+            list(_bulk_executor.map(delete, keys))
+        else:
+            for key in keys:
+                delete(key)
+
+    @staticmethod
+    @instrumented("get_many")
+    def get_many(collection: str, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get many documents by ID, keyed by ID (missing IDs are omitted)"""
+        return ReplitDB._load_many(collection, ids, use_cache=True)
+
+    @staticmethod
+    def _load_many(collection: str, ids: List[str], use_cache: bool, fill_cache: bool = True) -> Dict[str, Dict[str, Any]]:
+        """Fetch many documents, serving cache hits and (unless fill_cache is off) refreshing the cache"""
+        unique_ids = list(dict.fromkeys(str(i) for i in ids))
+        found = {}
+        missing_ids = []
+        for doc_id in unique_ids:
+            doc = doc_cache.get(ReplitDB._make_key(collection, doc_id)) if use_cache else None
+            if doc is None:
+                missing_ids.append(doc_id)
+            else:
+                found[doc_id] = doc
+                tally(cache_hits=1)
+
+        fetched, _ = ReplitDB._fetch_many(collection, missing_ids, fill_cache)
+        found.update(fetched)
+        return {doc_id: found[doc_id] for doc_id in unique_ids if doc_id in found}
+
+    @staticmethod
+    def _fetch_many(
+        collection: str,
+        ids: List[str],
+        fill_cache: bool = True,
+        counters: bool = True
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
+        """
+        Read and decode documents from storage (no cache lookups), with their
+        storage keys; counters=False leaves out counter keys (and the cache)
+        """
+        if not ids:
+            return {}, {}
+        storage_keys = ReplitDB._storage_keys(collection, ids)
+        keys = [storage_keys[doc_id] for doc_id in ids]
+        values = ReplitDB._resolve_chunks(collection, ids, keys, ReplitDB._get_raw_many(keys))
+        found = {}
+        for doc_id, value in zip(ids, values):
+            cache_key = ReplitDB._make_key(collection, doc_id)
+            if value:
+                start = time.perf_counter()
+                found[doc_id] = decode_document(value)
+                tally(docs_decoded=1, decode_seconds=time.perf_counter() - start)
+            else:
+                doc_cache.invalidate(cache_key)
+        counted = ReplitDB._counted(collection)
+        if counted and counters and found:
+            ReplitDB._add_counters(collection, found)
+        if fill_cache and (counters or not counted):
+            for doc_id, doc in found.items():
+                doc_cache.put(ReplitDB._make_key(collection, doc_id), doc)
+        return found, storage_keys
+
+    @staticmethod
+    @instrumented("insert_many")
+    def insert_many(collection: str, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert many documents into collection"""
+        missing_ids = [doc for doc in docs if "id" not in doc]
+        new_ids = ReplitDB._generate_ids(collection, len(missing_ids))
+        for doc, new_id in zip(missing_ids, new_ids):
+            doc["id"] = new_id
+
+        now = datetime.utcnow().isoformat()
+        adds = []
+        for doc in docs:
+            doc.setdefault("created_at", now)
+            doc.setdefault(VERSION_FIELD, 1)
+            adds.extend(ReplitDB._index_entries(collection, doc))
+
+        ReplitDB._write_documents(collection, docs, new_ids=new_ids)
+        ReplitDB._index_apply(collection, adds=adds)
+        for doc in docs:
+            change_feed.publish(INSERT, collection, doc)
+        return docs
+
+    @staticmethod
+    @instrumented("update_many")
+    def update_many(collection: str, updates: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Apply per-document updates, keyed by ID (missing IDs are skipped)"""
+        updates = {str(doc_id): data for doc_id, data in updates.items()}
+        keys = [ReplitDB._make_key(collection, doc_id) for doc_id in updates]
+        with _doc_locks_for(keys):
+            existing, storage_keys = ReplitDB._fetch_many(collection, list(updates.keys()), counters=False)
+            now = datetime.utcnow().isoformat()
+            updated, previous_docs = {}, {}
+            removes, adds = [], []
+            for doc_id, doc in existing.items():
+                previous = previous_docs[doc_id] = dict(doc)
+                apply_update(doc, updates[doc_id], now)
+                updated[doc_id] = doc
+
+                changed = [f for f in INDEXES.get(collection, ())
+                           if previous.get(f) != doc.get(f)]
+                removes.extend(ReplitDB._index_entries(collection, previous, changed))
+                adds.extend(ReplitDB._index_entries(collection, doc, changed))
+
+            ReplitDB._write_documents(collection, list(updated.values()), storage_keys)
+            ReplitDB._index_apply(collection, removes=removes, adds=adds)
+            if ReplitDB._counted(collection):
+                ReplitDB._add_counters(collection, updated)
+        for doc_id, doc in updated.items():
+            change_feed.publish(UPDATE, collection, doc, previous_docs[doc_id])
+        return updated
+
+    @staticmethod
+    @instrumented("delete_many")
+    def delete_many(collection: str, ids: List[str]) -> int:
+        """Delete many documents, returning how many existed"""
+        unique_ids = list(dict.fromkeys(str(i) for i in ids))
+        existing, storage_keys = ReplitDB._fetch_many(collection, unique_ids, fill_cache=False)
+        ReplitDB._remove_documents(
+            collection, {doc_id: storage_keys[doc_id] for doc_id in existing})
+
+        removes = []
+        for doc in existing.values():
+            removes.extend(ReplitDB._index_entries(collection, doc))
+        ReplitDB._index_apply(collection, removes=removes)
+        for doc in existing.values():
+            change_feed.publish(DELETE, collection, previous=doc)
+        return len(existing)
+
+    # ==================== Secondary indexes ====================
+
+    @staticmethod
+    def _index_key(collection: str, field: str, value: Any) -> str:
+        """Key of the id list for one indexed field value"""
+        return f"_idx:{collection}:{field}:{json.dumps(value, sort_keys=True)}"
+
+    @staticmethod
+    def _index_id_lists(collection: str, lookups: List[Tuple[str, Any]]) -> List[List[str]]:
+        """Ids of the documents whose field equals value, per (field, value)"""
+        keys = [ReplitDB._index_key(collection, field, value) for field, value in lookups]
+        if ReplitDB.SHARED_STORE:
+            return [ReplitDB._ids_with_prefix(key + ":") for key in keys]
+        return [json.loads(raw) if raw else [] for raw in ReplitDB._get_raw_many(keys)]
+
+    @staticmethod
+    def _index_entries(collection: str, doc: Dict[str, Any], fields: Optional[List[str]] = None) -> List[Tuple[str, Any, str]]:
+        """(field, value, id) index entries for a document"""
+        doc_id = str(doc["id"])
+        if fields is None:
+            fields = INDEXES.get(collection, ())
+        return [(field, doc.get(field), doc_id) for field in fields]
+
+    @staticmethod
+    def _index_apply(
+        collection: str,
+        removes: Optional[List[Tuple[str, Any, str]]] = None,
+        adds: Optional[List[Tuple[str, Any, str]]] = None
+    ):
+        """Apply index entry changes with one read and write per touched index key"""
+        removes, adds = removes or [], adds or []
+        if ReplitDB.SHARED_STORE:
+            # One key per entry: no read-modify-write for another process to race with
+            added = {f"{ReplitDB._index_key(collection, field, value)}:{doc_id}" for field, value, doc_id in adds}
+            ReplitDB._set_raw_many({key: "1" for key in added})
+            ReplitDB._delete_raw_many([
+                key for key in (f"{ReplitDB._index_key(collection, field, value)}:{doc_id}"
+                                for field, value, doc_id in removes) if key not in added])
+            return
+        keys = list(dict.fromkeys(
+            ReplitDB._index_key(collection, field, value)
+            for field, value, _ in removes + adds
+        ))
+        if not keys:
+            return
+
+        with _rmw_lock:
+            ReplitDB._index_write(collection, keys, removes, adds)
+
+    @staticmethod
+    def _index_write(
+        collection: str,
+        keys: List[str],
+        removes: List[Tuple[str, Any, str]],
+        adds: List[Tuple[str, Any, str]]
+    ):
+        """Read-modify-write the given index keys"""
+        raw_values = dict(zip(keys, ReplitDB._get_raw_many(keys)))
+        id_lists = {key: json.loads(raw) if raw else [] for key, raw in raw_values.items()}
+        modified = set()
+
+        for field, value, doc_id in removes:
+            key = ReplitDB._index_key(collection, field, value)
+            if doc_id in id_lists[key]:
+                id_lists[key].remove(doc_id)
+                modified.add(key)
+
+        for field, value, doc_id in adds:
+            key = ReplitDB._index_key(collection, field, value)
+            if doc_id not in id_lists[key]:
+                id_lists[key].append(doc_id)
+                modified.add(key)
+
+        ReplitDB._set_raw_many({
+            key: json.dumps(id_lists[key]) for key in modified if id_lists[key]
+        })
+        ReplitDB._delete_raw_many([
+            key for key in modified
+            if not id_lists[key] and raw_values[key] is not None
+        ])
+
+    @staticmethod
+    def _ensure_index(collection: str, field: str):
+        """Build an index from a full scan the first time it is used (or after a layout change)"""
+        if (collection, field) in ReplitDB._ready_indexes:
+            return
+        with _rmw_lock:
+            ready_key = f"_idx_ready:{collection}:{field}"
+            if db.get(ready_key) != ReplitDB._index_layout():
+                ReplitDB.rebuild_index(collection, field)
+            ReplitDB._ready_indexes.add((collection, field))
+
+    @staticmethod
+    def _index_layout() -> str:
+        """Marker of a built index: "1" for id lists, "2" for one key per entry"""
+        return "2" if ReplitDB.SHARED_STORE else "1"
+
+    @staticmethod
+    @instrumented("rebuild_index")
+    def rebuild_index(collection: str, field: str):
+        """Rebuild one secondary index by scanning the collection"""
+        existing = ReplitDB._keys_with_prefix(f"_idx:{collection}:{field}:")
+        if not ReplitDB.SHARED_STORE:
+            ReplitDB._delete_raw_many(existing)
+
+        groups: Dict[str, List[str]] = {}
+        ids = ReplitDB._collection_ids(collection)
+        for batch in ReplitDB._iter_batches(collection, ids, fill_cache=False):
+            for doc in batch:
+                index_key = ReplitDB._index_key(collection, field, doc.get(field))
+                groups.setdefault(index_key, []).append(str(doc["id"]))
+
+        if ReplitDB.SHARED_STORE:
+            # Write the scanned entries before pruning, so an entry another
+            # process adds meanwhile is not deleted
+            entries = {f"{index_key}:{doc_id}" for index_key, ids in groups.items() for doc_id in ids}
+            ReplitDB._set_raw_many({key: "1" for key in entries})
+            ReplitDB._delete_raw_many([key for key in existing if key not in entries])
+        else:
+            ReplitDB._set_raw_many({index_key: json.dumps(ids) for index_key, ids in groups.items()})
+        db[f"_idx_ready:{collection}:{field}"] = ReplitDB._index_layout()
+
+
+class AsyncReplitDB:
+    """
+    Awaitable facade over the configured storage backend (DB) for use
+    inside async handlers. Backends that do blocking I/O run on a bounded
+    thread pool so the event loop never stalls; the in-memory fallback
+    is called inline since it never blocks.
+    """
+
+    @staticmethod
+    async def _run(func, *args, **kwargs):
+        """Run a storage call without blocking the event loop"""
+        if not DB.BLOCKING_IO:
+            return func(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        # Carry context variables (e.g. the current route for storage metrics) to the thread
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            _async_executor, functools.partial(context.run, func, *args, **kwargs))
+
+    @staticmethod
+    async def insert(collection: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert document into collection"""
+        return await AsyncReplitDB._run(DB.insert, collection, data)
+
+    @staticmethod
+    async def get(collection: str, id: str) -> Optional[Dict[str, Any]]:
+        """Get document by ID"""
+        return await AsyncReplitDB._run(DB.get, collection, id)
+
+    @staticmethod
+    async def update(
+        collection: str,
+        id: str,
+        data: Dict[str, Any],
+        expected_version: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Update document (compare-and-set when expected_version is given)"""
+        return await AsyncReplitDB._run(DB.update, collection, id, data, expected_version)
+
+    @staticmethod
+    async def increment(collection: str, id: str, field: str, delta: float = 1) -> Optional[Dict[str, Any]]:
+        """Atomically add delta to a numeric field"""
+        return await AsyncReplitDB._run(DB.increment, collection, id, field, delta)
+
+    @staticmethod
+    async def delete(collection: str, id: str) -> bool:
+        """Delete document"""
+        return await AsyncReplitDB._run(DB.delete, collection, id)
+
+    @staticmethod
+    async def find(
+        collection: str,
+        filter: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = 100,
+        sort: Optional[Sort] = None,
+        offset: int = 0,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Find documents matching filter"""
+        return await AsyncReplitDB._run(DB.find, collection, filter, limit, sort, offset, fields)
+
+    @staticmethod
+    async def find_page(
+        collection: str,
+        filter: Optional[Dict[str, Any]] = None,
+        limit: int = 100,
+        sort: Optional[Sort] = None,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """One page of a find, resumed from cursor"""
+        return await AsyncReplitDB._run(DB.find_page, collection, filter, limit, sort, fields, cursor)
+
+    @staticmethod
+    async def find_one(collection: str, filter: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Find single document"""
+        return await AsyncReplitDB._run(DB.find_one, collection, filter)
+
+    @staticmethod
+    async def count(collection: str, filter: Optional[Dict[str, Any]] = None) -> int:
+        """Count documents"""
+        return await AsyncReplitDB._run(DB.count, collection, filter)
+
+    @staticmethod
+    async def iter(collection: str, filter: Optional[Dict[str, Any]] = None, batch_size: int = QUERY_BATCH_SIZE):
+        """Async iterator over documents matching filter, fetching each batch off the event loop"""
+        batches = DB.iter_batches(collection, filter, batch_size)
+        try:
+            while True:
+                batch = await AsyncReplitDB._run(next, batches, None)
+                if batch is None:
+                    return
+                for doc in batch:
+                    yield doc
+        finally:
+            batches.close()
+
+    @staticmethod
+    async def get_many(collection: str, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get many documents by ID, keyed by ID"""
+        return await AsyncReplitDB._run(DB.get_many, collection, ids)
+
+    @staticmethod
+    async def insert_many(collection: str, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert many documents into collection"""
+        return await AsyncReplitDB._run(DB.insert_many, collection, docs)
+
+    @staticmethod
+    async def update_many(collection: str, updates: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Apply per-document updates, keyed by ID"""
+        return await AsyncReplitDB._run(DB.update_many, collection, updates)
+
+    @staticmethod
+    async def delete_many(collection: str, ids: List[str]) -> int:
+        """Delete many documents, returning how many existed"""
+        return await AsyncReplitDB._run(DB.delete_many, collection, ids)
 
 
 # Collection names
@@ -138,6 +1422,44 @@ class Collections:
     UPLOADED_FILES = "uploaded_files"
     SESSIONS = "sessions"  # For auth sessions
     FEEDBACK = "feedback"  # For user feedback
+    ARCHIVES = "archives"  # Completed rooms packed by app.archive
+    USER_ARCHIVES = "user_archives"  # Archived room IDs per user
+
+
+# Secondary indexes: equality filters on these fields are resolved through
+# field -> id-set maps kept up to date by insert/update/delete
+INDEXES = {
+    Collections.USERS: ("email", "username"),
+    Collections.ROOMS: ("room_code", "visibility"),
+    Collections.PARTICIPANTS: ("room_id", "user_id"),
+    Collections.TURNS: ("room_id", "speaker_id"),
+    Collections.SPECTATOR_VOTES: ("room_id",),
+    Collections.RESULTS: ("room_id",),
+    Collections.TRAINER_FEEDBACK: ("user_id",),
+    Collections.UPLOADED_FILES: ("room_id",),
+}
+
+
+# Counter fields, updated through increment() (see ReplitDB for how they
+# are stored on stores other processes write to)
+COUNTERS = {
+    Collections.USERS: ("xp",),
+    Collections.TRAINER_FEEDBACK: ("xp",),
+    Collections.PARTICIPANTS: ("reaction_count",),
+}
+
+
+# Room-owned collections and the key segment used for them in the
+# room-scoped layout (room:<room_id>:<kind>:<id>)
+ROOM_SCOPED = {
+    Collections.TURNS: "turn",
+    Collections.PARTICIPANTS: "participant",
+    Collections.SPECTATOR_VOTES: "vote",
+}
+
+# Whether ROOM_SCOPED collections use the room-scoped layout; run
+# `python -m app.migrate_keys` when switching so existing keys are rewritten
+ROOM_SCOPED_KEYS = settings.ROOM_SCOPED_KEYS
 
 
 # Initialize database
@@ -145,6 +1467,8 @@ async def connect_db():
     """Initialize Replit Database"""
     if REPLIT_DB_AVAILABLE:
         print("✅ Replit Database connected")
+    elif isinstance(db, LogStore):
+        print(f"✅ Local storage loaded from {db.directory}")
     else:
         print("⚠️  Running in local mode with in-memory storage")
 
@@ -154,8 +1478,22 @@ async def disconnect_db():
     print("👋 Database disconnected")
 
 
-# Alias for backward compatibility
-DB = ReplitDB
+def _select_backend():
+    """Pick the storage backend from settings.DATABASE_URL"""
+    if settings.DATABASE_URL.startswith("sqlite"):
+        from app.sqlite_db import SQLiteDB
+        print(f"✅ Using SQLite storage ({settings.DATABASE_URL})")
+        return SQLiteDB, "sqlite"
+    if isinstance(db, ShardedStore):
+        return ReplitDB, "sharded"
+    if isinstance(db, LogStore):
+        return ReplitDB, "local"
+    return ReplitDB, "replit" if REPLIT_DB_AVAILABLE or isinstance(db, ReplitDBClient) else "memory"
+
+
+# Configured storage backend (ReplitDB or SQLiteDB, same API)
+DB, STORAGE_BACKEND = _select_backend()
+AsyncDB = AsyncReplitDB
 
 # Export the database instance
-__all__ = ["ReplitDB", "DB", "Collections", "connect_db", "disconnect_db", "db", "REPLIT_DB_AVAILABLE"]
+__all__ = ["ReplitDB", "DB", "AsyncReplitDB", "AsyncDB", "Collections", "INDEXES", "COUNTERS", "doc_cache", "connect_db", "disconnect_db", "db", "REPLIT_DB_AVAILABLE", "STORAGE_BACKEND", "ASCENDING", "DESCENDING", "VERSION_FIELD", "VersionConflict", "without_version"]
@@ -0,0 +1,113 @@
+"""
+HTTP client for the Replit DB wire protocol
+Dict-like like `from replit import db`, and stores values the same way
+(JSON-encoded), so it can talk to a real Replit DB URL, a shard, or the
+local stand-in server (python -m app.replit_db_server).
+
+    GET    <url>/<key>                  -> value (404 if missing)
+    POST   <url>   key=value&...        -> set one or more keys
+    DELETE <url>/<key>                  -> delete (404 if missing)
+    GET    <url>?encode=true&prefix=p   -> newline-separated, URL-encoded keys
+"""
+import json
+import threading
+import time
+from typing import Optional, List, Dict, Any
+from urllib.parse import quote, unquote
+import requests
+
+# Connection errors, 429s and 5xx responses are retried with exponential backoff
+RETRY_BACKOFF_SECONDS = 0.05
+
+
+class ReplitDBClient:
+    """Blocking Replit DB client with one keep-alive session per thread"""
+
+    # Every call is an HTTP round trip
+    blocking = True
+    # Other processes may write to the same database
+    shared = True
+
+    def __init__(self, url: str, timeout: float = 10.0, retries: int = 2):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _request(self, method: str, path: str = "", **kwargs) -> requests.Response:
+        """Send one request, retrying transient failures"""
+        for attempt in range(self.retries + 1):
+            try:
+                response = self._session().request(
+                    method, self.url + path, timeout=self.timeout, **kwargs)
+                if response.status_code != 429 and response.status_code < 500:
+                    return response
+                if attempt == self.retries:
+                    response.raise_for_status()
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+            time.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+
+    @staticmethod
+    def _path(key: str) -> str:
+        return "/" + quote(key, safe="")
+
+    # ==================== Single keys ====================
+
+    def get_raw(self, key: str) -> Optional[str]:
+        """Stored text of key, or None"""
+        response = self._request("GET", self._path(key))
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.text
+
+    def get(self, key: str, default: Any = None) -> Any:
+        raw = self.get_raw(key)
+        return default if raw is None else json.loads(raw)
+
+    def __getitem__(self, key: str) -> Any:
+        raw = self.get_raw(key)
+        if raw is None:
+            raise KeyError(key)
+        return json.loads(raw)
+
+    def __setitem__(self, key: str, value: Any):
+        self.set_bulk({key: value})
+
+    def __delitem__(self, key: str):
+        response = self._request("DELETE", self._path(key))
+        if response.status_code == 404:
+            raise KeyError(key)
+        response.raise_for_status()
+
+    def __contains__(self, key: str) -> bool:
+        return self.get_raw(key) is not None
+
+    # ==================== Many keys ====================
+
+    def set_bulk(self, values: Dict[str, Any]):
+        """Write many keys in one request"""
+        data = {key: json.dumps(value, separators=(",", ":")) for key, value in values.items()}
+        self._request("POST", data=data).raise_for_status()
+
+    update = set_bulk
+
+    def prefix(self, prefix: str) -> List[str]:
+        """Keys starting with prefix (one request)"""
+        response = self._request("GET", params={"encode": "true", "prefix": prefix})
+        response.raise_for_status()
+        return [unquote(line) for line in response.text.split("\n") if line]
+
+    def keys(self) -> List[str]:
+        return self.prefix("")
+
+    def __iter__(self):
+        return iter(self.keys())
@@ -0,0 +1,197 @@
+"""
+Local Replit DB stand-in server for profiling and CI
+Speaks the Replit DB HTTP wire protocol (see app.replit_db_client) over an
+in-memory keyspace, with configurable latency, a throughput cap and
+injected errors, so DB-bound paths can be measured with real round trips.
+
+Run with:
+    python -m app.replit_db_server --port 8765 --latency normal:20:5 --max-rps 200 --error-rate 0.01
+
+and point the backend at it:
+    DATABASE_URL=replit+http://127.0.0.1:8765 uvicorn app.main:app
+
+Latency specs (milliseconds): fixed:MS, uniform:LOW:HIGH, normal:MEAN:STDDEV,
+exp:MEAN, lognormal:MEDIAN:SIGMA
+"""
+import argparse
+import math
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict
+from urllib.parse import quote, unquote, urlsplit, parse_qs, parse_qsl
+
+
+def latency_sampler(spec: str):
+    """Build a function returning one latency sample in seconds from a spec"""
+    kind, *params = spec.split(":")
+    values = [float(p) for p in params]
+    samplers = {
+        "fixed": lambda rng, ms: ms,
+        "uniform": lambda rng, low, high: rng.uniform(low, high),
+        "normal": lambda rng, mean, stddev: rng.gauss(mean, stddev),
+        "exp": lambda rng, mean: rng.expovariate(1 / mean) if mean else 0.0,
+        "lognormal": lambda rng, median, sigma: median * math.exp(rng.gauss(0, sigma)),
+    }
+    if kind not in samplers:
+        raise ValueError(f"Unknown latency distribution '{kind}' (choose from {', '.join(samplers)})")
+    sample = samplers[kind]
+    return lambda rng: max(0.0, sample(rng, *values)) / 1000
+
+
+class FaultInjector:
+    """Per-request latency, throughput cap and error injection"""
+
+    def __init__(
+        self,
+        latency: str = "fixed:0",
+        max_rps: float = 0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        self.latency = latency
+        self.max_rps = max_rps
+        self.error_rate = error_rate
+        self._sample = latency_sampler(latency)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def before_request(self) -> bool:
+        """Wait for a throughput slot and the sampled latency; False means inject an error"""
+        with self._lock:
+            delay = self._sample(self._rng)
+            fail = self._rng.random() < self.error_rate
+            if self.max_rps:
+                now = time.monotonic()
+                slot = max(now, self._next_slot)
+                self._next_slot = slot + 1 / self.max_rps
+                delay += slot - now
+        if delay:
+            time.sleep(delay)
+        return not fail
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "ReplitDBServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body: str = ""):
+        payload = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _handle(self, operation):
+        ok = self.server.faults.before_request()
+        with self.server.lock:
+            self.server.stats[self.command] += 1
+            self.server.stats["injected_errors"] += not ok
+        if not ok:
+            self._reply(500, "injected failure")
+            return
+        operation()
+
+    def _key(self) -> str:
+        return unquote(urlsplit(self.path).path[1:])
+
+    def do_GET(self):
+        def operation():
+            url = urlsplit(self.path)
+            if url.path in ("", "/"):
+                query = parse_qs(url.query)
+                prefix = query.get("prefix", [""])[0]
+                encode = query.get("encode", ["false"])[0] == "true"
+                with self.server.lock:
+                    keys = [k for k in self.server.store if k.startswith(prefix)]
+                self._reply(200, "\n".join(quote(k, safe="") if encode else k for k in keys))
+                return
+            with self.server.lock:
+                value = self.server.store.get(self._key())
+            if value is None:
+                self._reply(404)
+            else:
+                self._reply(200, value)
+        self._handle(operation)
+
+    def do_POST(self):
+        # Read the body even when failing the request, to keep the connection usable
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode()
+
+        def operation():
+            pairs = parse_qsl(body, keep_blank_values=True)
+            with self.server.lock:
+                self.server.store.update(pairs)
+            self._reply(200)
+        self._handle(operation)
+
+    def do_DELETE(self):
+        def operation():
+            with self.server.lock:
+                existed = self.server.store.pop(self._key(), None) is not None
+            self._reply(204 if existed else 404)
+        self._handle(operation)
+
+
+class ReplitDBServer(ThreadingHTTPServer):
+    """In-memory Replit DB wire-protocol server"""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, faults: Optional[FaultInjector] = None):
+        super().__init__((host, port), _Handler)
+        self.faults = faults or FaultInjector()
+        self.store: Dict[str, str] = {}
+        self.lock = threading.Lock()
+        self.stats: Counter = Counter()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "ReplitDBServer":
+        """Serve on a background thread (for tests and benchmarks)"""
+        threading.Thread(target=self.serve_forever, daemon=True, name="replit-db-server").start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Replit DB stand-in with latency and failure injection")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="fixed:0", help="latency distribution in ms, e.g. normal:20:5")
+    parser.add_argument("--max-rps", type=float, default=0, help="requests per second cap (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    faults = FaultInjector(args.latency, args.max_rps, args.error_rate, args.seed)
+    server = ReplitDBServer(args.host, args.port, faults)
+    print(f"🗄️  Replit DB stand-in at {server.url} "
+          f"(latency {args.latency}, max {args.max_rps or '∞'} rps, error rate {args.error_rate})")
+    print(f"   Point the backend at it with DATABASE_URL=replit+{server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        requests = sum(server.stats[method] for method in ("GET", "POST", "DELETE"))
+        print(f"👋 Served {requests} requests ({server.stats['injected_errors']} injected errors): {dict(server.stats)}")
+
+
+if __name__ == "__main__":
+    main()
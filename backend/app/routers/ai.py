@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException
 from typing import Dict, Any
 from app.schemas import AIAnalyzeTurn, AIFactCheck, AIFinalScore
-from app.replit_db import DB, Collections
+from app.replit_db import AsyncDB, Collections
 from app.gemini_ai import GeminiAI
+from app.archive import room_result, room_documents
 
 router = APIRouter(prefix="/api/ai", tags=["AI Judging"])
 
@@ -12,15 +13,15 @@ async def analyze_turn(data: AIAnalyzeTurn):
     """
     Analyze a specific debate turn using AI
     """
-    turn = DB.get(Collections.TURNS, str(data.turn_id))
+    turn = await AsyncDB.get(Collections.TURNS, str(data.turn_id))
     if not turn:
         raise HTTPException(status_code=404, detail="Turn not found")
 
-    room = DB.get(Collections.ROOMS, str(data.room_id))
+    room = await AsyncDB.get(Collections.ROOMS, str(data.room_id))
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
 
-    previous_turns = DB.find(
+    previous_turns = await AsyncDB.find(
         Collections.TURNS,
         {"room_id": data.room_id},
         limit=10
@@ -32,7 +33,7 @@ async def analyze_turn(data: AIAnalyzeTurn):
         previous_turns=[t["content"] for t in previous_turns]
     )
 
-    DB.update(Collections.TURNS, str(data.turn_id), {"ai_feedback": analysis})
+    await AsyncDB.update(Collections.TURNS, str(data.turn_id), {"ai_feedback": analysis})
 
     return {"analysis": analysis, "turn_id": data.turn_id}
 
@@ -58,12 +59,12 @@ async def calculate_final_score(data: AIFinalScore):
     """
     Calculate final scores for all participants
     """
-    room = DB.get(Collections.ROOMS, str(data.room_id))
+    room = await AsyncDB.get(Collections.ROOMS, str(data.room_id))
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
 
-    participants = DB.find(Collections.PARTICIPANTS, {"room_id": data.room_id})
-    turns = DB.find(Collections.TURNS, {"room_id": data.room_id})
+    participants = await AsyncDB.find(Collections.PARTICIPANTS, {"room_id": data.room_id})
+    turns = await AsyncDB.find(Collections.TURNS, {"room_id": data.room_id}, limit=None)
 
     participant_scores = {}
     for participant in participants:
@@ -101,7 +102,7 @@ async def calculate_final_score(data: AIFinalScore):
                     "weighted_total": weighted_score
                 }
 
-                DB.update(
+                await AsyncDB.update(
                     Collections.PARTICIPANTS,
                     str(participant["id"]),
                     {"score": avg_scores}
@@ -118,7 +119,8 @@ async def get_ai_summary(room_id: str):
     """
     Get AI-generated summary of debate
     """
-    result = DB.find_one(Collections.RESULTS, {"room_id": room_id})
+    room = await AsyncDB.get(Collections.ROOMS, room_id)
+    result = await room_result(room) if room else None
     if not result:
         raise HTTPException(
             status_code=404, detail="No results found for this debate")
@@ -137,18 +139,23 @@ async def get_detailed_report(room_id: str):
     """
     Get detailed AI report for debate
     """
-    room = DB.get(Collections.ROOMS, room_id)
+    room = await AsyncDB.get(Collections.ROOMS, room_id)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
 
-    result = DB.find_one(Collections.RESULTS, {"room_id": room_id})
-    participants = DB.find(Collections.PARTICIPANTS, {"room_id": room_id})
-    turns = DB.find(Collections.TURNS, {"room_id": room_id})
+    result = await room_result(room)
+    participants = await room_documents(room, Collections.PARTICIPANTS)
+    turns = await room_documents(room, Collections.TURNS)
+
+    debater_users = await AsyncDB.get_many(
+        Collections.USERS,
+        [p["user_id"] for p in participants if p["role"] == "debater"]
+    )
 
     participant_details = []
     for participant in participants:
         if participant["role"] == "debater":
-            user = DB.get(Collections.USERS, str(participant["user_id"]))
+            user = debater_users.get(str(participant["user_id"]))
             participant_turns = [
                 t for t in turns if t["speaker_id"] == participant["id"]]
 
@@ -2,7 +2,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from typing import Dict, Any
 from app.schemas import UserCreate, UserLogin, UserResponse, UserUpdate, Token
 from app.replit_auth import ReplitAuth, get_current_user, REPLIT_AUTH_AVAILABLE
-from app.replit_db import DB, Collections
+from app.replit_db import AsyncDB, Collections
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
@@ -13,7 +13,7 @@ async def register(user_data: UserCreate):
     Register a new user
     """
     try:
-        result = ReplitAuth.simple_auth_register(
+        result = await ReplitAuth.simple_auth_register(
             username=user_data.username,
             email=user_data.email,
             password=user_data.password
@@ -31,7 +31,7 @@ async def login(credentials: UserLogin):
     Login user and return access token
     """
     try:
-        result = ReplitAuth.simple_auth_login(
+        result = await ReplitAuth.simple_auth_login(
             email=credentials.email,
             password=credentials.password
         )
@@ -62,7 +62,7 @@ async def update_user(
 
     update_data = user_update.model_dump(exclude_unset=True)
 
-    updated_user = DB.update(Collections.USERS, user_id, update_data)
+    updated_user = await AsyncDB.update(Collections.USERS, user_id, update_data)
 
     if not updated_user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -1,19 +1,144 @@
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 import asyncio
 from app.schemas import TurnSubmit, TurnResponse
 from app.replit_auth import get_current_user
-from app.replit_db import DB, Collections
+from app.replit_db import AsyncDB, Collections, ASCENDING, VERSION_FIELD, VersionConflict
 from app.gemini_ai import GeminiAI
 from app.models import DebateStatus
-from app.cache import user_cache, room_cache
-from app.socketio_app import broadcast_to_room
+from app.cache import user_cache, room_cache, cached
+from app.config import settings
+from app.write_buffer import async_write_buffer
+from app.records import Turn, Participant, Room, group_by
+from app.archive import is_archived, room_documents
 
 router = APIRouter(prefix="/api/debate", tags=["Debate"])
 
-# Room-level locks to prevent concurrent submission races
-# (ReplitDB doesn't support atomic operations, so we use in-memory locks)
-_room_locks: Dict[str, asyncio.Lock] = {}
+# Attempts at claiming a turn slot before giving up under contention
+TURN_CLAIM_RETRIES = 5
+
+
+async def _transition_room_status(room_id: str, from_status: str, to_status: str) -> bool:
+    """
+    Move a room from one status to another with a compare-and-set.
+    Returns False if the room is not (or no longer) in from_status, so
+    concurrent callers cannot both perform the same transition.
+    """
+    for _ in range(TURN_CLAIM_RETRIES):
+        room = await AsyncDB.get(Collections.ROOMS, room_id)
+        if not room or room.get("status") != from_status:
+            return False
+        try:
+            await AsyncDB.update(Collections.ROOMS, room_id, {"status": to_status},
+                                 expected_version=room.get(VERSION_FIELD, 0))
+            return True
+        except VersionConflict:
+            continue
+    return False
+
+
+async def _turn_state_from_turns(room_id: str) -> Dict[str, Any]:
+    """Rebuild turn-order state for rooms created before it was tracked"""
+    turns = await AsyncDB.find(Collections.TURNS, {"room_id": room_id}, limit=None)
+    round_counts: Dict[str, int] = {}
+    for turn in turns:
+        key = str(turn.get("round_number"))
+        round_counts[key] = round_counts.get(key, 0) + 1
+
+    last_turn = max(turns, key=lambda x: x.get("timestamp", "")) if turns else None
+    last_speaker = await AsyncDB.get(Collections.PARTICIPANTS, last_turn["speaker_id"]) if last_turn else None
+    return {
+        "round_counts": round_counts,
+        "last_speaker_id": last_turn["speaker_id"] if last_turn else None,
+        "last_speaker_team": last_speaker.get("team") if last_speaker else None
+    }
+
+
+async def _claim_turn(
+    room_id: str, participant: Dict[str, Any], round_number: int, debater_count: int
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Reserve a turn slot with a compare-and-set on the room's turn state,
+    so concurrent submissions cannot both pass validation. Returns the
+    (previous, claimed) turn states for _insert_claimed_turn.
+    Raises HTTPException when the turn is not allowed.
+    """
+    for _ in range(TURN_CLAIM_RETRIES):
+        room = await AsyncDB.get(Collections.ROOMS, room_id)
+        if not room:
+            raise HTTPException(status_code=404, detail="Room not found")
+        state = room.get("turn_state") or await _turn_state_from_turns(room_id)
+        round_counts = state["round_counts"]
+
+        if round_counts.get(str(round_number), 0) >= debater_count:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Round {round_number} already has {debater_count} turns. Wait for next round."
+            )
+
+        if state.get("last_speaker_id") == participant["id"]:
+            raise HTTPException(
+                status_code=400,
+                detail="You cannot submit consecutive turns. Please wait for another participant to respond."
+            )
+
+        if (room.get("format") == "team" and participant.get("team")
+                and state.get("last_speaker_team") == participant.get("team")):
+            raise HTTPException(
+                status_code=400,
+                detail="Your team cannot submit consecutive turns. Please wait for the other team to respond."
+            )
+
+        new_state = {
+            "round_counts": {**round_counts, str(round_number): round_counts.get(str(round_number), 0) + 1},
+            "last_speaker_id": participant["id"],
+            "last_speaker_team": participant.get("team")
+        }
+        try:
+            await AsyncDB.update(Collections.ROOMS, room_id, {"turn_state": new_state},
+                                 expected_version=room.get(VERSION_FIELD, 0))
+            return state, new_state
+        except VersionConflict:
+            continue
+
+    raise HTTPException(
+        status_code=409, detail="Too many simultaneous submissions. Please try again.")
+
+
+async def _release_turn(room_id: str, round_number: int, previous: Dict[str, Any], claimed: Dict[str, Any]):
+    """
+    Undo a turn claim whose turn was never stored: restore the previous
+    state, or if other turns were claimed since, give back the round slot
+    """
+    for _ in range(TURN_CLAIM_RETRIES):
+        room = await AsyncDB.get(Collections.ROOMS, room_id)
+        state = room.get("turn_state") if room else None
+        if not state:
+            return
+        if state == claimed:
+            restored = previous
+        else:
+            round_counts = dict(state["round_counts"])
+            round_counts[str(round_number)] = max(round_counts.get(str(round_number), 0) - 1, 0)
+            restored = {**state, "round_counts": round_counts}
+        try:
+            await AsyncDB.update(Collections.ROOMS, room_id, {"turn_state": restored},
+                                 expected_version=room.get(VERSION_FIELD, 0))
+            return
+        except VersionConflict:
+            continue
+    print(f"⚠️  Could not release a turn claim in room {room_id} round {round_number}")
+
+
+async def _insert_claimed_turn(
+    room_id: str, claim: Tuple[Dict[str, Any], Dict[str, Any]], turn: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Store a turn whose slot was claimed, releasing the claim if storing fails"""
+    try:
+        return await AsyncDB.insert(Collections.TURNS, turn)
+    except Exception:
+        await _release_turn(room_id, turn["round_number"], *claim)
+        raise
 
 
 async def generate_debate_results(room_id: str):
@@ -21,23 +146,26 @@ async def generate_debate_results(room_id: str):
     Generate comprehensive AI results after debate completes
     Calculates scores, determines winner, generates personalized feedback
     """
-    room = DB.get(Collections.ROOMS, room_id)
+    room = await AsyncDB.get(Collections.ROOMS, room_id)
     if not room:
         raise ValueError("Room not found")
 
     # Get all participants and turns
-    participants = DB.find(Collections.PARTICIPANTS, {"room_id": room_id})
-    all_turns = DB.find(Collections.TURNS, {"room_id": room_id})
+    participants = Participant.from_dicts(
+        await AsyncDB.find(Collections.PARTICIPANTS, {"room_id": room_id}))
+    all_turns = Turn.from_dicts(
+        await AsyncDB.find(Collections.TURNS, {"room_id": room_id}, limit=None))
     debaters = [p for p in participants if p.get("role") == "debater"]
+    turns_by_speaker = group_by(all_turns, "speaker_id")
 
     # Calculate participant scores from turn feedback
     participant_scores = {}
     participant_feedback = {}
+    score_updates = {}
 
     for participant in debaters:
         # Get all turns for this participant
-        participant_turns = [
-            t for t in all_turns if t["speaker_id"] == participant["id"]]
+        participant_turns = turns_by_speaker.get(participant.id)
 
         if not participant_turns:
             continue
@@ -51,7 +179,7 @@ async def generate_debate_results(room_id: str):
         all_weaknesses = []
 
         for turn in participant_turns:
-            feedback = turn.get("ai_feedback", {})
+            feedback = turn.get("ai_feedback")
             if feedback:
                 total_logic += feedback.get("logic", 0)
                 total_credibility += feedback.get("credibility", 0)
@@ -77,14 +205,14 @@ async def generate_debate_results(room_id: str):
                 avg_scores["rhetoric"] * 0.25
             )
 
-            participant_scores[participant["id"]] = {
+            participant_scores[participant.id] = {
                 **avg_scores,
                 "weighted_total": weighted_total,
                 "total": weighted_total  # Alias for compatibility
             }
 
             # Store individual feedback
-            participant_feedback[participant["id"]] = {
+            participant_feedback[participant.id] = {
                 # Top 5 unique strengths
                 "strengths": list(set(all_strengths))[:5],
                 # Top 5 unique weaknesses
@@ -101,12 +229,10 @@ async def generate_debate_results(room_id: str):
                 ][:3]
             }
 
-            # Update participant with scores
-            DB.update(
-                Collections.PARTICIPANTS,
-                str(participant["id"]),
-                {"score": avg_scores}
-            )
+            # Queue participant score update (written in one batch below)
+            score_updates[str(participant.id)] = {"score": avg_scores}
+
+    await AsyncDB.update_many(Collections.PARTICIPANTS, score_updates)
 
     # Determine winner (highest weighted score)
     winner_id = None
@@ -135,16 +261,16 @@ async def generate_debate_results(room_id: str):
 
     # Ensure ALL debaters have entries (even if they have no turns)
     for participant in debaters:
-        if participant["id"] not in participant_scores:
-            participant_scores[participant["id"]] = {
+        if participant.id not in participant_scores:
+            participant_scores[participant.id] = {
                 "logic": 0,
                 "credibility": 0,
                 "rhetoric": 0,
                 "weighted_total": 0,
                 "total": 0
             }
-        if participant["id"] not in participant_feedback:
-            participant_feedback[participant["id"]] = {
+        if participant.id not in participant_feedback:
+            participant_feedback[participant.id] = {
                 "strengths": ["Participated in the debate"],
                 "weaknesses": ["Submit more turns to get detailed feedback"],
                 "improvements": ["Engage more actively in future debates"],
@@ -163,12 +289,12 @@ async def generate_debate_results(room_id: str):
     }
 
     # Save result to database
-    DB.insert(Collections.RESULTS, result)
+    await AsyncDB.insert(Collections.RESULTS, result)
 
     return result
 
 
-async def _generate_ai_turn(room: Dict[str, Any], ai_participant: Dict[str, Any], round_number: int, turn_number: int, previous_turns: List[Dict]):
+async def _generate_ai_turn(room: Dict[str, Any], ai_participant: Dict[str, Any], round_number: int, turn_number: int, previous_turns: List[Dict], debater_count: int):
     """
     Generate an AI opponent's turn using Gemini AI
     """
@@ -204,17 +330,10 @@ Generate a compelling debate argument (2-3 paragraphs). Be persuasive, use logic
             "is_ai": True
         }
         
-        new_turn = DB.insert(Collections.TURNS, ai_turn)
+        claim = await _claim_turn(room["id"], ai_participant, round_number, debater_count)
+        new_turn = await _insert_claimed_turn(room["id"], claim, ai_turn)
         print(f"🤖 AI Opponent submitted turn {turn_number} in round {round_number}")
         
-        # Broadcast Socket.IO notification
-        await broadcast_to_room(room["id"], "new_turn", {
-            "turn": new_turn,
-            "speaker_id": ai_participant["id"],
-            "speaker_name": "AI Opponent",
-            "timestamp": new_turn.get("submitted_at")
-        })
-        
     except Exception as e:
         print(f"⚠️  AI turn generation failed: {e}")
 
@@ -234,7 +353,7 @@ async def _analyze_round_background(room: Dict[str, Any], round_number: int, rou
                     turn_content=turn["content"],
                     context=room.get("topic")
                 )
-                DB.update(
+                await async_write_buffer.update(
                     Collections.TURNS,
                     turn["id"],
                     {"ai_feedback": ai_feedback}
@@ -243,13 +362,14 @@ async def _analyze_round_background(room: Dict[str, Any], round_number: int, rou
             except Exception as e:
                 print(f"⚠️  Failed to analyze turn {turn['id']}: {e}")
 
-    # Analyze all turns in parallel
+    # Analyze all turns in parallel, then commit their feedback as one batch
     await asyncio.gather(*[analyze_turn(turn) for turn in round_turns])
+    await async_write_buffer.flush(Collections.TURNS)
     print(f"✅ Round {round_number} analysis complete!")
     
     # If this is a training room with AI, generate AI's response for next turn
     if room.get("is_training"):
-        participants = DB.find(Collections.PARTICIPANTS, {"room_id": room["id"]})
+        participants = await AsyncDB.find(Collections.PARTICIPANTS, {"room_id": room["id"]})
         ai_participant = next((p for p in participants if p.get("is_ai")), None)
         
         if ai_participant:
@@ -259,20 +379,15 @@ async def _analyze_round_background(room: Dict[str, Any], round_number: int, rou
             
             # If human just went and round is not complete, AI should respond
             if human_participant and len(current_round_turns) < debater_count:
-                await _generate_ai_turn(room, ai_participant, round_number, len(current_round_turns) + 1, all_turns)
+                await _generate_ai_turn(room, ai_participant, round_number, len(current_round_turns) + 1, all_turns, debater_count)
 
     # Check if ALL rounds are now complete and auto-end the debate
     total_rounds = room.get("rounds", 3)
     expected_total_turns = total_rounds * debater_count
 
-    if len(all_turns) >= expected_total_turns and room.get("status") == "ongoing":
+    if len(all_turns) >= expected_total_turns and await _transition_room_status(
+            room["id"], DebateStatus.ONGOING.value, DebateStatus.COMPLETED.value):
         print(f"🏁 All {total_rounds} rounds complete ({len(all_turns)}/{expected_total_turns} turns)! Auto-ending debate...")
-        DB.update(Collections.ROOMS, room["id"], {"status": "completed"})
-        
-        # Invalidate all caches for this room (auto-ended)
-        room_cache.delete(f"debate_status_{room['id']}")
-        room_cache.delete(f"transcript_{room['id']}")
-        room_cache.delete(f"room_code_{room.get('room_code', '').upper()}")
         
         print("✅ Debate automatically ended")
 
@@ -290,14 +405,14 @@ async def check_and_analyze_round(room: Dict[str, Any], round_number: int):
     PERFORMANCE FIX: Does NOT block submission response
     """
     # Get all participants who are debaters
-    participants = DB.find(Collections.PARTICIPANTS, {"room_id": room["id"]})
+    participants = await AsyncDB.find(Collections.PARTICIPANTS, {"room_id": room["id"]})
     debater_count = len([p for p in participants if p.get("role") == "debater"])
 
     if debater_count == 0:
         debater_count = 2  # Default to 2 if no debaters found
 
     # Get all turns for this round
-    all_turns = DB.find(Collections.TURNS, {"room_id": room["id"]})
+    all_turns = await AsyncDB.find(Collections.TURNS, {"room_id": room["id"]}, limit=None)
     round_turns = [t for t in all_turns if t["round_number"] == round_number]
 
     # Check if round is complete
@@ -320,18 +435,14 @@ async def submit_turn(
     Submit a debate turn (text argument)
     AI analysis happens in batch after round completion
     """
-    room = DB.get(Collections.ROOMS, room_id)
+    room = await AsyncDB.get(Collections.ROOMS, room_id)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
 
     if room["status"] == DebateStatus.UPCOMING.value:
-        DB.update(Collections.ROOMS, room_id, {
+        await AsyncDB.update(Collections.ROOMS, room_id, {
                   "status": DebateStatus.ONGOING.value})
         room["status"] = DebateStatus.ONGOING.value
-        
-        # Invalidate caches when debate starts
-        room_cache.delete(f"debate_status_{room_id}")
-        room_cache.delete(f"room_code_{room.get('room_code', '').upper()}")
 
     if room["status"] != DebateStatus.ONGOING.value:
         raise HTTPException(
@@ -345,7 +456,7 @@ async def submit_turn(
             detail=f"Invalid round number. Debate has only {total_rounds} rounds."
         )
 
-    participant = DB.find_one(
+    participant = await AsyncDB.find_one(
         Collections.PARTICIPANTS,
         {"user_id": current_user["id"], "room_id": room["id"]}
     )
@@ -353,103 +464,27 @@ async def submit_turn(
         raise HTTPException(
             status_code=403, detail="Not a participant in this debate")
 
-    # PERFORMANCE FIX: Only fetch last turn for enforcement (not all turns)
-    all_turns = DB.find(Collections.TURNS, {"room_id": room["id"]}, limit=100)
-    
-    # CRITICAL VALIDATION: Reject submissions when round already has enough turns
-    participants_list = DB.find(Collections.PARTICIPANTS, {"room_id": room["id"]})
+    participants_list = await AsyncDB.find(Collections.PARTICIPANTS, {"room_id": room["id"]})
     debater_count = len([p for p in participants_list if p.get("role") == "debater"])
-    round_turns = [t for t in all_turns if t.get("round_number") == turn_data.round_number]
-    
-    if len(round_turns) >= debater_count:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Round {turn_data.round_number} already has {debater_count} turns. Wait for next round."
-        )
-    if all_turns:
-        # Sort by timestamp to get the most recent turn (only need one)
-        last_turn = max(all_turns, key=lambda x: x.get("timestamp", ""))
-
-        # Check if the same participant submitted the last turn
-        if last_turn["speaker_id"] == participant["id"]:
-            raise HTTPException(
-                status_code=400,
-                detail="You cannot submit consecutive turns. Please wait for another participant to respond."
-            )
 
-        # For team debates, check if same team submitted the last turn
-        if room.get("format") == "team" and participant.get("team"):
-            last_speaker = DB.get(Collections.PARTICIPANTS,
-                                  last_turn["speaker_id"])
-            if last_speaker and last_speaker.get("team") == participant.get("team"):
-                raise HTTPException(
-                    status_code=400,
-                    detail="Your team cannot submit consecutive turns. Please wait for the other team to respond."
-                )
+    # Reserve the turn slot (round capacity and turn order are enforced atomically)
+    claim = await _claim_turn(room["id"], participant, turn_data.round_number, debater_count)
 
     from datetime import datetime
 
-    # CRITICAL: Acquire room lock to prevent concurrent submission races
-    if room["id"] not in _room_locks:
-        _room_locks[room["id"]] = asyncio.Lock()
-    
-    async with _room_locks[room["id"]]:
-        # Re-validate ALL constraints immediately before insert (inside lock for atomicity)
-        all_turns_final = DB.find(Collections.TURNS, {"room_id": room["id"]}, limit=100)
-        round_turns_final = [t for t in all_turns_final if t.get("round_number") == turn_data.round_number]
-        
-        # Check round capacity
-        if len(round_turns_final) >= debater_count:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Round {turn_data.round_number} already has {debater_count} turns. Wait for next round."
-            )
-        
-        # Re-check consecutive turn enforcement (critical for fairness)
-        if all_turns_final:
-            last_turn_locked = max(all_turns_final, key=lambda x: x.get("timestamp", ""))
-            
-            if last_turn_locked["speaker_id"] == participant["id"]:
-                raise HTTPException(
-                    status_code=400,
-                    detail="You cannot submit consecutive turns. Please wait for another participant to respond."
-                )
-            
-            if room.get("format") == "team" and participant.get("team"):
-                last_speaker_locked = DB.get(Collections.PARTICIPANTS, last_turn_locked["speaker_id"])
-                if last_speaker_locked and last_speaker_locked.get("team") == participant.get("team"):
-                    raise HTTPException(
-                        status_code=400,
-                        detail="Your team cannot submit consecutive turns. Please wait for the other team to respond."
-                    )
-        
-        new_turn = {
-            "room_id": room["id"],
-            "speaker_id": participant["id"],
-            "content": turn_data.content,
-            "audio_url": None,
-            "round_number": turn_data.round_number,
-            "turn_number": turn_data.turn_number,
-            "ai_feedback": None,  # Will be analyzed in batch after round completion
-            "timestamp": datetime.utcnow().isoformat()
-        }
+    new_turn = {
+        "room_id": room["id"],
+        "speaker_id": participant["id"],
+        "content": turn_data.content,
+        "audio_url": None,
+        "round_number": turn_data.round_number,
+        "turn_number": turn_data.turn_number,
+        "ai_feedback": None,  # Will be analyzed in batch after round completion
+        "timestamp": datetime.utcnow().isoformat()
+    }
 
-        turn = DB.insert(Collections.TURNS, new_turn)
-
-    # Invalidate caches for this room (new data available)
-    room_cache.delete(f"debate_status_{room_id}")
-    room_cache.delete(f"transcript_{room_id}")
-    
-    # Broadcast Socket.IO notification for real-time updates
-    try:
-        await broadcast_to_room(room["id"], "new_turn", {
-            "turn": turn,
-            "speaker_id": participant["id"],
-            "speaker_name": current_user.get("username", "Anonymous"),
-            "timestamp": turn.get("timestamp")
-        })
-    except Exception as ws_error:
-        print(f"⚠️  Socket.IO broadcast failed: {ws_error}")
+    # Stored turns are broadcast to the room by the change feed subscriber
+    turn = await _insert_claimed_turn(room["id"], claim, new_turn)
 
     # Check if round is complete and trigger batch analysis
     await check_and_analyze_round(room, turn_data.round_number)
@@ -469,18 +504,14 @@ async def submit_audio(
     """
     Submit a debate turn with audio (and optional text)
     """
-    room = DB.get(Collections.ROOMS, room_id)
+    room = await AsyncDB.get(Collections.ROOMS, room_id)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
 
     if room["status"] == DebateStatus.UPCOMING.value:
-        DB.update(Collections.ROOMS, room_id, {
+        await AsyncDB.update(Collections.ROOMS, room_id, {
                   "status": DebateStatus.ONGOING.value})
         room["status"] = DebateStatus.ONGOING.value
-        
-        # Invalidate caches when debate starts
-        room_cache.delete(f"debate_status_{room_id}")
-        room_cache.delete(f"room_code_{room.get('room_code', '').upper()}")
 
     if room["status"] != DebateStatus.ONGOING.value:
         raise HTTPException(
@@ -494,7 +525,7 @@ async def submit_audio(
             detail=f"Invalid round number. Debate has only {total_rounds} rounds."
         )
 
-    participant = DB.find_one(
+    participant = await AsyncDB.find_one(
         Collections.PARTICIPANTS,
         {"user_id": current_user["id"], "room_id": room["id"]}
     )
@@ -520,91 +551,26 @@ async def submit_audio(
     if content.strip() and transcription and transcription not in ["[Audio transcription unavailable]", "[Audio transcription failed - please try again]"]:
         final_content = f"{content.strip()}\n\n[Transcription]: {transcription}"
 
-    # CRITICAL: Validate IMMEDIATELY BEFORE INSERT to close race window
-    # Re-fetch turns to get latest state after long audio operations
-    all_turns = DB.find(Collections.TURNS, {"room_id": room["id"]}, limit=100)
-    participants_list = DB.find(Collections.PARTICIPANTS, {"room_id": room["id"]})
+    # Reserve the turn slot after the long audio operations, right before insert
+    participants_list = await AsyncDB.find(Collections.PARTICIPANTS, {"room_id": room["id"]})
     debater_count = len([p for p in participants_list if p.get("role") == "debater"])
-    round_turns = [t for t in all_turns if t.get("round_number") == round_number]
-    
-    # Check round capacity
-    if len(round_turns) >= debater_count:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Round {round_number} already has {debater_count} turns. Wait for next round."
-        )
-    
-    # Check consecutive turn enforcement
-    if all_turns:
-        last_turn = max(all_turns, key=lambda x: x.get("timestamp", ""))
-        
-        if last_turn["speaker_id"] == participant["id"]:
-            raise HTTPException(
-                status_code=400,
-                detail="You cannot submit consecutive turns. Please wait for another participant to respond."
-            )
-        
-        if room.get("format") == "team" and participant.get("team"):
-            last_speaker = DB.get(Collections.PARTICIPANTS, last_turn["speaker_id"])
-            if last_speaker and last_speaker.get("team") == participant.get("team"):
-                raise HTTPException(
-                    status_code=400,
-                    detail="Your team cannot submit consecutive turns. Please wait for the other team to respond."
-                )
+    claim = await _claim_turn(room["id"], participant, round_number, debater_count)
 
     from datetime import datetime
 
-    # CRITICAL: Acquire room lock to prevent concurrent submission races
-    if room["id"] not in _room_locks:
-        _room_locks[room["id"]] = asyncio.Lock()
-    
-    async with _room_locks[room["id"]]:
-        # Re-validate ALL constraints immediately before insert (inside lock for atomicity)
-        all_turns_final = DB.find(Collections.TURNS, {"room_id": room["id"]}, limit=100)
-        round_turns_final = [t for t in all_turns_final if t.get("round_number") == round_number]
-        
-        # Check round capacity
-        if len(round_turns_final) >= debater_count:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Round {round_number} already has {debater_count} turns. Wait for next round."
-            )
-        
-        # Re-check consecutive turn enforcement (critical for fairness)
-        if all_turns_final:
-            last_turn_locked = max(all_turns_final, key=lambda x: x.get("timestamp", ""))
-            
-            if last_turn_locked["speaker_id"] == participant["id"]:
-                raise HTTPException(
-                    status_code=400,
-                    detail="You cannot submit consecutive turns. Please wait for another participant to respond."
-                )
-            
-            if room.get("format") == "team" and participant.get("team"):
-                last_speaker_locked = DB.get(Collections.PARTICIPANTS, last_turn_locked["speaker_id"])
-                if last_speaker_locked and last_speaker_locked.get("team") == participant.get("team"):
-                    raise HTTPException(
-                        status_code=400,
-                        detail="Your team cannot submit consecutive turns. Please wait for the other team to respond."
-                    )
-        
-        # Create turn with audio and transcription
-        new_turn = {
-            "room_id": room["id"],
-            "speaker_id": participant["id"],
-            "content": final_content,
-            "audio_url": audio_path,
-            "round_number": round_number,
-            "turn_number": turn_number,
-            "ai_feedback": None,  # Will be analyzed in batch after round completion
-            "timestamp": datetime.utcnow().isoformat()
-        }
-
-        turn = DB.insert(Collections.TURNS, new_turn)
+    # Create turn with audio and transcription
+    new_turn = {
+        "room_id": room["id"],
+        "speaker_id": participant["id"],
+        "content": final_content,
+        "audio_url": audio_path,
+        "round_number": round_number,
+        "turn_number": turn_number,
+        "ai_feedback": None,  # Will be analyzed in batch after round completion
+        "timestamp": datetime.utcnow().isoformat()
+    }
 
-    # Invalidate caches for this room (new data available)
-    room_cache.delete(f"debate_status_{room_id}")
-    room_cache.delete(f"transcript_{room_id}")
+    turn = await _insert_claimed_turn(room["id"], claim, new_turn)
 
     # Check if round is complete and trigger batch analysis
     await check_and_analyze_round(room, round_number)
@@ -613,29 +579,21 @@ async def submit_audio(
 
 
 @router.get("/{room_id}/transcript", response_model=List[TurnResponse])
+# Cache for 60 seconds; with ROOM_CACHE_STALE_SECONDS, the previous transcript
+# is served after a new turn while one background load rebuilds it
+@cached(room_cache, "transcript_{room_id}", ttl_seconds=60,
+        stale_ttl_seconds=settings.ROOM_CACHE_STALE_SECONDS, tags=["room:{room_id}"])
 async def get_transcript(room_id: str):
     """
     Get full debate transcript with caching
     """
-    # Try cache first (15 second TTL for transcript)
-    cache_key = f"transcript_{room_id}"
-    cached_transcript = room_cache.get(cache_key)
-    if cached_transcript:
-        return cached_transcript
-
-    # Fetch from database
-    room = DB.get(Collections.ROOMS, room_id)
+    room = await AsyncDB.get(Collections.ROOMS, room_id)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
 
-    turns = DB.find(Collections.TURNS, {"room_id": room["id"]}, limit=1000)
-    sorted_turns = sorted(turns, key=lambda x: (
-        x["round_number"], x["turn_number"]))
-
-    # Cache for 60 seconds (aggressive caching to reduce DB load)
-    room_cache.set(cache_key, sorted_turns, ttl_seconds=60)
-
-    return sorted_turns
+    # Cached as read-only Turn records (validated by TurnResponse like dicts)
+    return Turn.from_dicts(await room_documents(
+        room, Collections.TURNS, sort=[("round_number", ASCENDING), ("turn_number", ASCENDING)]))
 
 
 @router.post("/{room_id}/end")
@@ -646,7 +604,7 @@ async def end_debate(
     """
     End a debate and trigger final AI judging
     """
-    room = DB.get(Collections.ROOMS, room_id)
+    room = await AsyncDB.get(Collections.ROOMS, room_id)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
 
@@ -654,19 +612,12 @@ async def end_debate(
         raise HTTPException(
             status_code=403, detail="Only the host can end the debate")
 
-    if room["status"] != DebateStatus.ONGOING.value:
+    if not await _transition_room_status(
+            room_id, DebateStatus.ONGOING.value, DebateStatus.COMPLETED.value):
         raise HTTPException(status_code=400, detail="Debate is not ongoing")
 
-    DB.update(Collections.ROOMS, room_id, {
-              "status": DebateStatus.COMPLETED.value})
-
-    # Invalidate all caches for this room (status changed to completed)
-    room_cache.delete(f"debate_status_{room_id}")
-    room_cache.delete(f"transcript_{room_id}")
-    room_cache.delete(f"room_code_{room.get('room_code', '').upper()}")
-
-    participants = DB.find(Collections.PARTICIPANTS, {"room_id": room["id"]})
-    turns = DB.find(Collections.TURNS, {"room_id": room["id"]})
+    participants = await AsyncDB.find(Collections.PARTICIPANTS, {"room_id": room["id"]})
+    turns = await AsyncDB.find(Collections.TURNS, {"room_id": room["id"]}, limit=None)
 
     participant_scores = {}
     for participant in participants:
@@ -680,14 +631,11 @@ async def end_debate(
         participant_scores=participant_scores
     )
 
-    spectator_votes = DB.find(Collections.SPECTATOR_VOTES, {
-                              "room_id": room["id"]})
+    # Reactions are tallied on their targets as they arrive (reward_participant)
     spectator_influence = {}
-    for vote in spectator_votes:
-        target_id = str(vote["target_id"])
-        if target_id not in spectator_influence:
-            spectator_influence[target_id] = 0
-        spectator_influence[target_id] += 1
+    for participant in Participant.from_dicts(participants):
+        if participant.get("reaction_count"):
+            spectator_influence[str(participant.id)] = participant.reaction_count
 
     result = {
         "room_id": room["id"],
@@ -699,55 +647,61 @@ async def end_debate(
         "spectator_influence": spectator_influence
     }
 
-    DB.insert(Collections.RESULTS, result)
+    await AsyncDB.insert(Collections.RESULTS, result)
 
     return {"message": "Debate ended", "result": result}
 
 
 @router.get("/{room_id}/status")
+# Never served stale: clients take turns from it, so it must reflect every write
+@cached(room_cache, "debate_status_{room_id}", ttl_seconds=60,
+        tags=["room:{room_id}", lambda status: [f"user:{p['user_id']}" for p in status["participants"]]])
 async def get_debate_status(room_id: str):
     """
     Get current debate status with caching and optimized payload
     """
-    # Try cache first (60 second TTL for debate status)
-    cache_key = f"debate_status_{room_id}"
-    cached_status = room_cache.get(cache_key)
-    if cached_status:
-        return cached_status
-
-    # Fetch from database
-    room = DB.get(Collections.ROOMS, room_id)
+    room = await AsyncDB.get(Collections.ROOMS, room_id)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
+    room = Room.from_dict(room)
 
-    participants = DB.find(Collections.PARTICIPANTS, {"room_id": room["id"]})
-    turns = DB.find(Collections.TURNS, {"room_id": room["id"]})
+    participants = Participant.from_dicts(await room_documents(room, Collections.PARTICIPANTS))
+    # Only the number of turns is reported; counting uses the room_id index
+    if is_archived(room):
+        turn_count = len(await room_documents(room, Collections.TURNS))
+    else:
+        turn_count = await AsyncDB.count(Collections.TURNS, {"room_id": room["id"]})
 
-    # Batch fetch all unique users (single DB query per unique user, using cache)
-    user_ids = list(set(p["user_id"] for p in participants))
+    # Batch fetch all unique users (one bulk DB call for cache misses)
+    user_ids = list(set(p.user_id for p in participants))
     user_map = {}
+    missing_ids = []
     for user_id in user_ids:
-        cache_key_user = f"user_{user_id}"
-        user = user_cache.get(cache_key_user)
+        user = user_cache.get(f"user_{user_id}")
         if user is None:
-            user = DB.get(Collections.USERS, user_id)
-            if user:
-                user_cache.set(cache_key_user, user)
+            missing_ids.append(user_id)
+        else:
+            user_map[user_id] = user
+
+    fetched_users = await AsyncDB.get_many(Collections.USERS, missing_ids)
+    for user_id in missing_ids:
+        user = fetched_users.get(str(user_id))
         if user:
+            user_cache.set(f"user_{user_id}", user, tags=[f"user:{user_id}"])
             user_map[user_id] = user
 
     # Enrich participants with minimal user info
     enriched_participants = []
     for participant in participants:
-        user = user_map.get(participant['user_id'])
+        user = user_map.get(participant.user_id)
         # Only include essential fields to reduce payload size
         enriched_participants.append({
-            "id": participant["id"],
-            "user_id": participant["user_id"],
+            "id": participant.id,
+            "user_id": participant.user_id,
             "username": user.get("username", "Unknown") if user else "Unknown",
             "name": (user.get("full_name") or user.get("username", "Unknown")) if user else "Unknown",
             "team": participant.get("team"),
-            "role": participant["role"],
+            "role": participant.role,
             "is_ready": participant.get("is_ready", False),
             "score": participant.get("score", {})
         })
@@ -755,9 +709,9 @@ async def get_debate_status(room_id: str):
     # Minimize room data in response (only essential fields)
     status_response = {
         "room": {
-            "id": room["id"],
+            "id": room.id,
             "topic": room.get("topic"),
-            "status": room["status"],
+            "status": room.status,
             "rounds": room.get("rounds", 3),
             "mode": room.get("mode"),
             "type": room.get("type"),
@@ -765,11 +719,8 @@ async def get_debate_status(room_id: str):
             "host_id": room.get("host_id")
         },
         "participants": enriched_participants,
-        "turn_count": len(turns),
-        "status": room["status"]
+        "turn_count": turn_count,
+        "status": room.status
     }
 
-    # Cache for 60 seconds (aggressive caching to reduce DB load)
-    room_cache.set(cache_key, status_response, ttl_seconds=60)
-
     return status_response
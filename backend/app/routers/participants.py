@@ -2,8 +2,8 @@ from fastapi import APIRouter, HTTPException, Depends
 from typing import Dict, Any
 from app.schemas import ParticipantJoin, ParticipantResponse
 from app.replit_auth import get_current_user
-from app.replit_db import DB, Collections
-from app.cache import room_cache
+from app.replit_db import AsyncDB, Collections
+from app.archive import is_archived
 
 router = APIRouter(prefix="/api/participants", tags=["Participants"])
 
@@ -16,11 +16,13 @@ async def join_room(
     """
     Join a debate room as a participant
     """
-    room = DB.find_one(Collections.ROOMS, {"room_code": join_data.room_code})
+    room = await AsyncDB.find_one(Collections.ROOMS, {"room_code": join_data.room_code})
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
+    if is_archived(room):
+        raise HTTPException(status_code=400, detail="Debate has been archived")
 
-    existing = DB.find_one(
+    existing = await AsyncDB.find_one(
         Collections.PARTICIPANTS,
         {"user_id": current_user["id"], "room_id": room["id"]}
     )
@@ -37,10 +39,7 @@ async def join_room(
         "xp_earned": 0
     }
 
-    participant = DB.insert(Collections.PARTICIPANTS, new_participant)
-
-    # Invalidate debate status cache so join is immediately visible
-    room_cache.delete(f"debate_status_{room['id']}")
+    participant = await AsyncDB.insert(Collections.PARTICIPANTS, new_participant)
 
     return participant
 
@@ -50,7 +49,7 @@ async def get_participant(participant_id: str):
     """
     Get participant details
     """
-    participant = DB.get(Collections.PARTICIPANTS, participant_id)
+    participant = await AsyncDB.get(Collections.PARTICIPANTS, participant_id)
     if not participant:
         raise HTTPException(status_code=404, detail="Participant not found")
     return participant
@@ -64,19 +63,16 @@ async def mark_ready(
     """
     Mark participant as ready
     """
-    participant = DB.get(Collections.PARTICIPANTS, participant_id)
+    participant = await AsyncDB.get(Collections.PARTICIPANTS, participant_id)
     if not participant:
         raise HTTPException(status_code=404, detail="Participant not found")
 
     if str(participant["user_id"]) != str(current_user["id"]):
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    updated = DB.update(Collections.PARTICIPANTS,
+    updated = await AsyncDB.update(Collections.PARTICIPANTS,
                         participant_id, {"is_ready": True})
 
-    # Invalidate debate status cache so ready status is immediately visible
-    room_cache.delete(f"debate_status_{participant['room_id']}")
-
     return updated
 
 
@@ -88,7 +84,7 @@ async def leave_room(
     """
     Leave a debate room
     """
-    participant = DB.get(Collections.PARTICIPANTS, participant_id)
+    participant = await AsyncDB.get(Collections.PARTICIPANTS, participant_id)
     if not participant:
         raise HTTPException(status_code=404, detail="Participant not found")
 
@@ -96,9 +92,6 @@ async def leave_room(
         raise HTTPException(status_code=403, detail="Not authorized")
 
     room_id = participant["room_id"]
-    DB.delete(Collections.PARTICIPANTS, participant_id)
-
-    # Invalidate debate status cache so leave is immediately visible
-    room_cache.delete(f"debate_status_{room_id}")
+    await AsyncDB.delete(Collections.PARTICIPANTS, participant_id)
 
     return {"message": "Left room successfully"}
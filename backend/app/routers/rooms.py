@@ -1,35 +1,33 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
 from typing import Dict, Any, List, Optional
 import secrets
 from datetime import datetime
 from app.schemas import RoomCreate, RoomUpdate, RoomResponse
 from app.replit_auth import get_current_user
-from app.replit_db import DB, Collections
+from app.replit_db import AsyncDB, Collections, DESCENDING
 from app.models import DebateStatus
-from app.cache import user_cache, room_cache
+from app.cache import user_cache, room_cache, cached
+from app.archive import is_archived
+from app.records import Room
 
 router = APIRouter(prefix="/api/rooms", tags=["Rooms"])
 
 
-def generate_room_code() -> str:
+async def generate_room_code() -> str:
     """Generate a unique 6-character room code"""
     while True:
         code = secrets.token_hex(3).upper()
-        existing = DB.find_one(Collections.ROOMS, {"room_code": code})
+        existing = await AsyncDB.find_one(Collections.ROOMS, {"room_code": code})
         if not existing:
             return code
 
 
-def enrich_room_with_host(room: Dict[str, Any]) -> Dict[str, Any]:
+async def enrich_room_with_host(room: Dict[str, Any]) -> Dict[str, Any]:
     """Add host_name to room data by looking up the host user (cached)"""
     if room and "host_id" in room:
-        cache_key = f"user_{room['host_id']}"
-        host = user_cache.get(cache_key)
-
-        if host is None:
-            host = DB.get(Collections.USERS, room["host_id"])
-            if host:
-                user_cache.set(cache_key, host)
+        host = await user_cache.get_or_load(
+            f"user_{room['host_id']}", lambda: AsyncDB.get(Collections.USERS, room["host_id"]),
+            tags=[f"user:{room['host_id']}"])
 
         room["host_name"] = host.get(
             "username", "Anonymous") if host else "Anonymous"
@@ -44,7 +42,7 @@ async def create_room(
     """
     Create a new debate room
     """
-    room_code = generate_room_code()
+    room_code = await generate_room_code()
     is_training = room_data.topic.startswith("AI Training:")
 
     new_room = {
@@ -63,7 +61,7 @@ async def create_room(
         "is_training": is_training
     }
 
-    room = DB.insert(Collections.ROOMS, new_room)
+    room = await AsyncDB.insert(Collections.ROOMS, new_room)
     
     # If this is a training room, create an AI opponent participant
     if is_training:
@@ -78,62 +76,77 @@ async def create_room(
             "is_ai": True,
             "joined_at": datetime.utcnow().isoformat()
         }
-        DB.insert(Collections.PARTICIPANTS, ai_participant)
+        await AsyncDB.insert(Collections.PARTICIPANTS, ai_participant)
     
-    return enrich_room_with_host(room)
+    return await enrich_room_with_host(room)
 
 
 @router.get("/list", response_model=List[RoomResponse])
 async def list_rooms(
+    response: Response,
     status: Optional[str] = None,
-    limit: int = 100
+    limit: int = 100,
+    cursor: Optional[str] = None
 ):
     """
-    List all public debate rooms, optionally filtered by status
+    List public debate rooms, newest first, optionally filtered by status.
+    When more rooms remain, the X-Next-Cursor header holds the cursor for the next page.
     """
     filter_criteria = {"visibility": "public"}
     if status:
         filter_criteria["status"] = status
 
-    rooms = DB.find(Collections.ROOMS, filter_criteria, limit=limit)
-    return [enrich_room_with_host(room) for room in rooms]
+    try:
+        page = await AsyncDB.find_page(
+            Collections.ROOMS, filter_criteria,
+            sort=[("created_at", DESCENDING)], limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    rooms = page["items"]
+    if page["next_cursor"]:
+        response.headers["X-Next-Cursor"] = page["next_cursor"]
+
+    # Warm the user cache for all uncached hosts with one bulk fetch
+    missing_host_ids = [
+        room["host_id"] for room in rooms
+        if "host_id" in room and user_cache.get(f"user_{room['host_id']}") is None
+    ]
+    hosts = await AsyncDB.get_many(Collections.USERS, missing_host_ids)
+    for host_id, host in hosts.items():
+        user_cache.set(f"user_{host_id}", host, tags=[f"user:{host_id}"])
+
+    return [await enrich_room_with_host(room) for room in rooms]
 
 
 @router.get("/code/{room_code}", response_model=RoomResponse)
+# Cache for 90 seconds (aggressive caching to reduce DB load)
+# Keyed room:code: (and get_room room:id:) so no room ID can hit a code's entry
+@cached(room_cache, lambda room_code: f"room:code:{room_code.upper()}", ttl_seconds=90,
+        tags=[lambda room: [f"room:{room['id']}", f"user:{room.get('host_id')}"]])
 async def get_room_by_code(room_code: str):
     """
     Get a room by its room code with caching for performance
     """
-    code_upper = room_code.upper()
-    cache_key = f"room_code_{code_upper}"
-
-    # Check cache first
-    cached_room = room_cache.get(cache_key)
-    if cached_room:
-        return cached_room
-
-    # Fetch from database
-    room = DB.find_one(Collections.ROOMS, {"room_code": code_upper})
+    room = await AsyncDB.find_one(Collections.ROOMS, {"room_code": room_code.upper()})
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
 
-    enriched_room = enrich_room_with_host(room)
-
-    # Cache for 90 seconds (aggressive caching to reduce DB load)
-    room_cache.set(cache_key, enriched_room, ttl_seconds=90)
-
-    return enriched_room
+    # Cached as a read-only Room record (validated by RoomResponse like a dict)
+    return Room.from_dict(await enrich_room_with_host(room))
 
 
 @router.get("/{room_id}", response_model=RoomResponse)
+@cached(room_cache, "room:id:{room_id}", ttl_seconds=90,
+        tags=["room:{room_id}", lambda room: [f"user:{room.get('host_id')}"]])
 async def get_room(room_id: str):
     """
     Get details of a specific room
     """
-    room = DB.get(Collections.ROOMS, room_id)
+    room = await AsyncDB.get(Collections.ROOMS, room_id)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
-    return enrich_room_with_host(room)
+    # Cached as a read-only Room record (validated by RoomResponse like a dict)
+    return Room.from_dict(await enrich_room_with_host(room))
 
 
 @router.put("/{room_id}/update", response_model=RoomResponse)
@@ -145,7 +158,7 @@ async def update_room(
     """
     Update room details (host only)
     """
-    room = DB.get(Collections.ROOMS, room_id)
+    room = await AsyncDB.get(Collections.ROOMS, room_id)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
 
@@ -163,11 +176,7 @@ async def update_room(
             else:
                 update_data[key] = value
 
-    updated_room = DB.update(Collections.ROOMS, room_id, update_data)
-    
-    # Invalidate caches when room is updated
-    room_cache.delete(f"debate_status_{room_id}")
-    room_cache.delete(f"room_code_{room.get('room_code', '').upper()}")
+    updated_room = await AsyncDB.update(Collections.ROOMS, room_id, update_data)
     
     return updated_room
 
@@ -180,7 +189,7 @@ async def delete_room(
     """
     Delete a room (host only)
     """
-    room = DB.get(Collections.ROOMS, room_id)
+    room = await AsyncDB.get(Collections.ROOMS, room_id)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
 
@@ -188,11 +197,8 @@ async def delete_room(
         raise HTTPException(
             status_code=403, detail="Only the host can delete the room")
 
-    DB.delete(Collections.ROOMS, room_id)
-    
-    # Invalidate all caches when room is deleted
-    room_cache.delete(f"debate_status_{room_id}")
-    room_cache.delete(f"transcript_{room_id}")
-    room_cache.delete(f"room_code_{room.get('room_code', '').upper()}")
+    await AsyncDB.delete(Collections.ROOMS, room_id)
+    if is_archived(room):
+        await AsyncDB.delete(Collections.ARCHIVES, room_id)
     
     return {"message": "Room deleted successfully"}
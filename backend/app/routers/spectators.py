@@ -2,8 +2,10 @@ from fastapi import APIRouter, HTTPException, Depends
 from typing import Dict, Any
 from app.schemas import SpectatorJoin, SpectatorReward, SpectatorStats, ParticipantResponse
 from app.replit_auth import get_current_user, get_current_user_optional
-from app.replit_db import DB, Collections
-from app.cache import room_cache
+from app.replit_db import AsyncDB, Collections
+from app.write_buffer import async_write_buffer
+from app.archive import is_archived, room_documents
+from app.records import Vote
 
 router = APIRouter(prefix="/api/spectators", tags=["Spectators"])
 
@@ -17,11 +19,13 @@ async def join_as_spectator(
     Join a debate room as a spectator
     """
 
-    room = DB.find_one(Collections.ROOMS, {"room_code": join_data.room_code})
+    room = await AsyncDB.find_one(Collections.ROOMS, {"room_code": join_data.room_code})
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
+    if is_archived(room):
+        raise HTTPException(status_code=400, detail="Debate has been archived")
 
-    existing = DB.find_one(
+    existing = await AsyncDB.find_one(
         Collections.PARTICIPANTS,
         {"user_id": current_user["id"], "room_id": room["id"]}
     )
@@ -38,10 +42,7 @@ async def join_as_spectator(
         "xp_earned": 0
     }
 
-    spectator = DB.insert(Collections.PARTICIPANTS, new_spectator)
-
-    # Invalidate debate status cache so spectator join is immediately visible
-    room_cache.delete(f"debate_status_{room['id']}")
+    spectator = await AsyncDB.insert(Collections.PARTICIPANTS, new_spectator)
 
     return spectator
 
@@ -55,11 +56,11 @@ async def reward_participant(
     """
     Spectator rewards a participant with a reaction
     """
-    room = DB.get(Collections.ROOMS, room_id)
+    room = await AsyncDB.get(Collections.ROOMS, room_id)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
 
-    participant = DB.get(Collections.PARTICIPANTS, str(reward_data.target_id))
+    participant = await AsyncDB.get(Collections.PARTICIPANTS, str(reward_data.target_id))
     if not participant:
         raise HTTPException(status_code=404, detail="Participant not found")
 
@@ -70,7 +71,10 @@ async def reward_participant(
         "reaction_type": reward_data.reaction_type
     }
 
-    vote_record = DB.insert(Collections.SPECTATOR_VOTES, vote)
+    # Reactions arrive in bursts; they are committed in batches
+    vote_record = await async_write_buffer.insert(Collections.SPECTATOR_VOTES, vote)
+    # Counted on the participant right away, atomically across workers
+    await AsyncDB.increment(Collections.PARTICIPANTS, str(reward_data.target_id), "reaction_count")
     return {"message": "Reaction recorded", "vote": vote_record}
 
 
@@ -79,23 +83,24 @@ async def get_spectator_stats(room_id: str):
     """
     Get spectator statistics for a room
     """
-    room = DB.get(Collections.ROOMS, room_id)
+    room = await AsyncDB.get(Collections.ROOMS, room_id)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
 
-    spectators = DB.find(
-        Collections.PARTICIPANTS,
-        {"room_id": room["id"], "role": "spectator"}
-    )
+    spectators = await room_documents(room, Collections.PARTICIPANTS, {"role": "spectator"})
 
-    votes = DB.find(Collections.SPECTATOR_VOTES, {"room_id": room["id"]})
+    if is_archived(room):
+        votes = await room_documents(room, Collections.SPECTATOR_VOTES)
+    else:
+        votes = await async_write_buffer.find(Collections.SPECTATOR_VOTES, {"room_id": room["id"]}, limit=None)
+    votes = Vote.from_dicts(votes)
 
     reactions = {}
     for vote in votes:
-        target_id = vote["target_id"]
+        target_id = vote.target_id
         if target_id not in reactions:
             reactions[target_id] = []
-        reactions[target_id].append(vote["reaction_type"])
+        reactions[target_id].append(vote.reaction_type)
 
     total_votes = len(votes)
     support_percentages = {}
@@ -119,7 +124,7 @@ async def leave_as_spectator(
     """
     Leave room as spectator
     """
-    spectator = DB.get(Collections.PARTICIPANTS, spectator_id)
+    spectator = await AsyncDB.get(Collections.PARTICIPANTS, spectator_id)
     if not spectator:
         raise HTTPException(status_code=404, detail="Spectator not found")
 
@@ -127,9 +132,6 @@ async def leave_as_spectator(
         raise HTTPException(status_code=403, detail="Not authorized")
 
     room_id = spectator["room_id"]
-    DB.delete(Collections.PARTICIPANTS, spectator_id)
-
-    # Invalidate debate status cache so spectator leave is immediately visible
-    room_cache.delete(f"debate_status_{room_id}")
+    await AsyncDB.delete(Collections.PARTICIPANTS, spectator_id)
 
     return {"message": "Left room as spectator successfully"}
@@ -2,7 +2,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from typing import Dict, Any, List
 from app.schemas import TrainerAnalyze, TrainerProgress, ChallengeStart, ChallengeSubmit, TrainerRecommendation
 from app.replit_auth import get_current_user
-from app.replit_db import DB, Collections
+from app.replit_db import AsyncDB, Collections
 from app.gemini_ai import GeminiAI
 import secrets
 
@@ -21,7 +21,7 @@ async def analyze_user_performance(
         raise HTTPException(
             status_code=403, detail="Can only analyze your own performance")
 
-    participations = DB.find(Collections.PARTICIPANTS,
+    participations = await AsyncDB.find(Collections.PARTICIPANTS,
                              {"user_id": data.user_id})
 
     if data.debate_ids:
@@ -80,11 +80,11 @@ async def analyze_user_performance(
         }
         weaknesses.append("No debate history yet")
 
-    feedback = DB.find_one(Collections.TRAINER_FEEDBACK,
+    feedback = await AsyncDB.find_one(Collections.TRAINER_FEEDBACK,
                            {"user_id": data.user_id})
 
     if feedback:
-        DB.update(Collections.TRAINER_FEEDBACK, str(feedback["id"]), {
+        await AsyncDB.update(Collections.TRAINER_FEEDBACK, str(feedback["id"]), {
             "metrics_json": {
                 **metrics,
                 "strengths": strengths,
@@ -92,7 +92,7 @@ async def analyze_user_performance(
             }
         })
     else:
-        DB.insert(Collections.TRAINER_FEEDBACK, {
+        await AsyncDB.insert(Collections.TRAINER_FEEDBACK, {
             "user_id": data.user_id,
             "metrics_json": {
                 **metrics,
@@ -123,7 +123,7 @@ async def get_recommendations(
         raise HTTPException(
             status_code=403, detail="Can only view your own recommendations")
 
-    feedback = DB.find_one(Collections.TRAINER_FEEDBACK, {"user_id": user_id})
+    feedback = await AsyncDB.find_one(Collections.TRAINER_FEEDBACK, {"user_id": user_id})
 
     if not feedback:
         return {"recommendations": [], "message": "No feedback available yet"}
@@ -152,7 +152,7 @@ async def get_recommendations(
             "difficulty": "easy"
         })
 
-    DB.update(Collections.TRAINER_FEEDBACK, str(feedback["id"]), {
+    await AsyncDB.update(Collections.TRAINER_FEEDBACK, str(feedback["id"]), {
         "recommendations": recommendations
     })
 
@@ -202,19 +202,11 @@ async def submit_challenge(
     xp_earned = int(analysis.get("logic", 0) +
                     analysis.get("credibility", 0) + analysis.get("rhetoric", 0))
 
-    feedback = DB.find_one(Collections.TRAINER_FEEDBACK, {
+    feedback = await AsyncDB.find_one(Collections.TRAINER_FEEDBACK, {
                            "user_id": current_user["id"]})
     if feedback:
-        current_xp = feedback.get("xp", 0)
-        DB.update(Collections.TRAINER_FEEDBACK, str(feedback["id"]), {
-            "xp": current_xp + xp_earned
-        })
-
-        user = DB.get(Collections.USERS, str(current_user["id"]))
-        if user:
-            DB.update(Collections.USERS, str(current_user["id"]), {
-                "xp": user.get("xp", 0) + xp_earned
-            })
+        await AsyncDB.increment(Collections.TRAINER_FEEDBACK, str(feedback["id"]), "xp", xp_earned)
+        await AsyncDB.increment(Collections.USERS, str(current_user["id"]), "xp", xp_earned)
 
     return {
         "challenge_id": data.challenge_id,
@@ -236,7 +228,7 @@ async def get_progress(
         raise HTTPException(
             status_code=403, detail="Can only view your own progress")
 
-    feedback = DB.find_one(Collections.TRAINER_FEEDBACK, {"user_id": user_id})
+    feedback = await AsyncDB.find_one(Collections.TRAINER_FEEDBACK, {"user_id": user_id})
 
     if not feedback:
         return {
@@ -263,16 +255,16 @@ async def update_progress(
         raise HTTPException(
             status_code=403, detail="Can only update your own progress")
 
-    feedback = DB.find_one(Collections.TRAINER_FEEDBACK, {"user_id": user_id})
+    feedback = await AsyncDB.find_one(Collections.TRAINER_FEEDBACK, {"user_id": user_id})
 
     if not feedback:
         raise HTTPException(
             status_code=404, detail="No training feedback found")
 
-    current_xp = feedback.get("xp", 0)
-    new_xp = current_xp + xp_delta
-
-    DB.update(Collections.TRAINER_FEEDBACK,
-              str(feedback["id"]), {"xp": new_xp})
+    updated = await AsyncDB.increment(Collections.TRAINER_FEEDBACK,
+                                      str(feedback["id"]), "xp", xp_delta)
+    if not updated:
+        raise HTTPException(
+            status_code=404, detail="No training feedback found")
 
-    return {"user_id": user_id, "xp": new_xp}
+    return {"user_id": user_id, "xp": updated["xp"]}
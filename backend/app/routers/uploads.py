@@ -4,7 +4,7 @@ import aiofiles
 import os
 from app.schemas import UploadResponse
 from app.replit_auth import get_current_user
-from app.replit_db import DB, Collections
+from app.replit_db import AsyncDB, Collections
 from app.config import settings
 
 router = APIRouter(prefix="/api/uploads", tags=["Uploads"])
@@ -46,15 +46,15 @@ async def upload_pdf(
         "file_size": len(content)
     }
 
-    file_record = DB.insert(Collections.UPLOADED_FILES, uploaded_file)
+    file_record = await AsyncDB.insert(Collections.UPLOADED_FILES, uploaded_file)
 
     if room_id:
-        room = DB.get(Collections.ROOMS, room_id)
+        room = await AsyncDB.get(Collections.ROOMS, room_id)
         if room:
             resources = room.get("resources", [])
             resources.append(
                 {"file_id": file_record["id"], "type": "pdf", "name": file.filename})
-            DB.update(Collections.ROOMS, room_id, {"resources": resources})
+            await AsyncDB.update(Collections.ROOMS, room_id, {"resources": resources})
 
     return file_record
 
@@ -93,7 +93,7 @@ async def upload_audio(
         "file_size": len(content)
     }
 
-    file_record = DB.insert(Collections.UPLOADED_FILES, uploaded_file)
+    file_record = await AsyncDB.insert(Collections.UPLOADED_FILES, uploaded_file)
 
     return file_record
 
@@ -107,7 +107,7 @@ async def upload_url(
     """
     Add a URL reference to a room
     """
-    room = DB.get(Collections.ROOMS, room_id)
+    room = await AsyncDB.get(Collections.ROOMS, room_id)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
 
@@ -123,11 +123,11 @@ async def upload_url(
         "file_size": 0
     }
 
-    file_record = DB.insert(Collections.UPLOADED_FILES, uploaded_file)
+    file_record = await AsyncDB.insert(Collections.UPLOADED_FILES, uploaded_file)
 
     resources = room.get("resources", [])
     resources.append({"file_id": file_record["id"], "type": "url", "url": url})
-    DB.update(Collections.ROOMS, room_id, {"resources": resources})
+    await AsyncDB.update(Collections.ROOMS, room_id, {"resources": resources})
 
     return {"message": "URL added", "file": file_record}
 
@@ -137,7 +137,7 @@ async def get_room_uploads(room_id: str):
     """
     Get all uploaded files for a room
     """
-    files = DB.find(Collections.UPLOADED_FILES, {"room_id": room_id})
+    files = await AsyncDB.find(Collections.UPLOADED_FILES, {"room_id": room_id})
     return files
 
 
@@ -149,11 +149,11 @@ async def delete_file(
     """
     Delete an uploaded file
     """
-    file_record = DB.get(Collections.UPLOADED_FILES, file_id)
+    file_record = await AsyncDB.get(Collections.UPLOADED_FILES, file_id)
     if not file_record:
         raise HTTPException(status_code=404, detail="File not found")
 
-    room = DB.get(Collections.ROOMS, str(file_record["room_id"]))
+    room = await AsyncDB.get(Collections.ROOMS, str(file_record["room_id"]))
     if room and str(room["host_id"]) != str(current_user["id"]):
         raise HTTPException(
             status_code=403, detail="Only the host can delete files")
@@ -161,6 +161,6 @@ async def delete_file(
     if file_record["file_type"] != "url" and os.path.exists(file_record["file_path"]):
         os.remove(file_record["file_path"])
 
-    DB.delete(Collections.UPLOADED_FILES, file_id)
+    await AsyncDB.delete(Collections.UPLOADED_FILES, file_id)
 
     return {"message": "File deleted successfully"}
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException, Depends
 from typing import Dict, Any, List
 from app.replit_auth import get_current_user
-from app.replit_db import DB, Collections
+from app.replit_db import AsyncDB, Collections
 from app.models import User
+from app.archive import user_participations, room_result, speaker_turns
 
 router = APIRouter(prefix="/api/user", tags=["User"])
 
@@ -14,12 +15,12 @@ async def get_user_stats(current_user: Dict = Depends(get_current_user)):
     """
     user_id = str(current_user.get("id"))
     
-    # Get all rooms where user participated
-    all_participants = DB.find(Collections.PARTICIPANTS, {"user_id": user_id})
+    # Get all rooms where user participated (archived ones included)
+    all_participants = await user_participations(user_id)
     
-    # Get all rooms
-    all_rooms = DB.find(Collections.ROOMS, {})
-    rooms_map = {r["id"]: r for r in all_rooms}
+    # Get the rooms the user participated in (one bulk fetch)
+    rooms_map = await AsyncDB.get_many(
+        Collections.ROOMS, [p.get("room_id") for p in all_participants])
     
     debates_joined = 0
     debates_hosted = 0
@@ -30,7 +31,7 @@ async def get_user_stats(current_user: Dict = Depends(get_current_user)):
     # Calculate stats
     for participant in all_participants:
         room_id = participant.get("room_id")
-        room = rooms_map.get(room_id)
+        room = rooms_map.get(str(room_id))
         
         if not room:
             continue
@@ -44,7 +45,7 @@ async def get_user_stats(current_user: Dict = Depends(get_current_user)):
                 total_debates += 1
                 
                 # Check if user won
-                results = DB.find_one(Collections.RESULTS, {"room_id": room_id})
+                results = await room_result(room)
                 if results and results.get("winner_id") == participant.get("id"):
                     debates_won += 1
                 
@@ -68,25 +69,25 @@ async def get_user_stats(current_user: Dict = Depends(get_current_user)):
     level = max(1, total_xp // 100)
     xp_progress = total_xp % 100
     
-    # Get average scores across all completed debates
-    all_turns = []
-    for participant in all_participants:
-        if participant.get("role") == "debater":
-            turns = DB.find(Collections.TURNS, {"speaker_id": participant["id"]})
-            all_turns.extend(turns)
-    
+    # Get average scores across all completed debates (turns are streamed, not collected)
+    total_turns = 0
     total_logic = 0
     total_credibility = 0
     total_rhetoric = 0
     scored_turns = 0
     
-    for turn in all_turns:
-        feedback = turn.get("ai_feedback", {})
-        if feedback:
-            total_logic += feedback.get("logic", 0)
-            total_credibility += feedback.get("credibility", 0)
-            total_rhetoric += feedback.get("rhetoric", 0)
-            scored_turns += 1
+    for participant in all_participants:
+        if participant.get("role") != "debater":
+            continue
+        room = rooms_map.get(str(participant.get("room_id")))
+        async for turn in speaker_turns(room, participant["id"]):
+            total_turns += 1
+            feedback = turn.get("ai_feedback", {})
+            if feedback:
+                total_logic += feedback.get("logic", 0)
+                total_credibility += feedback.get("credibility", 0)
+                total_rhetoric += feedback.get("rhetoric", 0)
+                scored_turns += 1
     
     avg_logic = round(total_logic / scored_turns) if scored_turns > 0 else 0
     avg_credibility = round(total_credibility / scored_turns) if scored_turns > 0 else 0
@@ -127,7 +128,7 @@ async def get_user_stats(current_user: Dict = Depends(get_current_user)):
             "rhetoric": avg_rhetoric
         },
         "badges_earned": badges_earned,
-        "total_turns": len(all_turns)
+        "total_turns": total_turns
     }
 
 
@@ -138,22 +139,24 @@ async def get_user_history(current_user: Dict = Depends(get_current_user)):
     """
     user_id = str(current_user.get("id"))
     
-    # Get all participations
-    all_participants = DB.find(Collections.PARTICIPANTS, {"user_id": user_id})
+    # Get all participations (archived rooms included)
+    all_participants = await user_participations(user_id)
     
+    debater_participations = [
+        p for p in all_participants if p.get("role") == "debater"]
+    rooms_map = await AsyncDB.get_many(
+        Collections.ROOMS, [p.get("room_id") for p in debater_participations])
+
     history = []
-    for participant in all_participants:
-        if participant.get("role") != "debater":
-            continue
-            
+    for participant in debater_participations:
         room_id = participant.get("room_id")
-        room = DB.get(Collections.ROOMS, str(room_id))
+        room = rooms_map.get(str(room_id))
         
         if not room:
             continue
         
         # Get result if available
-        result = DB.find_one(Collections.RESULTS, {"room_id": room_id})
+        result = await room_result(room)
         
         won = False
         if result and result.get("winner_id") == participant.get("id"):
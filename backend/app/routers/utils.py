@@ -1,8 +1,13 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Header
+from typing import List, Optional
+from collections import Counter
+import heapq
 from datetime import datetime
 from app.schemas import HealthResponse, LeaderboardEntry, FeedbackSubmit
-from app.replit_db import DB, Collections
+from app.replit_db import AsyncDB, Collections, STORAGE_BACKEND
+from app.storage_metrics import storage_metrics
+from app.archive import user_archives
+from app.cache import user_cache, room_cache, archive_cache, shared_tier
 from app.config import settings
 
 router = APIRouter(prefix="/api/utils", tags=["Utilities"])
@@ -41,7 +46,7 @@ async def submit_feedback(feedback: FeedbackSubmit):
         "timestamp": datetime.utcnow().isoformat()
     }
 
-    saved_feedback = DB.insert(Collections.FEEDBACK, feedback_record)
+    saved_feedback = await AsyncDB.insert(Collections.FEEDBACK, feedback_record)
 
     return {
         "message": "Feedback received and saved",
@@ -55,35 +60,54 @@ async def get_leaderboard(limit: int = 10):
     """
     Get global leaderboard
     """
-    users = DB.find(Collections.USERS, limit=1000)
+    # Stream users, keeping only the top `limit` by XP (ties keep storage order)
+    top = []
+    seq = 0
+    async for user in AsyncDB.iter(Collections.USERS):
+        entry = (user.get("xp", 0), -seq, user)
+        seq += 1
+        if len(top) < limit:
+            heapq.heappush(top, entry)
+        elif limit > 0:
+            heapq.heappushpop(top, entry)
+    top_users = [user for _, _, user in sorted(top, key=lambda e: e[:2], reverse=True)]
+
+    # One streaming pass over results instead of one full read per user
+    wins_by_participant = Counter()
+    async for result in AsyncDB.iter(Collections.RESULTS):
+        if result.get("winner_id"):
+            wins_by_participant[str(result["winner_id"])] += 1
 
     leaderboard = []
-    for user in users:
-        participations = DB.find(
+    for user in top_users:
+        participations = await AsyncDB.find(
             Collections.PARTICIPANTS,
-            {"user_id": user["id"], "role": "debater"}
+            {"user_id": user["id"], "role": "debater"},
+            limit=None
         )
 
-        results = DB.find(Collections.RESULTS, limit=1000)
+        wins = sum(wins_by_participant[str(p["id"])] for p in participations)
 
-        wins = 0
+        # Debates archived since are judged from their archives
+        for archive in await user_archives(user["id"]):
+            archived = [p for p in archive[Collections.PARTICIPANTS]
+                        if str(p.get("user_id")) == str(user["id"]) and p.get("role") == "debater"]
+            participations.extend(archived)
+            wins += sum(1 for result in archive[Collections.RESULTS] for p in archived
+                        if str(result.get("winner_id")) == str(p["id"]))
         total_score = 0
         count = 0
 
-        for result in results:
-            if result.get("winner_id") and str(result["winner_id"]) in [str(p["id"]) for p in participations]:
-                wins += 1
-
-            for participant in participations:
-                score = participant.get("score", {})
-                if score:
-                    weighted = (
-                        score.get("logic", 0) * 0.4 +
-                        score.get("credibility", 0) * 0.35 +
-                        score.get("rhetoric", 0) * 0.25
-                    )
-                    total_score += weighted
-                    count += 1
+        for participant in participations:
+            score = participant.get("score", {})
+            if score:
+                weighted = (
+                    score.get("logic", 0) * 0.4 +
+                    score.get("credibility", 0) * 0.35 +
+                    score.get("rhetoric", 0) * 0.25
+                )
+                total_score += weighted
+                count += 1
 
         avg_score = (total_score / count) if count > 0 else 0
 
@@ -96,9 +120,7 @@ async def get_leaderboard(limit: int = 10):
             "avg_score": round(avg_score, 2)
         })
 
-    leaderboard.sort(key=lambda x: x["xp"], reverse=True)
-
-    return leaderboard[:limit]
+    return leaderboard
 
 
 @router.get("/search-topics")
@@ -106,25 +128,53 @@ async def search_topics(query: str = "", limit: int = 10):
     """
     Search debate topics
     """
-    rooms = DB.find(Collections.ROOMS, limit=1000)
-
-    if query:
-        filtered_rooms = [
-            r for r in rooms
-            if query.lower() in r.get("topic", "").lower() or
-            query.lower() in r.get("description", "").lower()
-        ]
-    else:
-        filtered_rooms = rooms
-
+    needle = query.lower()
     topics = []
-    for room in filtered_rooms[:limit]:
-        topics.append({
-            "room_id": room["id"],
-            "topic": room.get("topic"),
-            "description": room.get("description"),
-            "status": room.get("status"),
-            "scheduled_time": room.get("scheduled_time")
-        })
+    total = 0
+    async for room in AsyncDB.iter(Collections.ROOMS):
+        if needle and not (needle in room.get("topic", "").lower() or
+                           needle in room.get("description", "").lower()):
+            continue
+        total += 1
+        if len(topics) < limit:
+            topics.append({
+                "room_id": room["id"],
+                "topic": room.get("topic"),
+                "description": room.get("description"),
+                "status": room.get("status"),
+                "scheduled_time": room.get("scheduled_time")
+            })
+
+    return {"topics": topics, "total": total}
+
+
+@router.get("/storage-metrics", include_in_schema=False)
+async def get_storage_metrics(reset: bool = False, x_metrics_token: Optional[str] = Header(None)):
+    """
+    Internal: storage calls per route, collection and operation
+    (counts, keys scanned/read/written, decodes, bytes, latency histograms)
+    """
+    if settings.METRICS_TOKEN:
+        if x_metrics_token != settings.METRICS_TOKEN:
+            raise HTTPException(status_code=403, detail="Invalid metrics token")
+    elif settings.API_ENV == "production":
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    calls = storage_metrics.snapshot()
+    if reset:
+        storage_metrics.reset()
+
+    # Per-route totals, so the handlers doing full scans stand out
+    routes = {}
+    for row in calls:
+        totals = routes.setdefault(row["route"], {"calls": 0, "keys_scanned": 0, "docs_decoded": 0, "total_ms": 0.0})
+        for field in totals:
+            totals[field] += row[field]
 
-    return {"topics": topics, "total": len(filtered_rooms)}
+    return {
+        "backend": STORAGE_BACKEND,
+        "routes": dict(sorted(routes.items(), key=lambda item: item[1]["total_ms"], reverse=True)),
+        "calls": calls,
+        "caches": {"user": user_cache.stats(), "room": room_cache.stats(), "archive": archive_cache.stats()},
+        "shared_cache": shared_tier.stats() if shared_tier is not None else None
+    }
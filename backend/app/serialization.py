@@ -0,0 +1,188 @@
+"""
+Serialization codecs for stored documents
+Every value written by ReplitDB carries a codec tag ("o1:...", "m1:...") so
+values written with different codecs can be read side by side while a
+keyspace is being migrated. Untagged values are legacy stdlib-JSON documents.
+Any tagged value can additionally be zstd-compressed ("z1:<dictionary>:...").
+"""
+import base64
+import json
+import threading
+from typing import Optional, List, Any, Dict, Callable
+import orjson
+from app.config import settings
+
+# msgpack is optional (pip install msgpack)
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+# zstd compression is optional (pip install zstandard)
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+
+class JsonCodec:
+    """Standard library JSON (the legacy, untagged format)"""
+
+    name = "json"
+    tag = ""
+
+    def encode(self, doc: Any) -> str:
+        return json.dumps(doc)
+
+    def decode(self, payload: str) -> Any:
+        return json.loads(payload)
+
+
+class OrjsonCodec:
+    """orjson - same JSON text, several times faster to encode and decode"""
+
+    name = "orjson"
+    tag = "o1"
+
+    def encode(self, doc: Any) -> str:
+        return orjson.dumps(doc, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def decode(self, payload: str) -> Any:
+        return orjson.loads(payload)
+
+
+class MsgpackCodec:
+    """
+    msgpack - compact binary, base64-wrapped because Replit DB stores text.
+    Unlike JSON, non-string map keys keep their type on a round trip.
+    """
+
+    name = "msgpack"
+    tag = "m1"
+
+    def encode(self, doc: Any) -> str:
+        return base64.b64encode(msgpack.packb(doc, use_bin_type=True)).decode("ascii")
+
+    def decode(self, payload: str) -> Any:
+        return msgpack.unpackb(base64.b64decode(payload), raw=False, strict_map_key=False)
+
+
+CODECS: Dict[str, Any] = {
+    codec.name: codec
+    for codec in (JsonCodec(), OrjsonCodec(), MsgpackCodec())
+    if codec.name != "msgpack" or MSGPACK_AVAILABLE
+}
+CODECS_BY_TAG = {codec.tag: codec for codec in CODECS.values() if codec.tag}
+
+
+def get_codec(name: str):
+    """Look up a codec by name, falling back to orjson if it is unavailable"""
+    codec = CODECS.get(name)
+    if codec is None:
+        print(f"⚠️  Storage codec '{name}' not available, using orjson")
+        return CODECS["orjson"]
+    return codec
+
+
+# Codec used for new writes (settings.STORAGE_CODEC)
+active_codec = get_codec(settings.STORAGE_CODEC)
+
+
+def encode_document(doc: Any, codec=None) -> str:
+    """Encode a document as a tagged storage value"""
+    codec = codec or active_codec
+    payload = codec.encode(doc)
+    return f"{codec.tag}:{payload}" if codec.tag else payload
+
+
+def decode_document(value: str) -> Any:
+    """Decode a storage value written by any codec"""
+    if value[:1] in ("{", "["):
+        # Legacy untagged JSON; orjson parses it faster but rejects NaN/Infinity
+        try:
+            return orjson.loads(value)
+        except orjson.JSONDecodeError:
+            return json.loads(value)
+
+    tag, _, payload = value.partition(":")
+    if tag == COMPRESSED_TAG:
+        return decode_document(decompress_value(payload))
+    codec = CODECS_BY_TAG.get(tag)
+    if codec is None:
+        raise ValueError(f"Unknown storage codec tag '{tag}'")
+    return codec.decode(payload)
+
+
+# ==================== Compression ====================
+
+COMPRESSED_TAG = "z1"
+COMPRESSION_LEVEL = 6
+
+# Trained dictionaries by zstd dictionary ID (0 = no dictionary). IDs not
+# seen yet are fetched through dictionary_loader (set by the storage layer).
+_dictionaries: Dict[int, Any] = {}
+dictionary_loader: Optional[Callable[[int], Optional[bytes]]] = None
+
+# zstd (de)compressors are not thread-safe; each thread keeps its own
+_zstd_local = threading.local()
+
+
+def train_dictionary(samples: List[bytes], size: int = 16384) -> bytes:
+    """Train a zstd dictionary on sample values"""
+    return zstandard.train_dictionary(size, samples).as_bytes()
+
+
+def register_dictionary(data: bytes) -> int:
+    """Make a trained dictionary available for compression; returns its ID"""
+    dictionary = zstandard.ZstdCompressionDict(data)
+    _dictionaries[dictionary.dict_id()] = dictionary
+    return dictionary.dict_id()
+
+
+def _dictionary(dict_id: int):
+    if not dict_id:
+        return None
+    dictionary = _dictionaries.get(dict_id)
+    if dictionary is None:
+        data = dictionary_loader(dict_id) if dictionary_loader else None
+        if not data:
+            raise ValueError(f"Unknown compression dictionary {dict_id}")
+        register_dictionary(data)
+        dictionary = _dictionaries[dict_id]
+    return dictionary
+
+
+def _zstd(kind: str, dict_id: int):
+    """This thread's compressor or decompressor for a dictionary"""
+    cache = getattr(_zstd_local, kind, None)
+    if cache is None:
+        cache = {}
+        setattr(_zstd_local, kind, cache)
+    worker = cache.get(dict_id)
+    if worker is None:
+        dictionary = _dictionary(dict_id)
+        if kind == "compressor":
+            worker = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL, dict_data=dictionary)
+        else:
+            worker = zstandard.ZstdDecompressor(dict_data=dictionary)
+        cache[dict_id] = worker
+    return worker
+
+
+def compress_value(value: str, dict_id: int = 0) -> str:
+    """zstd-compress a tagged storage value (returned as is unless that makes it smaller)"""
+    frame = _zstd("compressor", dict_id).compress(value.encode())
+    compressed = f"{COMPRESSED_TAG}:{dict_id}:{base64.b64encode(frame).decode('ascii')}"
+    return compressed if len(compressed) < len(value) else value
+
+
+def decompress_value(payload: str) -> str:
+    """Inverse of compress_value, given the part after the z1: tag"""
+    if not ZSTD_AVAILABLE:
+        raise ValueError("Value is zstd-compressed but zstandard is not installed")
+    dict_id, _, data = payload.partition(":")
+    return _zstd("decompressor", int(dict_id)).decompress(base64.b64decode(data)).decode()
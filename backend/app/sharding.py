@@ -0,0 +1,293 @@
+"""
+Hash-sharded key-value storage for Oratio
+ShardedStore spreads ReplitDB's keys over several key-value shards (Replit DB
+instances, local SQLite files, local log stores or in-memory dicts) with a
+consistent-hash ring. Keys are routed by a shard key rather than by the whole key:
+
+    room:<room_id>:...  -> the room     (room-scoped turns, participants, votes)
+    users:<id>          -> the user
+    anything else       -> the key itself
+
+so with ROOM_SCOPED_KEYS a room's documents live on one shard and listing
+them is a single-shard prefix query. Configure with REPLIT_DB_SHARDS and run
+`python -m app.rebalance_shards` after adding shards.
+"""
+import bisect
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterable
+from app.replit_db_client import ReplitDBClient
+from app.local_store import LogStore
+
+# Ring points per shard; more points spread keys more evenly
+VIRTUAL_NODES = 64
+# Tries at switching a SQLite shard to WAL while other processes open it too
+WAL_ATTEMPTS = 100
+
+
+def shard_key(key: str) -> str:
+    """Part of a storage key that decides its shard"""
+    if key.startswith("room:"):
+        return ":".join(key.split(":", 2)[:2])
+    if key.startswith("users:"):
+        return f"user:{key[len('users:'):]}"
+    return key
+
+
+def _pinned_prefix(prefix: str) -> bool:
+    """Whether every key under prefix has the same shard key"""
+    return prefix.startswith("room:") and prefix.count(":") >= 2
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent-hash ring over shard names.
+    Adding a shard only moves the keys that now hash to it; every other key
+    keeps its shard.
+    """
+
+    def __init__(self, names: Iterable[str], vnodes: int = VIRTUAL_NODES):
+        points = sorted((_hash(f"{name}#{i}"), name) for name in names for i in range(vnodes))
+        if not points:
+            raise ValueError("A hash ring needs at least one shard")
+        self._hashes = [point for point, _ in points]
+        self._names = [name for _, name in points]
+
+    def shard_for(self, token: str) -> str:
+        """Name of the shard owning token"""
+        index = bisect.bisect(self._hashes, _hash(token)) % len(self._hashes)
+        return self._names[index]
+
+
+class SQLiteKV:
+    """Key-value shard in a local SQLite file (dict-like, with prefix listing)"""
+
+    # Other processes may open the same file
+    shared = True
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        # Switching a new file to WAL needs it to ourselves and does not wait on the
+        # busy timeout, so retry while other workers open it at the same moment
+        for attempt in range(WAL_ATTEMPTS):
+            try:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                break
+            except sqlite3.OperationalError:
+                if attempt == WAL_ATTEMPTS - 1:
+                    raise
+                time.sleep(0.05)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", (key, value))
+
+    def __delitem__(self, key: str):
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM kv WHERE key = ?", (key,)).rowcount
+        if not deleted:
+            raise KeyError(key)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def keys(self) -> List[str]:
+        return self.prefix("")
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def prefix(self, prefix: str) -> List[str]:
+        """Keys starting with prefix (a range scan on the primary key)"""
+        with self._lock:
+            if not prefix:
+                rows = self._conn.execute("SELECT key FROM kv").fetchall()
+            else:
+                upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+                rows = self._conn.execute(
+                    "SELECT key FROM kv WHERE key >= ? AND key < ?", (prefix, upper)).fetchall()
+        return [row[0] for row in rows]
+
+    def incr(self, key: str, delta: float = 1) -> float:
+        """Add delta to a JSON number (missing counts as 0) and return it, atomically across processes"""
+        with self._lock:
+            # IMMEDIATE takes the write lock before the read, so no other writer interleaves
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+                value = json.loads(row[0] if row else "0") + delta
+                self._conn.execute("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return value
+
+    def set_bulk(self, values: Dict[str, Any]):
+        """Write many keys in one transaction"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", list(values.items()))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+def open_shard(url: str):
+    """Open one shard: memory://, local:///dir, sqlite:///path or a Replit DB URL"""
+    if url.startswith("memory://"):
+        return {}
+    if url.startswith("local:///"):
+        return LogStore(url[len("local:///"):])
+    if url.startswith("sqlite:///"):
+        return SQLiteKV(url[len("sqlite:///"):])
+    if url.startswith(("http://", "https://")):
+        return ReplitDBClient(url)
+    raise ValueError(f"Unsupported shard URL: {url}")
+
+
+class ShardedStore:
+    """
+    Dict-like key-value store routed over named shards by consistent hashing.
+    Single-key operations and prefix listings pinned to one room go straight
+    to their shard; bulk writes and unpinned listings are split per shard
+    and run concurrently.
+    """
+
+    def __init__(self, shards: Dict[str, Any], vnodes: int = VIRTUAL_NODES):
+        self.shards = dict(shards)
+        self.ring = HashRing(self.shards, vnodes)
+        # Whether calls may block (anything but in-memory shards)
+        self.blocking = any(getattr(shard, "blocking", not isinstance(shard, dict))
+                            for shard in self.shards.values())
+        # Whether other processes may write too (anything but process-local shards)
+        self.shared = any(getattr(shard, "shared", not isinstance(shard, dict))
+                          for shard in self.shards.values())
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(len(self.shards), 1), thread_name_prefix="kv-shard")
+
+    @classmethod
+    def from_setting(cls, spec: str) -> "ShardedStore":
+        """
+        Build from a comma-separated shard list, e.g.
+        "a=sqlite:///shard_a.db,b=sqlite:///shard_b.db". Unnamed entries are
+        named shard0, shard1, ... by position. A shard's name (not its URL)
+        places it on the ring, so append new shards instead of reordering.
+        """
+        shards = {}
+        for position, entry in enumerate(part.strip() for part in spec.split(",") if part.strip()):
+            name, _, url = entry.partition("=")
+            if not url or "://" in name:
+                name, url = f"shard{position}", entry
+            shards[name] = open_shard(url)
+        return cls(shards)
+
+    def shard_of(self, key: str) -> str:
+        """Name of the shard that owns key"""
+        return self.ring.shard_for(shard_key(key))
+
+    def _shard(self, key: str):
+        return self.shards[self.shard_of(key)]
+
+    def _on_shards(self, func, names: List[str]) -> list:
+        """Run func(name) for each shard, concurrently when there are several"""
+        if len(names) == 1:
+            return [func(names[0])]
+        return list(self._executor.map(func, names))
+
+    # ==================== Single keys ====================
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._shard(key).get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        return self._shard(key)[key]
+
+    def __setitem__(self, key: str, value: Any):
+        self._shard(key)[key] = value
+
+    def __delitem__(self, key: str):
+        del self._shard(key)[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._shard(key)
+
+    # ==================== Many keys ====================
+
+    def set_bulk(self, values: Dict[str, Any]):
+        """Write many keys with one bulk write per shard"""
+        groups: Dict[str, Dict[str, Any]] = {}
+        for key, value in values.items():
+            groups.setdefault(self.shard_of(key), {})[key] = value
+
+        def write(name: str):
+            shard = self.shards[name]
+            if hasattr(shard, "set_bulk"):
+                shard.set_bulk(groups[name])
+            else:
+                shard.update(groups[name])
+        self._on_shards(write, list(groups))
+
+    update = set_bulk
+
+    def prefix(self, prefix: str) -> List[str]:
+        """Keys starting with prefix, from one shard when the prefix pins a room"""
+        names = [self.shard_of(prefix)] if _pinned_prefix(prefix) else list(self.shards)
+
+        def scan(name: str) -> List[str]:
+            shard = self.shards[name]
+            if hasattr(shard, "prefix"):
+                return list(shard.prefix(prefix))
+            return [k for k in list(shard.keys()) if k.startswith(prefix)]
+        return [key for keys in self._on_shards(scan, names) for key in keys]
+
+    def keys(self) -> List[str]:
+        return self.prefix("")
+
+    def __iter__(self):
+        return iter(self.keys())
+
+
+def rebalance(store: ShardedStore) -> Dict[str, int]:
+    """
+    Move every key to the shard the ring now assigns it (after shards were
+    added). A key is copied before it is deleted from its old shard, and a
+    copy already on the new shard (written since the shard was added) wins,
+    so re-running after an interruption is safe. Returns the number of keys
+    moved out of each shard.
+    """
+    moved = {}
+    for name, shard in store.shards.items():
+        misplaced = [key for key in list(shard.keys()) if store.shard_of(key) != name]
+        for key in misplaced:
+            target = store.shards[store.shard_of(key)]
+            value = shard.get(key)
+            if value is not None and key not in target:
+                target[key] = value
+            del shard[key]
+        moved[name] = len(misplaced)
+    return moved
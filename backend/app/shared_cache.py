@@ -0,0 +1,436 @@
+"""
+Cache tier shared by the worker processes on one host
+Sits behind the in-process caches (app/cache.py): an in-process miss is
+looked up here before storage is hit, and loaded values are written through,
+so N workers build a room's status once rather than N times. The tier is a
+SQLite file in WAL mode (put it on tmpfs, e.g. /dev/shm, to keep it in
+memory); values are stored as JSON, so records come back as plain dicts.
+
+Invalidations are broadcast through the same file: each one is appended to
+a message log, which every process polls (every POLL_INTERVAL_SECONDS) to
+apply the other workers' invalidations to its in-process caches. A load
+that overlaps an invalidation is not written to the tier.
+
+Expiry times are on the monotonic clock, which all processes on a host share.
+
+Check it with several local processes:
+    python -m app.shared_cache check [--workers 4] [--path /dev/shm/oratio-cache.db]
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager, closing
+from typing import Optional, List, Dict, Any, Tuple, Callable, Iterable
+import orjson
+
+# How often each process applies invalidations broadcast by the others
+POLL_INTERVAL_SECONDS = 0.05
+
+# Broadcast messages are kept this long (a load running longer than this
+# is assumed to overlap an invalidation)
+MESSAGE_RETENTION_SECONDS = 60.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    ns TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL,
+    fresh_until REAL NOT NULL, expires REAL NOT NULL, size INTEGER NOT NULL, tags BLOB NOT NULL,
+    PRIMARY KEY (ns, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires);
+CREATE TABLE IF NOT EXISTS entry_tags (
+    tag TEXT NOT NULL, ns TEXT NOT NULL, key TEXT NOT NULL,
+    PRIMARY KEY (tag, ns, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entry_tags_entry ON entry_tags (ns, key);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS messages (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT, origin TEXT NOT NULL, created REAL NOT NULL,
+    kind TEXT NOT NULL, ns TEXT, target TEXT NOT NULL, drop_entries INTEGER NOT NULL
+);
+"""
+
+# An entry as stored: (value, fresh until, expires, size, tags), laid out like in-process entries
+SharedEntry = Tuple[Any, float, float, int, Tuple[str, ...]]
+
+# Handler for another process's invalidation: (kind "key" or "tag", namespace or None, key or tag, drop)
+MessageHandler = Callable[[str, Optional[str], str, bool], None]
+
+
+def _encodable(value: Any) -> Any:
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    raise TypeError(f"{type(value).__name__} can't be shared between workers")
+
+
+def _quietly(default: Any = None):
+    """Cache tier failures (locked or full file) fall back to the in-process tier"""
+    def decorator(func):
+        def wrapper(self, *args, **kwargs):
+            try:
+                return func(self, *args, **kwargs)
+            except sqlite3.Error as e:
+                self.errors += 1
+                if self.errors == 1 or self.errors % 1000 == 0:
+                    print(f"⚠️  Shared cache {func.__name__} failed ({self.errors} errors so far): {e}")
+                return default
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+    return decorator
+
+
+class SharedCacheTier:
+    """
+    Key-value cache in a SQLite file shared by local processes. Entries
+    live in namespaces (one per in-process cache) and carry tags like the
+    in-process entries; every invalidation is broadcast to the handlers
+    subscribed in the other processes.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        poll_interval: float = POLL_INTERVAL_SECONDS
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.poll_interval = poll_interval
+        self.errors = 0
+        self._handlers: List[MessageHandler] = []
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "skipped_writes": 0, "messages_applied": 0}
+        self._pid = None
+        self._setup_lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with closing(sqlite3.connect(path, timeout=10, isolation_level=None)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            conn.execute("BEGIN IMMEDIATE")
+            # Monotonic times restart with the host: entries written before a reboot are dropped
+            boot = time.time() - time.monotonic()
+            row = conn.execute("SELECT value FROM meta WHERE name = 'boot'").fetchone()
+            if row is None or abs(row[0] - boot) > 5:
+                conn.execute("DELETE FROM entry_tags")
+                conn.execute("DELETE FROM entries")
+                conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('boot', ?)", (boot,))
+            conn.execute("COMMIT")
+
+    # ==================== Connections ====================
+
+    def _process(self):
+        """Per-process state: connections, origin ID and the message poller (set up again after a fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._setup_lock:
+            if self._pid == os.getpid():
+                return
+            self._local = threading.local()
+            self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            self._seen = self._position()
+            self._pid = os.getpid()
+            threading.Thread(target=self._poll_forever, daemon=True, name="shared-cache-poller").start()
+
+    def _conn(self) -> sqlite3.Connection:
+        """This thread's connection (autocommit; transactions are explicit)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            # Cache contents needn't survive a power loss
+            conn.execute("PRAGMA synchronous=OFF")
+        return conn
+
+    @contextmanager
+    def _write(self):
+        """Write transaction (taken up front, so concurrent writers queue on busy_timeout)"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @_quietly()
+    def position(self) -> Optional[int]:
+        """Sequence number of the last broadcast message (pass to set() as since)"""
+        self._process()
+        return self._position()
+
+    def _position(self) -> int:
+        row = self._conn().execute("SELECT seq FROM sqlite_sequence WHERE name = 'messages'").fetchone()
+        return row[0] if row else 0
+
+    # ==================== Entries ====================
+
+    @_quietly()
+    def get(self, ns: str, key: str) -> Optional[SharedEntry]:
+        """An entry that hasn't expired, or None"""
+        self._process()
+        row = self._conn().execute(
+            "SELECT value, fresh_until, expires, size, tags FROM entries WHERE ns = ? AND key = ? AND expires > ?",
+            (ns, key, time.monotonic())).fetchone()
+        if row is None:
+            self._stats["misses"] += 1
+            return None
+        self._stats["hits"] += 1
+        return orjson.loads(row[0]), row[1], row[2], row[3], tuple(orjson.loads(row[4]))
+
+    @_quietly(False)
+    def set(
+        self,
+        ns: str,
+        key: str,
+        value: Any,
+        fresh_until: float,
+        expires: float,
+        tags: Iterable[str] = (),
+        since: Optional[int] = None
+    ) -> bool:
+        """
+        Store an entry (values that aren't JSON-serializable stay in-process).
+        With since (a position()), the entry is not stored if it or one of
+        its tags was invalidated after that point. Returns whether it was stored.
+        """
+        self._process()
+        try:
+            payload = orjson.dumps(value, default=_encodable)
+        except TypeError:
+            return False
+        tags = tuple(tags)
+        if len(payload) > self.max_bytes:
+            return False
+        with self._write() as conn:
+            if since is not None and self._invalidated_since(conn, since, ns, key, tags):
+                self._stats["skipped_writes"] += 1
+                return False
+            self._delete_entries(conn, [(ns, key)])
+            conn.execute(
+                "INSERT INTO entries (ns, key, value, fresh_until, expires, size, tags) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (ns, key, payload, fresh_until, expires, len(payload), orjson.dumps(tags)))
+            conn.executemany("INSERT OR IGNORE INTO entry_tags (tag, ns, key) VALUES (?, ?, ?)",
+                             [(tag, ns, key) for tag in tags])
+        self._stats["writes"] += 1
+        return True
+
+    def _invalidated_since(self, conn: sqlite3.Connection, since: int, ns: str, key: str,
+                           tags: Tuple[str, ...]) -> bool:
+        first = conn.execute("SELECT MIN(seq) FROM messages").fetchone()[0]
+        if first is None:
+            first = self._position() + 1
+        if first > since + 1:
+            return True  # messages since then were pruned: assume one matched
+        placeholders = ",".join("?" * len(tags))
+        tag_clause = (f" OR (kind = 'tag' AND (ns IS NULL OR ns = ?) AND target IN ({placeholders}))"
+                      if tags else "")
+        row = conn.execute(
+            "SELECT 1 FROM messages WHERE seq > ? AND ((kind = 'key' AND ns = ? AND target = ?)"
+            f"{tag_clause}) LIMIT 1",
+            (since, ns, key, *((ns, *tags) if tags else ()))).fetchone()
+        return row is not None
+
+    def _delete_entries(self, conn: sqlite3.Connection, entries: List[Tuple[str, str]]):
+        conn.executemany("DELETE FROM entry_tags WHERE ns = ? AND key = ?", entries)
+        conn.executemany("DELETE FROM entries WHERE ns = ? AND key = ?", entries)
+
+    def _invalidate_entries(self, conn: sqlite3.Connection, entries: List[Tuple[str, str]], drop: bool):
+        """Mark entries stale (or delete those without a stale window, or all with drop)"""
+        if not drop:
+            now = time.monotonic()
+            entries = [(ns, key) for ns, key in entries if not conn.execute(
+                "UPDATE entries SET fresh_until = 0 WHERE ns = ? AND key = ? AND expires > ? AND expires > fresh_until",
+                (ns, key, now)).rowcount]
+        self._delete_entries(conn, entries)
+
+    def _broadcast(self, conn: sqlite3.Connection, kind: str, ns: Optional[str], target: str, drop: bool):
+        conn.execute(
+            "INSERT INTO messages (origin, created, kind, ns, target, drop_entries) VALUES (?, ?, ?, ?, ?, ?)",
+            (self.origin, time.monotonic(), kind, ns, target, int(drop)))
+
+    @_quietly()
+    def invalidate(self, ns: str, key: str, drop: bool = False):
+        """Invalidate (or delete) one entry here and in every process's in-process tier"""
+        self._process()
+        with self._write() as conn:
+            self._invalidate_entries(conn, [(ns, key)], drop)
+            self._broadcast(conn, "key", ns, key, drop)
+
+    @_quietly(0)
+    def invalidate_tag(self, tag: str, drop: bool = False, ns: Optional[str] = None) -> int:
+        """
+        Invalidate (or delete) the entries carrying tag, in one namespace or
+        all, here and in every process's in-process tier; returns how many
+        shared entries were affected
+        """
+        self._process()
+        with self._write() as conn:
+            if ns is None:
+                rows = conn.execute("SELECT ns, key FROM entry_tags WHERE tag = ?", (tag,)).fetchall()
+            else:
+                rows = conn.execute("SELECT ns, key FROM entry_tags WHERE tag = ? AND ns = ?", (tag, ns)).fetchall()
+            self._invalidate_entries(conn, rows, drop)
+            self._broadcast(conn, "tag", ns, tag, drop)
+        return len(rows)
+
+    @_quietly()
+    def clear(self, ns: str):
+        """Delete a namespace's entries (not broadcast)"""
+        self._process()
+        with self._write() as conn:
+            conn.execute("DELETE FROM entry_tags WHERE ns = ?", (ns,))
+            conn.execute("DELETE FROM entries WHERE ns = ?", (ns,))
+
+    @_quietly(0)
+    def sweep(self) -> int:
+        """
+        Drop expired entries and old messages, then the entries closest to
+        expiring until the tier fits max_bytes; returns how many entries were dropped
+        """
+        self._process()
+        now = time.monotonic()
+        with self._write() as conn:
+            expired = conn.execute("SELECT ns, key FROM entries WHERE expires <= ?", (now,)).fetchall()
+            self._delete_entries(conn, expired)
+            conn.execute("DELETE FROM messages WHERE created < ?", (now - MESSAGE_RETENTION_SECONDS,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            evicted = []
+            if total > self.max_bytes:
+                for ns, key, size in conn.execute("SELECT ns, key, size FROM entries ORDER BY expires"):
+                    if total <= self.max_bytes:
+                        break
+                    evicted.append((ns, key))
+                    total -= size
+                self._delete_entries(conn, evicted)
+        return len(expired) + len(evicted)
+
+    # ==================== Broadcast ====================
+
+    def subscribe(self, handler: MessageHandler):
+        """Call handler for every invalidation broadcast by another process"""
+        self._handlers.append(handler)
+        self._process()
+
+    def _poll_forever(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.poll_interval)
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"⚠️  Shared cache poll failed: {e}")
+
+    def poll(self) -> int:
+        """Apply the invalidations broadcast by other processes since the last poll; returns how many"""
+        self._process()
+        rows = self._conn().execute(
+            "SELECT seq, origin, kind, ns, target, drop_entries FROM messages WHERE seq > ? ORDER BY seq",
+            (self._seen,)).fetchall()
+        applied = 0
+        for seq, origin, kind, ns, target, drop in rows:
+            self._seen = seq
+            if origin == self.origin:
+                continue
+            for handler in self._handlers:
+                handler(kind, ns, target, bool(drop))
+            applied += 1
+        self._stats["messages_applied"] += applied
+        return applied
+
+    @_quietly({})
+    def stats(self) -> Dict[str, Any]:
+        self._process()
+        entries, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"path": self.path, "entries": entries, "bytes": size, "max_bytes": self.max_bytes,
+                "errors": self.errors, **self._stats}
+
+
+__all__ = ["SharedCacheTier", "POLL_INTERVAL_SECONDS", "MESSAGE_RETENTION_SECONDS"]
+
+
+# ==================== Multi-process check ====================
+
+def _check_worker(path: str, index: int, workers: int, barrier, results):
+    """One worker process: read what the others wrote, then wait for worker 0's invalidation"""
+    from app.cache import SimpleCache, flush_shared_writes
+    cache = SimpleCache(ttl_seconds=60, stale_ttl_seconds=60, name="check", shared=SharedCacheTier(path))
+    cache.set(f"worker_{index}", {"worker": index}, tags=["check"])
+    flush_shared_writes()
+    barrier.wait()
+    results.put(("shared_reads", index, sum(cache.get(f"worker_{other}") is not None for other in range(workers))))
+    barrier.wait()
+
+    if index == 0:
+        results.put(("invalidated_at", time.monotonic()))
+        cache.invalidate_tag("check")
+        return
+    deadline = time.monotonic() + 10
+    while cache.get("worker_0") is not None and time.monotonic() < deadline:
+        time.sleep(0.001)
+    if time.monotonic() < deadline:
+        results.put(("received_at", index, time.monotonic()))
+
+
+def check(path: str, workers: int = 4) -> Dict[str, Any]:
+    """
+    Start worker processes on one tier: each caches an entry, then reads
+    every worker's entry through its own in-process cache, then worker 0
+    invalidates them by tag. Returns the entries each worker found and how
+    long the invalidation took to reach the others.
+    """
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    context = multiprocessing.get_context("spawn")
+    barrier, results = context.Barrier(workers, timeout=30), context.Queue()
+    processes = [context.Process(target=_check_worker, args=(path, i, workers, barrier, results))
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+    # Every worker reports its reads, worker 0 its invalidation and the others its arrival
+    messages = []
+    try:
+        while len(messages) < 2 * workers:
+            messages.append(results.get(timeout=30))
+    except queue.Empty:
+        pass
+    for process in processes:
+        process.join(10)
+    sent = next((m[1] for m in messages if m[0] == "invalidated_at"), None)
+    received = [m[2] for m in messages if m[0] == "received_at"]
+    return {
+        "workers": workers,
+        "shared_reads": {m[1]: m[2] for m in messages if m[0] == "shared_reads"},
+        "invalidations_received": len(received),
+        "max_broadcast_ms": round((max(received) - sent) * 1000, 1) if sent and received else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared cache tier tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    check_parser = subparsers.add_parser("check", help="check sharing and invalidation across local processes")
+    check_parser.add_argument("--workers", type=int, default=4)
+    check_parser.add_argument("--path", default="/tmp/oratio-cache-check.db")
+    args = parser.parse_args()
+
+    result = check(args.path, args.workers)
+    print(orjson.dumps(result, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode())
+    expected = args.workers - 1
+    if (any(n != args.workers for n in result["shared_reads"].values())
+            or len(result["shared_reads"]) != args.workers or result["invalidations_received"] != expected):
+        raise SystemExit("❌ Workers didn't see each other's entries or invalidations")
+    print(f"✅ {args.workers} workers shared entries; invalidations reached them within "
+          f"{result['max_broadcast_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
+
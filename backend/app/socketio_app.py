@@ -1,5 +1,6 @@
 import socketio
-from app.replit_db import DB, Collections
+from app.replit_db import AsyncDB, Collections, without_version
+from app.changes import change_feed, INSERT
 
 # Create Socket.IO server
 sio = socketio.AsyncServer(
@@ -40,3 +41,29 @@ async def broadcast_to_room(room_id: str, event: str, data: dict):
     """Broadcast event to all clients in a room"""
     await sio.emit(event, data, room=f"room_{room_id}")
     print(f"📢 Broadcast '{event}' to room {room_id}")
+
+
+async def _speaker_name(turn: dict) -> str:
+    """Display name for a turn's speaker (participant -> user lookup)"""
+    if turn.get("speaker_name"):
+        return turn["speaker_name"]
+    participant = await AsyncDB.get(Collections.PARTICIPANTS, str(turn.get("speaker_id")))
+    user = await AsyncDB.get(Collections.USERS, str(participant["user_id"])) if participant and participant.get("user_id") else None
+    return (user or {}).get("username", "Anonymous")
+
+
+async def _broadcast_new_turn(event):
+    """Fan out every stored turn to its room, whichever endpoint wrote it"""
+    turn = event.doc
+    try:
+        await broadcast_to_room(turn["room_id"], "new_turn", {
+            "turn": without_version(turn),
+            "speaker_id": turn.get("speaker_id"),
+            "speaker_name": await _speaker_name(turn),
+            "timestamp": turn.get("timestamp") or turn.get("submitted_at")
+        })
+    except Exception as ws_error:
+        print(f"⚠️  Socket.IO broadcast failed: {ws_error}")
+
+
+change_feed.subscribe(_broadcast_new_turn, collection=Collections.TURNS, ops=[INSERT])
@@ -0,0 +1,196 @@
+"""
+Storage instrumentation for Oratio
+Storage calls are timed per (route, collection, operation), along with the
+work they did: keys enumerated by prefix listings, keys fetched, documents
+decoded (and decode time), cache hits and bytes read/written. The route
+comes from the HTTP request being served (tracked in a context variable),
+so full-collection scans can be traced back to the handler that ran them.
+"""
+import bisect
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from typing import Optional, List, Dict, Any, Tuple
+
+# ASGI scope of the HTTP request being served (None outside requests)
+_request_scope: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+    "request_scope", default=None)
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open
+LATENCY_BUCKETS_MS = [0.1, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+
+# Work counters accumulated by each storage call
+COUNTERS = ("keys_scanned", "keys_read", "keys_written", "docs_decoded",
+            "cache_hits", "bytes_read", "bytes_written", "decode_seconds")
+
+# Counters of the outermost storage call running in this context
+_active: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "storage_call", default=None)
+
+
+def current_route() -> str:
+    """Method and route template of the request being served ("-" outside requests)"""
+    scope = _request_scope.get()
+    if scope is None:
+        return "-"
+    # The router stores the matched route in the (shared) scope once it has routed
+    route = scope.get("route")
+    return f"{scope['method']} {getattr(route, 'path', 'unmatched')}"
+
+
+def tally(**amounts: float):
+    """Add to the counters of the storage call in progress (no-op outside one)"""
+    sample = _active.get()
+    if sample is not None:
+        for name, amount in amounts.items():
+            sample[name] += amount
+
+
+def payload_size(value: Any) -> int:
+    """Size of a stored value in bytes (0 for non-text values such as counters)"""
+    if isinstance(value, str):
+        return len(value.encode())
+    if isinstance(value, bytes):
+        return len(value)
+    return 0
+
+
+class StorageMetrics:
+    """Thread-safe aggregates of storage calls keyed by (route, collection, operation)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+
+    def record(self, route: str, collection: str, op: str, seconds: float, sample: Dict[str, float]):
+        """Add one finished call"""
+        with self._lock:
+            stats = self._stats.get((route, collection, op))
+            if stats is None:
+                stats = self._stats[(route, collection, op)] = {
+                    "calls": 0, "seconds": 0.0, "histogram": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                    **{name: 0 for name in COUNTERS}}
+            stats["calls"] += 1
+            stats["seconds"] += seconds
+            stats["histogram"][bisect.bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+            for name in COUNTERS:
+                stats[name] += sample[name]
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """One row per (route, collection, operation), most total time first"""
+        with self._lock:
+            items = [(key, dict(stats, histogram=list(stats["histogram"])))
+                     for key, stats in self._stats.items()]
+        rows = []
+        for (route, collection, op), stats in items:
+            histogram = stats.pop("histogram")
+            seconds = stats.pop("seconds")
+            decode_seconds = stats.pop("decode_seconds")
+            rows.append({
+                "route": route,
+                "collection": collection,
+                "op": op,
+                **stats,
+                "total_ms": round(seconds * 1000, 3),
+                "avg_ms": round(seconds * 1000 / stats["calls"], 3),
+                "decode_ms": round(decode_seconds * 1000, 3),
+                "p50_ms": _percentile(histogram, 0.50),
+                "p95_ms": _percentile(histogram, 0.95),
+                "p99_ms": _percentile(histogram, 0.99),
+                "histogram_ms": {
+                    (f"le_{bound:g}" if i < len(LATENCY_BUCKETS_MS) else "inf"): n
+                    for i, (bound, n) in enumerate(zip(LATENCY_BUCKETS_MS + [None], histogram)) if n
+                },
+            })
+        return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+def _percentile(histogram: List[int], fraction: float) -> Optional[float]:
+    """Upper bound (ms) of the bucket holding the given fraction of calls (None = beyond the last bound)"""
+    target = sum(histogram) * fraction
+    seen = 0
+    for bound, n in zip(LATENCY_BUCKETS_MS, histogram):
+        seen += n
+        if seen >= target:
+            return bound
+    return None
+
+
+# Process-wide storage metrics
+storage_metrics = StorageMetrics()
+
+
+def _new_sample() -> Dict[str, float]:
+    return {name: 0 for name in COUNTERS}
+
+
+def instrumented(op: str):
+    """
+    Record a storage method (first argument: collection) as operation op.
+    Nested storage calls (update -> _load, increment -> update) count toward
+    the outermost call only. Generators are timed across all their steps.
+    """
+    def decorator(func):
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(collection, *args, **kwargs):
+                if _active.get() is not None:
+                    yield from func(collection, *args, **kwargs)
+                    return
+                sample, seconds = _new_sample(), 0.0
+                steps = func(collection, *args, **kwargs)
+                try:
+                    while True:
+                        token = _active.set(sample)
+                        start = time.perf_counter()
+                        try:
+                            item = next(steps)
+                        except StopIteration:
+                            return
+                        finally:
+                            seconds += time.perf_counter() - start
+                            _active.reset(token)
+                        yield item
+                finally:
+                    steps.close()
+                    storage_metrics.record(current_route(), collection, op, seconds, sample)
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(collection, *args, **kwargs):
+            if _active.get() is not None:
+                return func(collection, *args, **kwargs)
+            sample = _new_sample()
+            token = _active.set(sample)
+            start = time.perf_counter()
+            try:
+                return func(collection, *args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                _active.reset(token)
+                storage_metrics.record(current_route(), collection, op, seconds, sample)
+        return wrapper
+    return decorator
+
+
+class RouteContextMiddleware:
+    """ASGI middleware that attributes storage calls to the request's route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_scope.reset(token)
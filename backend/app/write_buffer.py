@@ -0,0 +1,220 @@
+"""
+Write coalescing for bursty storage paths
+Buffered inserts and updates are merged per document for a short window
+and then committed as one insert_many/update_many per collection, instead
+of one storage write (and index update) per call.
+"""
+import atexit
+import threading
+from datetime import datetime
+from typing import Optional, List, Dict, Any
+from app.replit_db import DB, AsyncReplitDB, ID_BLOCK_SIZE, VERSION_FIELD, apply_update
+
+# Pending writes are committed this long after the first one is buffered
+WRITE_BUFFER_WINDOW_SECONDS = 0.05
+
+# ... or as soon as this many documents are pending
+WRITE_BUFFER_MAX_PENDING = 500
+
+
+class WriteBuffer:
+    """
+    Coalesces writes per document and commits them in batches.
+    Updates to the same document within a window are merged (later fields
+    win) into one write, so the document's version is bumped once per
+    commit. An update to a document still pending insert is folded into
+    the insert.
+
+    Reads through get()/get_many() see pending writes (read-your-writes);
+    find() commits the collection's pending writes before querying. Writes
+    made directly on the backend bypass the buffer, so paths that mix the
+    two should flush() first. Change feed events fire when a batch is
+    committed, not when a write is buffered.
+    """
+
+    def __init__(
+        self,
+        backend=DB,
+        window_seconds: float = WRITE_BUFFER_WINDOW_SECONDS,
+        max_pending: int = WRITE_BUFFER_MAX_PENDING
+    ):
+        self.backend = backend
+        self.window_seconds = window_seconds
+        self.max_pending = max_pending
+        self._inserts: Dict[str, Dict[str, Dict[str, Any]]] = {}  # collection -> id -> doc
+        self._updates: Dict[str, Dict[str, Dict[str, Any]]] = {}  # collection -> id -> merged data
+        self._inflight: List[tuple] = []  # batches being committed, still visible to reads
+        self._ids: Dict[str, List[str]] = {}  # collection -> reserved, unused IDs
+        self._pending = 0
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+
+    # ==================== Writes ====================
+
+    def insert(self, collection: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Buffer a new document; its ID is assigned immediately"""
+        with self._lock:
+            if "id" not in data:
+                data["id"] = self._next_id(collection)
+            data.setdefault("created_at", datetime.utcnow().isoformat())
+            data.setdefault(VERSION_FIELD, 1)
+            self._inserts.setdefault(collection, {})[str(data["id"])] = dict(data)
+            self._buffered(new_document=True)
+        return data
+
+    def update(self, collection: str, id: str, data: Dict[str, Any]):
+        """Buffer an update, merged with any pending write to the same document"""
+        id = str(id)
+        with self._lock:
+            pending_insert = self._inserts.get(collection, {}).get(id)
+            if pending_insert is not None:
+                pending_insert.update(data)
+                return
+            pending = self._updates.setdefault(collection, {})
+            new_document = id not in pending
+            pending.setdefault(id, {}).update(data)
+            self._buffered(new_document)
+
+    def _next_id(self, collection: str) -> str:
+        """Hand out an ID from a block reserved on the backend"""
+        ids = self._ids.setdefault(collection, [])
+        if not ids:
+            ids.extend(reversed(self.backend.reserve_ids(collection, ID_BLOCK_SIZE)))
+        return ids.pop()
+
+    def _buffered(self, new_document: bool):
+        """Count a newly pending document and schedule the commit"""
+        self._pending += new_document
+        if self._pending >= self.max_pending:
+            threading.Thread(target=self._flush_quietly, daemon=True).start()
+        elif self._timer is None:
+            self._timer = threading.Timer(self.window_seconds, self._flush_quietly)
+            self._timer.daemon = True
+            self._timer.start()
+
+    # ==================== Commit ====================
+
+    def flush(self, collection: Optional[str] = None) -> int:
+        """Commit pending writes (of one collection, or all) now; returns documents written"""
+        with self._flush_lock:
+            with self._lock:
+                collections = [collection] if collection else list(self._inserts.keys() | self._updates.keys())
+                batch = [(name, self._inserts.pop(name, {}), self._updates.pop(name, {}))
+                         for name in collections]
+                batch = [entry for entry in batch if entry[1] or entry[2]]
+                self._pending -= sum(len(inserts) + len(updates) for _, inserts, updates in batch)
+                if not self._inserts and not self._updates and self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                self._inflight.extend(batch)
+
+            written = 0
+            try:
+                for name, inserts, updates in batch:
+                    if inserts:
+                        written += len(self.backend.insert_many(name, list(inserts.values())))
+                    if updates:
+                        written += len(self.backend.update_many(name, updates))
+            except Exception:
+                self._requeue(batch)
+                raise
+            finally:
+                with self._lock:
+                    self._inflight = [entry for entry in self._inflight
+                                      if not any(entry is done for done in batch)]
+            return written
+
+    def _flush_quietly(self):
+        """Timer/threshold commit: failures are logged and retried on the next flush"""
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"⚠️  Write buffer flush failed: {e}")
+
+    def _requeue(self, batch: List[tuple]):
+        """Put a failed batch back in front of writes buffered since"""
+        with self._lock:
+            for name, inserts, updates in batch:
+                for doc_id, doc in inserts.items():
+                    # A later update of this document becomes part of its insert again
+                    newer = self._updates.get(name, {}).pop(doc_id, None)
+                    if newer is None:
+                        self._pending += 1
+                    self._inserts.setdefault(name, {})[doc_id] = {**doc, **(newer or {})}
+                pending = self._updates.setdefault(name, {})
+                for doc_id, data in updates.items():
+                    if doc_id not in pending:
+                        self._pending += 1
+                    pending[doc_id] = {**data, **pending.get(doc_id, {})}
+
+    # ==================== Reads ====================
+
+    def get(self, collection: str, id: str) -> Optional[Dict[str, Any]]:
+        """Get document by ID, including pending writes"""
+        return self.get_many(collection, [id]).get(str(id))
+
+    def get_many(self, collection: str, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get many documents by ID, including pending writes"""
+        ids = [str(i) for i in ids]
+        with self._lock:
+            layers = [(inserts, updates) for name, inserts, updates in self._inflight if name == collection]
+            layers.append((self._inserts.get(collection, {}), self._updates.get(collection, {})))
+            inserted = {i: dict(layer[0][i]) for layer in layers for i in ids if i in layer[0]}
+            updates = [{i: dict(layer[1][i]) for i in ids if i in layer[1]} for layer in layers]
+
+        docs = {i: dict(doc) for i, doc in self.backend.get_many(
+            collection, [i for i in ids if i not in inserted]).items()}
+        docs.update(inserted)
+        now = datetime.utcnow().isoformat()
+        for layer in updates:
+            for doc_id, data in layer.items():
+                if doc_id in docs:
+                    apply_update(docs[doc_id], data, now)
+        return docs
+
+    def find(self, collection: str, filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Dict[str, Any]]:
+        """Commit the collection's pending writes, then query it"""
+        self.flush(collection)
+        return self.backend.find(collection, filter, **kwargs)
+
+
+class AsyncWriteBuffer:
+    """Awaitable facade over a WriteBuffer (commits and reads run off the event loop)"""
+
+    def __init__(self, buffer: WriteBuffer):
+        self.buffer = buffer
+
+    async def insert(self, collection: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Buffer a new document; its ID is assigned immediately"""
+        return await AsyncReplitDB._run(self.buffer.insert, collection, data)
+
+    async def update(self, collection: str, id: str, data: Dict[str, Any]):
+        """Buffer an update"""
+        self.buffer.update(collection, id, data)
+
+    async def flush(self, collection: Optional[str] = None) -> int:
+        """Commit pending writes now"""
+        return await AsyncReplitDB._run(self.buffer.flush, collection)
+
+    async def get(self, collection: str, id: str) -> Optional[Dict[str, Any]]:
+        """Get document by ID, including pending writes"""
+        return await AsyncReplitDB._run(self.buffer.get, collection, id)
+
+    async def get_many(self, collection: str, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get many documents by ID, including pending writes"""
+        return await AsyncReplitDB._run(self.buffer.get_many, collection, ids)
+
+    async def find(self, collection: str, filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Dict[str, Any]]:
+        """Commit the collection's pending writes, then query it"""
+        return await AsyncReplitDB._run(self.buffer.find, collection, filter, **kwargs)
+
+
+# Process-wide buffer over the configured backend
+write_buffer = WriteBuffer()
+async_write_buffer = AsyncWriteBuffer(write_buffer)
+
+# Don't lose writes still inside the window on interpreter exit
+atexit.register(write_buffer._flush_quietly)
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the backend as `app`, as `python -m app.X` does from backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _use_store(monkeypatch, store, shared: bool):
+    """Point app.replit_db at a fresh store, with nothing remembered from the previous one"""
+    from app import replit_db
+    monkeypatch.setattr(replit_db, "db", store)
+    monkeypatch.setattr(replit_db, "_id_allocator", replit_db.IdAllocator())
+    monkeypatch.setattr(replit_db.ReplitDB, "SHARED_STORE", shared)
+    monkeypatch.setattr(replit_db.ReplitDB, "_ready_indexes", set())
+    monkeypatch.setattr(replit_db.ReplitDB, "_locators", {})
+    replit_db.doc_cache.clear()
+    return replit_db
+
+
+@pytest.fixture
+def local_db(monkeypatch):
+    """app.replit_db over an empty in-memory dict (a process-local store)"""
+    yield _use_store(monkeypatch, {}, shared=False)
+    from app.replit_db import doc_cache
+    doc_cache.clear()
+
+
+@pytest.fixture
+def shared_db(monkeypatch, tmp_path):
+    """app.replit_db over a SQLite file other processes could write to too (SHARED_STORE)"""
+    from app.sharding import SQLiteKV
+    yield _use_store(monkeypatch, SQLiteKV(str(tmp_path / "kv.db")), shared=True)
+    from app.replit_db import doc_cache
+    doc_cache.clear()
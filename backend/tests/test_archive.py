@@ -0,0 +1,95 @@
+"""
+Cold-storage archival: a completed room's documents round-trip through its
+archive, and an archiving run interrupted part-way is finished by the next
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import archive
+from app.cache import archive_cache
+
+
+@pytest.fixture
+def rooms(local_db):
+    archive_cache.clear()
+    yield local_db.ReplitDB
+    archive_cache.clear()
+
+
+def _debate(DB, status="completed", hours_ago=48):
+    when = (datetime.utcnow() - timedelta(hours=hours_ago)).isoformat()
+    room = DB.insert("rooms", {"room_code": "ABC", "status": status, "updated_at": when})
+    amy = DB.insert("participants", {"room_id": room["id"], "user_id": "10", "username": "amy"})
+    bot = DB.insert("participants", {"room_id": room["id"], "is_ai": True, "username": "bot"})
+    DB.insert_many("turns", [{"room_id": room["id"], "speaker_id": speaker["id"], "turn_number": i,
+                              "content": f"turn {i}"} for i, speaker in enumerate([amy, bot, amy])])
+    DB.insert("spectator_votes", {"room_id": room["id"], "target_id": amy["id"], "reaction_type": "👏"})
+    DB.insert("results", {"room_id": room["id"], "winner_id": amy["id"]})
+    return room, amy
+
+
+def _reads(DB, room_id, speaker_id):
+    """What the read paths serve for a room"""
+    async def read():
+        room = DB.get("rooms", room_id)
+        turns = await archive.room_documents(room, "turns", sort=[("turn_number", 1)])
+        return {
+            "turns": [t["content"] for t in turns],
+            "votes": len(await archive.room_documents(room, "spectator_votes")),
+            "winner": (await archive.room_result(room))["winner_id"],
+            "spoken": sorted([t["content"] async for t in archive.speaker_turns(room, speaker_id)]),
+            "history": [p["username"] for p in await archive.user_participations("10")],
+        }
+    return asyncio.run(read())
+
+
+def test_archived_room_reads_like_a_live_one(rooms):
+    room, amy = _debate(rooms)
+    live = _reads(rooms, room["id"], amy["id"])
+
+    moved = archive.archive_room(room["id"])
+    assert moved == {"participants": 2, "turns": 3, "spectator_votes": 1, "results": 1}
+    assert rooms.find("turns", {"room_id": room["id"]}) == []
+    assert rooms.get("rooms", room["id"])["archived_at"]
+    assert rooms.get("user_archives", "10")["room_ids"] == [room["id"]]
+
+    assert _reads(rooms, room["id"], amy["id"]) == live
+
+
+def test_only_completed_rooms_are_archived(rooms):
+    ongoing, _ = _debate(rooms, status="ongoing")
+    recent, _ = _debate(rooms, hours_ago=1)
+    old, _ = _debate(rooms)
+
+    assert archive.archive_room(ongoing["id"]) is None
+    assert archive.archive_completed(older_than_hours=24) == 1
+    assert [r["id"] for r in rooms.find("rooms", limit=None) if r.get("archived_at")] == [old["id"]]
+
+
+def test_interrupted_run_is_finished_by_the_next(rooms, monkeypatch):
+    room, amy = _debate(rooms)
+    live = _reads(rooms, room["id"], amy["id"])
+
+    # Crash after the archive was written, before the documents were deleted
+    delete_many = rooms.delete_many
+    def crash(collection, ids):
+        raise ConnectionError("connection reset")
+    monkeypatch.setattr(rooms, "delete_many", crash)
+    with pytest.raises(ConnectionError):
+        archive.archive_room(room["id"])
+    monkeypatch.setattr(rooms, "delete_many", delete_many)
+    # A straggler written meanwhile belongs in the archive too
+    rooms.insert("spectator_votes", {"room_id": room["id"], "target_id": amy["id"], "reaction_type": "🔥"})
+
+    archive.archive_room(room["id"])
+    assert all(rooms.find(c, {"room_id": room["id"]}) == [] for c in archive.ARCHIVED_COLLECTIONS)
+    stored = rooms.get("archives", room["id"])
+    assert len(stored["turns"]) == 3 and len(stored["spectator_votes"]) == 2
+    archive_cache.clear()
+    assert _reads(rooms, room["id"], amy["id"]) == {**live, "votes": 2}
+
+    # Nothing left to do on a third run
+    assert archive.archive_room(room["id"]) == {c: 0 for c in archive.ARCHIVED_COLLECTIONS}
+    assert rooms.get("user_archives", "10")["room_ids"] == [room["id"]]
@@ -0,0 +1,79 @@
+"""
+Bulk operations: get_many / insert_many / update_many / delete_many round
+trips, concurrent dispatch against a blocking store, and retrying a batch
+that failed part-way
+"""
+import time
+
+
+class SlowDict(dict):
+    """A blocking store: every read is a round trip"""
+
+    def get(self, key, default=None):
+        time.sleep(0.05)
+        return super().get(key, default)
+
+
+class FlakyDict(dict):
+    """A store whose first batch write fails"""
+
+    failures = 1
+
+    def set_bulk(self, values):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("connection reset")
+        self.update(values)
+
+
+def test_bulk_round_trip(local_db):
+    DB = local_db.ReplitDB
+    docs = DB.insert_many("participants", [{"room_id": "1", "user_id": str(i)} for i in range(5)])
+    ids = [doc["id"] for doc in docs]
+    assert len(set(ids)) == 5
+    assert all(doc["_version"] == 1 and doc["created_at"] for doc in docs)
+
+    local_db.doc_cache.clear()
+    found = DB.get_many("participants", [ids[3], "404", ids[0], int(ids[3])])
+    # In request order, missing IDs omitted, repeats collapsed
+    assert list(found) == [ids[3], ids[0]]
+
+    updated = DB.update_many("participants", {ids[0]: {"room_id": "2"}, "404": {"room_id": "2"}})
+    assert list(updated) == [ids[0]] and updated[ids[0]]["_version"] == 2
+    assert [p["id"] for p in DB.find("participants", {"room_id": "2"})] == [ids[0]]
+    assert DB.count("participants", {"room_id": "1"}) == 4
+
+    assert DB.delete_many("participants", ids[:2] + ["404"]) == 2
+    assert sorted(DB.get_many("participants", ids)) == sorted(ids[2:])
+    assert DB.find("participants", {"room_id": "2"}) == []
+
+
+def test_get_many_dispatches_reads_concurrently(local_db, monkeypatch):
+    DB = local_db.ReplitDB
+    ids = [doc["id"] for doc in DB.insert_many("users", [{"username": f"u{i}"} for i in range(16)])]
+    monkeypatch.setattr(local_db, "db", SlowDict(local_db.db))
+    monkeypatch.setattr(DB, "BLOCKING_IO", True)
+    local_db.doc_cache.clear()
+
+    start = time.perf_counter()
+    assert len(DB.get_many("users", ids)) == 16
+    # One concurrent batch, not 16 sequential round trips
+    assert time.perf_counter() - start < 16 * 0.05 / 2
+
+
+def test_failed_batch_can_be_retried(local_db, monkeypatch):
+    DB = local_db.ReplitDB
+    monkeypatch.setattr(local_db, "db", FlakyDict())
+    docs = [{"room_id": "1", "content": f"turn {i}"} for i in range(3)]
+
+    try:
+        DB.insert_many("turns", docs)
+    except ConnectionError:
+        pass
+    # Nothing was written, not even index entries pointing at nothing
+    assert DB.find("turns", {"room_id": "1"}) == []
+
+    # The documents kept the IDs they were given, so a retry stores each once
+    DB.insert_many("turns", docs)
+    assert sorted(t["content"] for t in DB.find("turns", {"room_id": "1"})) == ["turn 0", "turn 1", "turn 2"]
+    assert len(local_db.db.get(DB._index_key("turns", "room_id", "1")).split(",")) == 3
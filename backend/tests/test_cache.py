@@ -0,0 +1,184 @@
+"""
+SimpleCache: LRU and byte bounds, TTLs, single-flight loads, stale serving
+and tag invalidation
+"""
+import asyncio
+import time
+
+from app.cache import SimpleCache, cache_status, estimate_size
+
+
+def test_evicts_least_recently_used_first():
+    cache = SimpleCache(max_entries=3)
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+    cache.get("a")
+    cache.set("d", "d")
+
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in ("a", "c", "d")] == ["a", "c", "d"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_bounded_by_bytes():
+    value = {"text": "x" * 100}
+    size = estimate_size(value)
+    cache = SimpleCache(max_bytes=3 * size)
+    for i in range(5):
+        cache.set(f"k{i}", value)
+
+    assert len(cache) == 3
+    assert cache.bytes == 3 * size
+    assert cache.get("k0") is None and cache.get("k1") is None
+    assert cache.get("k4") == value
+
+    # A value larger than the whole cache isn't stored, and replaces nothing else
+    cache.set("huge", {"text": "x" * (3 * size)})
+    assert cache.get("huge") is None
+    assert len(cache) == 3
+    cache.delete("k4")
+    assert cache.bytes == 2 * size
+
+
+def test_entries_expire():
+    cache = SimpleCache(ttl_seconds=60)
+    cache.set("short", 1, ttl_seconds=0.01)
+    cache.set("long", 2)
+    time.sleep(0.02)
+
+    assert cache.sweep() == 1
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
+
+
+def test_concurrent_misses_share_one_load():
+    cache = SimpleCache()
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"loaded": True}
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_load("room", loader) for _ in range(20)))
+
+    results = asyncio.run(main())
+
+    assert len(calls) == 1
+    assert results == [{"loaded": True}] * 20
+    assert cache.stats()["coalesced"] == 19
+    assert cache.get("room") == {"loaded": True}
+
+
+def test_failed_load_reaches_every_waiter_and_is_not_cached():
+    cache = SimpleCache()
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("storage down")
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_load("room", loader) for _ in range(5)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(main())
+
+    assert len(calls) == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cache.get("room") is None
+
+
+def test_invalidated_entry_is_served_stale_while_refreshed():
+    cache = SimpleCache(ttl_seconds=60, stale_ttl_seconds=60)
+    versions = iter(["v1", "v2"])
+
+    async def loader():
+        await asyncio.sleep(0.01)
+        return next(versions)
+
+    async def main():
+        seen = [(await cache.get_or_load("room", loader), cache_status.get())]
+        cache.invalidate("room")
+        seen.append((await cache.get_or_load("room", loader), cache_status.get()))
+        # One background refresh, however many stale reads
+        seen.append((await cache.get_or_load("room", loader), cache_status.get()))
+        await asyncio.sleep(0.05)
+        seen.append((await cache.get_or_load("room", loader), cache_status.get()))
+        return seen
+
+    assert asyncio.run(main()) == [("v1", "miss"), ("v1", "stale"), ("v1", "stale"), ("v2", "hit")]
+    assert cache.stats()["stale_hits"] == 2
+
+
+def test_invalidate_without_stale_window_deletes():
+    cache = SimpleCache(ttl_seconds=60)
+    cache.set("room", "v1")
+    cache.invalidate("room")
+
+    assert cache.get("room") is None
+    assert len(cache) == 0
+
+
+def test_failed_refresh_stops_serving_stale_value():
+    cache = SimpleCache(ttl_seconds=60, stale_ttl_seconds=60)
+
+    async def missing():
+        raise LookupError("room deleted")
+
+    async def main():
+        await cache.get_or_load("room", lambda: asyncio.sleep(0, "v1"))
+        cache.invalidate("room")
+        stale = await cache.get_or_load("room", missing)
+        await asyncio.sleep(0.01)
+        return stale
+
+    assert asyncio.run(main()) == "v1"
+    assert len(cache) == 0
+
+
+def test_invalidate_tag_covers_tagged_entries_only():
+    cache = SimpleCache(ttl_seconds=60)
+    cache.set("transcript_1", "t1", tags=["room:1"])
+    cache.set("status_1", "s1", tags=["room:1", "user:7"])
+    cache.set("status_2", "s2", tags=["room:2"])
+
+    assert cache.invalidate_tag("room:1") == 2
+    assert cache.get("transcript_1") is None and cache.get("status_1") is None
+    assert cache.get("status_2") == "s2"
+    assert cache.stats()["tags"] == 1
+
+
+def test_load_started_before_tag_invalidation_is_not_cached():
+    cache = SimpleCache(ttl_seconds=60)
+
+    async def loader():
+        await asyncio.sleep(0.02)
+        return "outdated"
+
+    async def main():
+        load = asyncio.create_task(cache.get_or_load("room", loader, tags=["room:1"]))
+        await asyncio.sleep(0.005)
+        cache.invalidate_tag("room:1")
+        return await load
+
+    assert asyncio.run(main()) == "outdated"
+    assert cache.get("room") is None
+
+
+def test_room_lookups_by_id_and_by_code_never_share_a_key():
+    from fastapi import HTTPException
+    from app.replit_db import ReplitDB, Collections
+    from app.routers.rooms import get_room, get_room_by_code
+    room = ReplitDB.insert(Collections.ROOMS, {"room_code": "ABC123", "host_id": "1", "status": "waiting"})
+
+    async def lookups():
+        assert (await get_room_by_code("abc123")).id == room["id"]
+        try:
+            await get_room("code_ABC123")
+        except HTTPException as error:
+            return error.status_code
+
+    assert asyncio.run(lookups()) == 404
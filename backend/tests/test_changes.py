@@ -0,0 +1,98 @@
+"""
+Change feed: one event per document write (bulk writes included),
+subscriber filters, isolation from failing handlers, async delivery from
+executor threads, and the cache invalidation built on it
+"""
+import asyncio
+import threading
+
+import pytest
+
+from app.changes import ChangeFeed, change_feed, INSERT, UPDATE, DELETE
+
+
+@pytest.fixture
+def events():
+    """Every change published while the test runs"""
+    seen = []
+    unsubscribe = change_feed.subscribe(seen.append)
+    yield seen
+    unsubscribe()
+
+
+def test_every_write_publishes_one_event(local_db, events):
+    DB = local_db.ReplitDB
+    room = DB.insert("rooms", {"room_code": "ABC", "status": "waiting"})
+    DB.update("rooms", room["id"], {"status": "ongoing"})
+    DB.delete("rooms", room["id"])
+    turns = DB.insert_many("turns", [{"room_id": room["id"], "content": str(i)} for i in range(3)])
+    DB.update_many("turns", {turn["id"]: {"content": "edited"} for turn in turns})
+    DB.delete_many("turns", [turn["id"] for turn in turns])
+
+    assert [(e.op, e.collection) for e in events] == (
+        [(INSERT, "rooms"), (UPDATE, "rooms"), (DELETE, "rooms")]
+        + [(INSERT, "turns")] * 3 + [(UPDATE, "turns")] * 3 + [(DELETE, "turns")] * 3)
+    insert, update, delete = events[:3]
+    assert insert.previous is None and insert.doc["status"] == "waiting"
+    assert update.previous["status"] == "waiting" and update.doc["status"] == "ongoing"
+    assert update.changed_fields == {"status", "_version", "updated_at"}
+    assert delete.doc is None and delete.id == room["id"]
+
+
+def test_subscriptions_filter_by_collection_field_and_op():
+    feed = ChangeFeed()
+    statuses, deletes = [], []
+    feed.subscribe(statuses.append, collection="rooms", fields=["status"])
+    unsubscribe = feed.subscribe(deletes.append, ops=[DELETE])
+
+    feed.publish(UPDATE, "rooms", {"id": "1", "status": "ongoing", "topic": "a"},
+                 {"id": "1", "status": "waiting", "topic": "a"})
+    feed.publish(UPDATE, "rooms", {"id": "1", "status": "ongoing", "topic": "b"},
+                 {"id": "1", "status": "ongoing", "topic": "a"})
+    feed.publish(DELETE, "turns", previous={"id": "5"})
+    unsubscribe()
+    feed.publish(DELETE, "turns", previous={"id": "6"})
+
+    assert [e.doc["topic"] for e in statuses] == ["a"]
+    assert [e.id for e in deletes] == ["5"]
+
+
+def test_failing_handler_neither_fails_the_write_nor_starves_others(local_db, events):
+    def broken(event):
+        raise RuntimeError("handler bug")
+    unsubscribe = change_feed.subscribe(broken)
+    try:
+        room = local_db.ReplitDB.insert("rooms", {"room_code": "ABC"})
+    finally:
+        unsubscribe()
+    assert local_db.ReplitDB.get("rooms", room["id"])
+    assert [e.id for e in events] == [room["id"]]
+
+
+def test_async_handlers_run_on_the_bound_loop():
+    feed = ChangeFeed()
+
+    async def scenario():
+        delivered = asyncio.Queue()
+
+        async def handler(event):
+            delivered.put_nowait((event.id, threading.current_thread() is threading.main_thread()))
+        feed.subscribe(handler)
+        feed.bind_loop(asyncio.get_running_loop())
+        # Storage calls publish from executor threads
+        await asyncio.get_running_loop().run_in_executor(None, feed.publish, INSERT, "turns", {"id": "9"})
+        return await asyncio.wait_for(delivered.get(), 5)
+
+    assert asyncio.run(scenario()) == ("9", True)
+
+
+def test_writes_invalidate_the_cached_views_of_their_room(local_db):
+    from app.cache import room_cache
+    room = local_db.ReplitDB.insert("rooms", {"room_code": "ABC"})
+    room_cache.set(f"transcript_{room['id']}", ["cached"], tags=[f"room:{room['id']}"])
+    room_cache.set("transcript_other", ["cached"], tags=["room:other"])
+
+    local_db.ReplitDB.insert("turns", {"room_id": room["id"], "content": "new"})
+    assert room_cache.get(f"transcript_{room['id']}") is None
+    assert room_cache.get("transcript_other") == ["cached"]
+    room_cache.delete("transcript_other")
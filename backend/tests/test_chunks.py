@@ -0,0 +1,141 @@
+"""
+Large values: chunk manifests, zstd compression, and cleanup of the chunks
+a rewrite or delete replaces, whichever process wrote them
+"""
+import multiprocessing
+
+import pytest
+
+from app.serialization import COMPRESSED_TAG
+
+CHUNK_BYTES = 256
+
+
+def _big(n: int = 20) -> str:
+    return " ".join(f"word{i}" for i in range(n * 10))
+
+
+@pytest.fixture
+def chunked_db(shared_db, monkeypatch):
+    monkeypatch.setattr(shared_db.settings, "VALUE_CHUNK_BYTES", CHUNK_BYTES)
+    return shared_db
+
+
+def _chunk_keys(store):
+    return sorted(key for key in store.keys() if key.startswith("_chunk:"))
+
+
+def _write_worker(path: str, doc_id: str, content: str):
+    """Store a chunked document from another process"""
+    from app import replit_db
+    from app.sharding import SQLiteKV
+    replit_db.db = SQLiteKV(path)
+    replit_db.settings.VALUE_CHUNK_BYTES = CHUNK_BYTES
+    replit_db.ReplitDB.insert("turns", {"id": doc_id, "room_id": 1, "content": content})
+
+
+def _write_elsewhere(path, doc_id: str, content: str):
+    process = multiprocessing.get_context("spawn").Process(
+        target=_write_worker, args=(str(path), doc_id, content))
+    process.start()
+    process.join(60)
+    assert process.exitcode == 0
+
+
+def test_large_document_round_trips_through_chunks(chunked_db):
+    DB = chunked_db.ReplitDB
+    turn = DB.insert("turns", {"room_id": 1, "content": _big()})
+
+    manifest = chunked_db.db.get(DB._make_key("turns", turn["id"]))
+    tag, count, digest = manifest.split(":")
+    assert tag == chunked_db.CHUNKED_TAG
+    assert len(_chunk_keys(chunked_db.db)) == int(count) > 1
+
+    chunked_db.doc_cache.clear()
+    assert DB.get("turns", turn["id"])["content"] == _big()
+
+
+def test_rewrite_and_delete_leave_no_orphaned_chunks(chunked_db):
+    DB = chunked_db.ReplitDB
+    turn = DB.insert("turns", {"room_id": 1, "content": _big()})
+    DB.update("turns", turn["id"], {"content": _big(30)})
+    assert DB.get("turns", turn["id"])["content"] == _big(30)
+    count = int(chunked_db.db.get(DB._make_key("turns", turn["id"])).split(":")[1])
+    assert len(_chunk_keys(chunked_db.db)) == count
+
+    # Shrinking below the chunk size drops them all
+    DB.update("turns", turn["id"], {"content": "short"})
+    assert _chunk_keys(chunked_db.db) == []
+
+    DB.update("turns", turn["id"], {"content": _big()})
+    DB.delete("turns", turn["id"])
+    assert _chunk_keys(chunked_db.db) == []
+
+
+def test_chunks_written_by_another_process_are_cleaned_up(chunked_db, tmp_path):
+    DB = chunked_db.ReplitDB
+    _write_elsewhere(tmp_path / "kv.db", "7", _big())
+    assert _chunk_keys(chunked_db.db)
+
+    # This process never read those chunks; the stored manifest names them
+    DB.insert("turns", {"id": "7", "room_id": 1, "content": "short"})
+    assert _chunk_keys(chunked_db.db) == []
+
+    _write_elsewhere(tmp_path / "kv.db", "7", _big())
+    DB.update("turns", "7", {"content": _big(30)})
+    count = int(chunked_db.db.get(DB._make_key("turns", "7")).split(":")[1])
+    assert len(_chunk_keys(chunked_db.db)) == count
+    DB.delete("turns", "7")
+    assert _chunk_keys(chunked_db.db) == []
+
+
+def test_compressed_collection_round_trips(shared_db, monkeypatch):
+    if not shared_db.ZSTD_AVAILABLE:
+        pytest.skip("zstandard is not installed")
+    monkeypatch.setattr(shared_db, "COMPRESSED_COLLECTIONS", {"turns"})
+    DB = shared_db.ReplitDB
+    turn = DB.insert("turns", {"room_id": 1, "content": _big(100)})
+
+    value = shared_db.db.get(DB._make_key("turns", turn["id"]))
+    assert value.startswith(COMPRESSED_TAG)
+    assert len(value) < len(_big(100))
+    shared_db.doc_cache.clear()
+    assert DB.get("turns", turn["id"])["content"] == _big(100)
+
+
+class StaleFirstRead(dict):
+    """A store where the first read of one key still sees its previous value"""
+
+    def __init__(self, data, key, stale):
+        super().__init__(data)
+        self.stale = {key: stale}
+
+    def get(self, key, default=None):
+        if key in self.stale:
+            return self.stale.pop(key)
+        return super().get(key, default)
+
+
+def test_read_racing_a_rewrite_retries_with_the_new_manifest(local_db, monkeypatch):
+    monkeypatch.setattr(local_db.settings, "VALUE_CHUNK_BYTES", CHUNK_BYTES)
+    DB = local_db.ReplitDB
+    turn = DB.insert("turns", {"room_id": 1, "content": _big()})
+    key = DB._make_key("turns", turn["id"])
+    old_manifest = local_db.db[key]
+    DB.update("turns", turn["id"], {"content": _big(30)})
+
+    # The manifest was read just before the rewrite deleted the chunks it names
+    monkeypatch.setattr(local_db, "db", StaleFirstRead(local_db.db, key, old_manifest))
+    local_db.doc_cache.clear()
+    assert DB.get("turns", turn["id"])["content"] == _big(30)
+
+
+def test_missing_chunks_are_an_error_not_a_wrong_value(local_db, monkeypatch):
+    monkeypatch.setattr(local_db.settings, "VALUE_CHUNK_BYTES", CHUNK_BYTES)
+    DB = local_db.ReplitDB
+    turn = DB.insert("turns", {"room_id": 1, "content": _big()})
+    del local_db.db[_chunk_keys(local_db.db)[0]]
+    local_db.doc_cache.clear()
+
+    with pytest.raises(RuntimeError):
+        DB.get("turns", turn["id"])
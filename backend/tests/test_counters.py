@@ -0,0 +1,122 @@
+"""
+Counter fields (increment): no update is lost when several worker
+processes increment the same document on a shared store
+"""
+import multiprocessing
+import os
+import queue
+import time
+
+import pytest
+
+WORKERS = 4
+INCREMENTS_PER_WORKER = 100
+TIMEOUT_SECONDS = 60
+
+
+def _open_db(env):
+    os.environ.update(env)
+    from app.replit_db import DB
+    return DB
+
+
+def _seed_worker(env, results):
+    DB = _open_db(env)
+    results.put(DB.insert("users", {"username": "counted", "xp": 10})["id"])
+
+
+def _increment_worker(env, user_id, start, results):
+    DB = _open_db(env)
+    start.wait()
+    for _ in range(INCREMENTS_PER_WORKER):
+        DB.increment("users", user_id, "xp")
+    results.put(DB.get("users", user_id)["xp"])
+
+
+def _read_worker(env, user_id, results):
+    DB = _open_db(env)
+    DB.update("users", user_id, {"username": "renamed"})
+    results.put(DB.get("users", user_id))
+
+
+def _one(target, *args):
+    """Run target in one spawned process and return what it reported"""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=target, args=(*args, results))
+    process.start()
+    try:
+        return results.get(timeout=TIMEOUT_SECONDS)
+    finally:
+        process.join(TIMEOUT_SECONDS)
+
+
+def _run(env, user_id):
+    context = multiprocessing.get_context("spawn")
+    start, results = context.Barrier(WORKERS, timeout=TIMEOUT_SECONDS), context.Queue()
+    processes = [context.Process(target=_increment_worker, args=(env, user_id, start, results))
+                 for _ in range(WORKERS)]
+    for process in processes:
+        process.start()
+    totals, deadline = [], time.monotonic() + TIMEOUT_SECONDS
+    try:
+        while len(totals) < WORKERS:
+            try:
+                totals.append(results.get(timeout=0.5))
+            except queue.Empty:
+                # Fail fast (with the exit codes) if a worker died
+                exit_codes = [process.exitcode for process in processes]
+                assert time.monotonic() < deadline and not any(exit_codes), exit_codes
+        return totals
+    finally:
+        for process in processes:
+            # After a failure the survivors would only wait out the barrier
+            if len(totals) < WORKERS:
+                process.terminate()
+            process.join(TIMEOUT_SECONDS)
+
+
+def _check_no_lost_increments(env):
+    user_id = _one(_seed_worker, env)
+    totals = _run(env, user_id)
+
+    expected = 10 + WORKERS * INCREMENTS_PER_WORKER
+    assert max(totals) <= expected
+    # An update rewrites the document without dropping what was counted
+    user = _one(_read_worker, env, user_id)
+    assert user["xp"] == expected and user["username"] == "renamed"
+
+
+def test_workers_on_sqlite_shards_lose_no_increments(tmp_path):
+    shards = f"a=sqlite:///{tmp_path / 'a.db'},b=sqlite:///{tmp_path / 'b.db'}"
+    _check_no_lost_increments({"REPLIT_DB_SHARDS": shards})
+
+
+def test_workers_on_replit_db_lose_no_increments():
+    from app.replit_db_server import ReplitDBServer
+    server = ReplitDBServer().start()
+    try:
+        _check_no_lost_increments({"DATABASE_URL": f"replit+{server.url}"})
+        # One counter slot per worker (on top of the document itself)
+        assert len([key for key in server.store if key.startswith("_ctr:users:")]) == WORKERS
+    finally:
+        server.stop()
+
+
+def test_counter_keys_are_read_with_the_document_and_deleted_with_it(shared_db):
+    DB = shared_db.ReplitDB
+    participant = DB.insert("participants", {"room_id": 1, "username": "amy"})
+    DB.increment("participants", participant["id"], "reaction_count")
+    assert DB.increment("participants", participant["id"], "reaction_count", 2)["reaction_count"] == 3
+
+    shared_db.doc_cache.clear()
+    assert DB.find("participants", {"room_id": 1})[0]["reaction_count"] == 3
+
+    DB.delete("participants", participant["id"])
+    assert not shared_db.db.prefix("_ctr:")
+
+
+def test_only_counter_fields_can_be_incremented(shared_db):
+    user = shared_db.ReplitDB.insert("users", {"username": "amy"})
+    with pytest.raises(ValueError):
+        shared_db.ReplitDB.increment("users", user["id"], "username")
@@ -0,0 +1,104 @@
+"""
+Hi/lo ID allocation: IDs stay unique across worker processes
+"""
+import multiprocessing
+import os
+import queue
+import time
+
+WORKERS = 4
+IDS_PER_WORKER = 300
+TIMEOUT_SECONDS = 60
+
+
+class RacyKV:
+    """A store other processes share with no atomic update (like Replit DB), slow enough to race"""
+
+    shared = True
+
+    def __init__(self, path: str):
+        from app.sharding import SQLiteKV
+        self.kv = SQLiteKV(path)
+
+    def get(self, key, default=None):
+        value = self.kv.get(key, default)
+        time.sleep(0.002)
+        return value
+
+    def __setitem__(self, key, value):
+        self.kv[key] = value
+
+
+def _insert_worker(shards: str, start, results):
+    """Insert documents through the configured backend (SQLite shards)"""
+    os.environ["REPLIT_DB_SHARDS"] = shards
+    from app.replit_db import DB
+    start.wait()
+    docs = [DB.insert("turns", {"content": f"{os.getpid()}:{i}"}) for i in range(IDS_PER_WORKER)]
+    results.put([doc["id"] for doc in docs])
+
+
+def _allocate_worker(path: str, start, results):
+    """Allocate IDs from a shared store without atomic updates"""
+    from app.replit_db import IdAllocator
+    allocator = IdAllocator(block_size=5, store=RacyKV(path))
+    start.wait()
+    results.put([allocator.allocate("turns")[0] for _ in range(IDS_PER_WORKER)])
+
+
+def _run(target, *args):
+    context = multiprocessing.get_context("spawn")
+    start, results = context.Barrier(WORKERS, timeout=TIMEOUT_SECONDS), context.Queue()
+    processes = [context.Process(target=target, args=(*args, start, results)) for _ in range(WORKERS)]
+    for process in processes:
+        process.start()
+    batches, deadline = [], time.monotonic() + TIMEOUT_SECONDS
+    try:
+        while len(batches) < WORKERS:
+            try:
+                batches.append(results.get(timeout=0.5))
+            except queue.Empty:
+                # Fail fast (with the exit codes) if a worker died
+                exit_codes = [process.exitcode for process in processes]
+                assert time.monotonic() < deadline and not any(exit_codes), exit_codes
+        return batches
+    finally:
+        for process in processes:
+            # After a failure the survivors would only wait out the barrier
+            if len(batches) < WORKERS:
+                process.terminate()
+            process.join(TIMEOUT_SECONDS)
+
+
+def test_workers_on_sqlite_shards_never_share_ids(tmp_path):
+    shards = f"a=sqlite:///{tmp_path / 'a.db'},b=sqlite:///{tmp_path / 'b.db'}"
+    ids = [doc_id for batch in _run(_insert_worker, shards) for doc_id in batch]
+
+    assert len(set(ids)) == WORKERS * IDS_PER_WORKER
+    # Blocks are reserved atomically, so IDs stay plain numbers
+    assert sorted(int(doc_id) for doc_id in ids) == list(range(1, WORKERS * IDS_PER_WORKER + 1))
+
+    from app.sharding import ShardedStore
+    store = ShardedStore.from_setting(shards)
+    assert len(store.prefix("turns:")) == WORKERS * IDS_PER_WORKER
+
+
+def test_workers_on_store_without_atomic_updates_never_share_ids(tmp_path):
+    from app.replit_db import WORKER_ID_DIGITS
+    batches = _run(_allocate_worker, str(tmp_path / "kv.db"))
+    ids = [doc_id for batch in batches for doc_id in batch]
+
+    assert len(set(ids)) == WORKERS * IDS_PER_WORKER
+    # Each worker's IDs carry its own numeric suffix
+    assert all(doc_id.isdigit() for doc_id in ids)
+    assert len({doc_id[-WORKER_ID_DIGITS:] for doc_id in ids}) == WORKERS
+
+
+def test_forked_child_reserves_its_own_block(tmp_path):
+    from app.replit_db import IdAllocator
+    from app.sharding import SQLiteKV
+    allocator = IdAllocator(block_size=10, store=SQLiteKV(str(tmp_path / "kv.db")))
+    allocator.allocate("turns")
+
+    allocator._after_fork()
+    assert allocator.allocate("turns") == ["11"]
@@ -0,0 +1,96 @@
+"""
+Secondary indexes: kept up to date by every write, rebuilt after a crash
+or a layout change, and never losing entries to concurrent writers
+"""
+import multiprocessing
+import os
+
+WORKERS = 4
+ROOMS_PER_WORKER = 50
+
+
+def _insert_worker(shards: str, worker: int):
+    os.environ["REPLIT_DB_SHARDS"] = shards
+    from app.replit_db import DB
+    for i in range(ROOMS_PER_WORKER):
+        DB.insert("rooms", {"room_code": f"W{worker}R{i}", "visibility": "public"})
+
+
+def _ids(replit_db, collection, field, value):
+    return sorted(replit_db.ReplitDB._index_id_lists(collection, [(field, value)])[0])
+
+
+def test_writes_keep_id_lists_current(local_db):
+    DB = local_db.ReplitDB
+    room = DB.insert("rooms", {"room_code": "ABC", "visibility": "public"})
+    other = DB.insert("rooms", {"room_code": "DEF", "visibility": "public"})
+    assert _ids(local_db, "rooms", "visibility", "public") == sorted([room["id"], other["id"]])
+
+    DB.update("rooms", room["id"], {"visibility": "private"})
+    assert _ids(local_db, "rooms", "visibility", "public") == [other["id"]]
+    assert [r["id"] for r in DB.find("rooms", {"visibility": "private"})] == [room["id"]]
+
+    DB.delete("rooms", other["id"])
+    # An emptied id list is removed rather than kept as []
+    assert DB._index_key("rooms", "visibility", "public") not in local_db.db
+    assert DB.find_one("rooms", {"room_code": "DEF"}) is None
+
+
+def test_find_is_answered_from_the_index(local_db, monkeypatch):
+    DB = local_db.ReplitDB
+    for i in range(20):
+        DB.insert("rooms", {"room_code": f"R{i}", "visibility": "public" if i % 2 else "private"})
+    DB.find("rooms", {"visibility": "public"})
+
+    def no_scans(collection):
+        raise AssertionError(f"scanned {collection}")
+    monkeypatch.setattr(DB, "_collection_ids", no_scans)
+    assert len(DB.find("rooms", {"visibility": "public"}, limit=None)) == 10
+    assert DB.count("rooms", {"visibility": "private"}) == 10
+
+
+def test_document_written_without_its_entry_is_found_after_a_rebuild(local_db):
+    DB = local_db.ReplitDB
+    DB.insert("rooms", {"room_code": "ABC", "visibility": "public"})
+    assert DB.find("rooms", {"visibility": "public"})
+
+    # A crash between the document write and its index update
+    local_db.db[DB._make_key("rooms", "99")] = local_db.encode_document(
+        {"id": "99", "room_code": "XYZ", "visibility": "public"})
+    DB.rebuild_index("rooms", "visibility")
+    assert sorted(r["room_code"] for r in DB.find("rooms", {"visibility": "public"})) == ["ABC", "XYZ"]
+
+
+def test_entry_left_by_a_deleted_document_is_ignored(shared_db):
+    DB = shared_db.ReplitDB
+    room = DB.insert("rooms", {"room_code": "ABC", "visibility": "public"})
+    DB.find("rooms", {"visibility": "public"})
+    # A crash between the document delete and its index update
+    del shared_db.db[DB._make_key("rooms", room["id"])]
+    shared_db.doc_cache.clear()
+
+    assert DB.find("rooms", {"visibility": "public"}) == []
+
+
+def test_index_built_with_id_lists_is_rebuilt_for_a_shared_store(shared_db):
+    DB = shared_db.ReplitDB
+    room = DB.insert("rooms", {"room_code": "ABC", "visibility": "public"})
+    # Left behind by a process-local store: one id list per value, layout "1"
+    for key in shared_db.db.prefix("_idx:rooms:visibility:"):
+        del shared_db.db[key]
+    shared_db.db[DB._index_key("rooms", "visibility", "public")] = f'["{room["id"]}"]'
+    shared_db.db["_idx_ready:rooms:visibility"] = "1"
+
+    assert [r["id"] for r in DB.find("rooms", {"visibility": "public"})] == [room["id"]]
+    assert shared_db.db.get("_idx_ready:rooms:visibility") == "2"
+    assert shared_db.db.prefix(DB._index_key("rooms", "visibility", "public") + ":")
+
+
+def test_concurrent_writers_never_drop_each_others_entries(shared_db, tmp_path):
+    shards = f"a=sqlite:///{tmp_path / 'kv.db'}"
+    with multiprocessing.get_context("spawn").Pool(WORKERS) as pool:
+        pool.starmap(_insert_worker, [(shards, worker) for worker in range(WORKERS)])
+
+    # Read the entries themselves: a find would rebuild the index first
+    assert len(_ids(shared_db, "rooms", "visibility", "public")) == WORKERS * ROOMS_PER_WORKER
+    assert len(shared_db.ReplitDB.find("rooms", {"visibility": "public"}, limit=None)) == WORKERS * ROOMS_PER_WORKER
@@ -0,0 +1,72 @@
+"""
+Streaming iteration: iter / iter_batches fetch lazily a batch at a time,
+stay out of the document cache, stop early, and skip documents deleted
+while a scan runs
+"""
+import asyncio
+
+
+class CountingDict(dict):
+    """A store that counts document reads"""
+
+    reads = 0
+
+    def get(self, key, default=None):
+        if not key.startswith("_"):
+            self.reads += 1
+        return super().get(key, default)
+
+
+def _seed(replit_db, n: int = 95):
+    replit_db.ReplitDB.insert_many("users", [{"username": f"u{i}", "is_ai": i % 5 == 0} for i in range(n)])
+    replit_db.doc_cache.clear()
+
+
+def test_batches_round_trip_without_filling_the_cache(local_db):
+    _seed(local_db)
+    batches = list(local_db.ReplitDB.iter_batches("users", batch_size=20))
+
+    assert [len(batch) for batch in batches] == [20, 20, 20, 20, 15]
+    assert len({user["id"] for batch in batches for user in batch}) == 95
+    assert local_db.doc_cache.stats()["size"] == 0
+    humans = list(local_db.ReplitDB.iter("users", {"is_ai": False}, batch_size=20))
+    assert len(humans) == 76 and not any(user["is_ai"] for user in humans)
+
+
+def test_stopping_early_fetches_only_the_first_batch(local_db, monkeypatch):
+    _seed(local_db)
+    store = CountingDict(local_db.db)
+    monkeypatch.setattr(local_db, "db", store)
+
+    for i, _ in enumerate(local_db.ReplitDB.iter("users", batch_size=10)):
+        if i == 4:
+            break
+    assert store.reads == 10
+
+
+def test_documents_deleted_during_a_scan_are_skipped(local_db):
+    _seed(local_db, 30)
+    DB = local_db.ReplitDB
+    batches = DB.iter_batches("users", batch_size=10)
+    first = next(batches)
+    # Another request deletes documents the scan has listed but not fetched yet
+    later_ids = [user["id"] for user in DB.find("users", limit=None) if user["id"] not in {u["id"] for u in first}]
+    DB.delete_many("users", later_ids[:5])
+    local_db.doc_cache.clear()
+
+    rest = [user for batch in batches for user in batch]
+    assert len(first) + len(rest) == 25
+
+
+def test_async_iteration(local_db):
+    _seed(local_db, 30)
+
+    async def scan():
+        seen = []
+        async for user in local_db.AsyncDB.iter("users", {"is_ai": True}, batch_size=4):
+            seen.append(user["username"])
+        async for user in local_db.AsyncDB.iter("users", batch_size=4):
+            break
+        return seen
+
+    assert sorted(asyncio.run(scan())) == sorted(f"u{i}" for i in range(0, 30, 5))
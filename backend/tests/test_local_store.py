@@ -0,0 +1,107 @@
+"""
+Local snapshot + log store: round trips through reopen and compaction, and
+recovery from a killed process, a torn log tail and an unfinished compaction
+"""
+import multiprocessing
+import os
+import time
+
+from app.local_store import LogStore, LOG_FILE, COMPACTING_LOG_FILE, SNAPSHOT_FILE
+
+
+def _reopen(store: LogStore) -> LogStore:
+    store.close()
+    return LogStore(store.directory)
+
+
+def _write_and_die(directory: str):
+    """Store documents through the backend, then exit without closing anything"""
+    os.environ["LOCAL_STORE_DIR"] = directory
+    from app.replit_db import DB
+    DB.insert_many("turns", [{"room_id": "1", "content": str(i)} for i in range(20)])
+    DB.delete("turns", "3")
+    os._exit(0)
+
+
+def _read_turns(directory: str):
+    os.environ["LOCAL_STORE_DIR"] = directory
+    from app.replit_db import DB
+    return sorted(turn["content"] for turn in DB.find("turns", {"room_id": "1"}, limit=None))
+
+
+def test_round_trip_through_reopen_and_compaction(tmp_path):
+    store = LogStore(str(tmp_path))
+    store["a"] = "1"
+    store.set_bulk({"b": "2", "c": {"nested": [1, 2]}})
+    del store["a"]
+    store = _reopen(store)
+    assert dict((key, store[key]) for key in store) == {"b": "2", "c": {"nested": [1, 2]}}
+
+    store.compact()
+    assert os.path.getsize(tmp_path / LOG_FILE) == 0
+    store["d"] = "4"
+    store = _reopen(store)
+    assert sorted(store.keys()) == ["b", "c", "d"]
+    assert store.prefix("c") == ["c"]
+    store.close()
+
+
+def test_compaction_starts_once_the_log_outgrows_the_snapshot(tmp_path):
+    store = LogStore(str(tmp_path), compact_min_bytes=1024)
+    for i in range(200):
+        store[f"key{i % 10}"] = "x" * 50
+    # Compaction runs in the background
+    deadline = time.monotonic() + 10
+    while not os.path.exists(tmp_path / SNAPSHOT_FILE) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    store.close()
+    assert os.path.exists(tmp_path / SNAPSHOT_FILE)
+    assert len(LogStore(str(tmp_path))) == 10
+
+
+def test_torn_last_record_is_dropped(tmp_path):
+    store = LogStore(str(tmp_path))
+    store["a"] = "1"
+    store["b"] = "2"
+    store.close()
+    # Crash mid-append
+    with open(tmp_path / LOG_FILE, "ab") as log:
+        log.write(b'["s","c","3')
+
+    store = LogStore(str(tmp_path))
+    assert sorted(store.keys()) == ["a", "b"]
+    # The torn bytes are gone, so later records are not glued onto them
+    store["d"] = "4"
+    assert sorted(_reopen(store).keys()) == ["a", "b", "d"]
+
+
+def test_unfinished_compaction_is_recovered(tmp_path):
+    store = LogStore(str(tmp_path))
+    store["a"] = "1"
+    store.compact()
+    store["b"] = "2"
+    store["c"] = "3"
+    store.close()
+    # Crash after a compaction rotated the log, before its snapshot replaced the old one
+    os.replace(tmp_path / LOG_FILE, tmp_path / COMPACTING_LOG_FILE)
+    store = LogStore(str(tmp_path))
+    del store["b"]
+    store["d"] = "4"
+
+    store = _reopen(store)
+    assert sorted(store.keys()) == ["a", "c", "d"]
+    store.compact()
+    assert not os.path.exists(tmp_path / COMPACTING_LOG_FILE)
+    assert sorted(_reopen(store).keys()) == ["a", "c", "d"]
+
+
+def test_writes_survive_a_killed_process(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    process = context.Process(target=_write_and_die, args=(str(tmp_path),))
+    process.start()
+    process.join(60)
+    assert process.exitcode == 0
+
+    with context.Pool(1) as pool:
+        contents = pool.apply(_read_turns, (str(tmp_path),))
+    assert contents == sorted(str(i) for i in range(20) if i != 2)
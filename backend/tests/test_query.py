@@ -0,0 +1,78 @@
+"""
+Query engine: filter before sort/offset/limit, projection, and keyset
+cursors that resume correctly across writes and process restarts
+"""
+import pytest
+
+from app.query import ASCENDING, DESCENDING, run_query
+
+
+def test_filter_applies_before_limit():
+    docs = [{"id": str(i), "room_id": "1" if i >= 150 else "2"} for i in range(200)]
+    page, _ = run_query(docs, {"room_id": "1"}, limit=100)
+    assert len(page) == 50 and all(doc["room_id"] == "1" for doc in page)
+
+
+def test_sort_offset_limit_and_projection():
+    docs = [{"id": "1", "round": 2, "turn": 1, "text": "a"},
+            {"id": "2", "round": 1, "turn": 2, "text": "b"},
+            {"id": "3", "round": None, "turn": 9, "text": "c"},
+            {"id": "4", "round": 1, "turn": 1, "text": "d"}]
+    page, _ = run_query(docs, sort=[("round", ASCENDING), ("turn", ASCENDING)])
+    # None sorts first
+    assert [doc["id"] for doc in page] == ["3", "4", "2", "1"]
+
+    page, _ = run_query(docs, sort=[("round", DESCENDING)], offset=1, limit=2, fields=["text"])
+    assert page == [{"id": "2", "text": "b"}, {"id": "4", "text": "d"}]
+
+
+def test_unsorted_limit_stops_reading_early():
+    read = []
+
+    def stream():
+        for i in range(1000):
+            read.append(i)
+            yield {"id": str(i)}
+    run_query(stream(), limit=10)
+    assert len(read) == 10
+
+
+def test_cursor_pages_cover_every_match_once(local_db):
+    DB = local_db.ReplitDB
+    DB.insert_many("rooms", [{"room_code": f"R{i}", "visibility": "public", "max_participants": i % 4}
+                             for i in range(25)])
+    seen, cursor = [], None
+    while True:
+        page = DB.find_page("rooms", {"visibility": "public"}, limit=7,
+                            sort=[("max_participants", DESCENDING)], cursor=cursor)
+        seen.extend(room["room_code"] for room in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert sorted(seen) == sorted(f"R{i}" for i in range(25))
+
+
+def test_cursor_resumes_after_writes_and_a_restart(local_db):
+    DB = local_db.ReplitDB
+    rooms = DB.insert_many("rooms", [{"room_code": f"R{i}", "visibility": "public", "max_participants": i}
+                                     for i in range(10)])
+    sort = [("max_participants", ASCENDING)]
+    page = DB.find_page("rooms", {"visibility": "public"}, limit=4, sort=sort)
+    assert [r["max_participants"] for r in page["items"]] == [0, 1, 2, 3]
+
+    # Meanwhile: a room before the cursor, one after it, and a served one deleted
+    DB.insert("rooms", {"room_code": "early", "visibility": "public", "max_participants": -1})
+    DB.insert("rooms", {"room_code": "late", "visibility": "public", "max_participants": 100})
+    DB.delete("rooms", rooms[3]["id"])
+    # Cursors carry their position, not server state
+    local_db.doc_cache.clear()
+    local_db.ReplitDB._ready_indexes.clear()
+
+    rest = DB.find_page("rooms", {"visibility": "public"}, limit=100, sort=sort, cursor=page["next_cursor"])
+    assert [r["room_code"] for r in rest["items"]] == [f"R{i}" for i in range(4, 10)] + ["late"]
+    assert rest["next_cursor"] is None
+
+
+def test_malformed_cursor_is_rejected(local_db):
+    with pytest.raises(ValueError):
+        local_db.ReplitDB.find_page("rooms", cursor="not a cursor")
@@ -0,0 +1,91 @@
+"""
+Room-scoped key layout: room:<room_id>:<kind>:<id> keys with _loc locators,
+room reads from one prefix listing, and migrate_keys in both directions
+(including a re-run after an interrupted migration)
+"""
+import pytest
+
+from app import migrate_keys
+
+
+@pytest.fixture
+def layout(local_db, monkeypatch):
+    """local_db whose ROOM_SCOPED_KEYS can be flipped (off to start with)"""
+    monkeypatch.setattr(migrate_keys, "db", local_db.db)
+    monkeypatch.setattr(local_db, "ROOM_SCOPED_KEYS", False)
+    return local_db
+
+
+def _room_keys(store):
+    return sorted(key for key in store if key.startswith("room:"))
+
+
+def _seed(replit_db):
+    DB = replit_db.ReplitDB
+    DB.insert_many("turns", [{"room_id": str(room), "content": f"{room}.{i}"} for room in (1, 2) for i in range(3)])
+    DB.insert("participants", {"room_id": "1", "username": "amy"})
+    DB.insert("rooms", {"room_code": "ABC"})
+
+
+def _contents(replit_db, room_id):
+    return sorted(t["content"] for t in replit_db.ReplitDB.find("turns", {"room_id": room_id}))
+
+
+def test_room_documents_live_under_the_room(layout, monkeypatch):
+    monkeypatch.setattr(layout, "ROOM_SCOPED_KEYS", True)
+    DB = layout.ReplitDB
+    turn = DB.insert("turns", {"room_id": "7", "content": "hello"})
+    key = f"room:7:turn:{turn['id']}"
+    assert key in layout.db and layout.db[f"_loc:turns:{turn['id']}"] == key
+
+    layout.doc_cache.clear()
+    layout.ReplitDB._locators.clear()
+    assert DB.get("turns", turn["id"])["content"] == "hello"
+
+    def no_scans(collection):
+        raise AssertionError(f"scanned {collection}")
+    monkeypatch.setattr(DB, "_collection_ids", no_scans)
+    assert _contents(layout, "7") == ["hello"]
+
+    # Moving to another room moves the key and its locator
+    DB.update("turns", turn["id"], {"room_id": "8"})
+    assert _room_keys(layout.db) == [f"room:8:turn:{turn['id']}"]
+    assert layout.db[f"_loc:turns:{turn['id']}"] == f"room:8:turn:{turn['id']}"
+
+    DB.delete("turns", turn["id"])
+    assert _room_keys(layout.db) == [] and not any(k.startswith("_loc:") for k in layout.db)
+
+
+def test_migration_round_trip(layout, monkeypatch):
+    _seed(layout)
+    moved = migrate_keys.migrate_key_layout(room_scoped=True)
+    assert moved == {"turns": 6, "participants": 1, "spectator_votes": 0}
+    assert not any(key.startswith(("turns:", "participants:")) for key in layout.db)
+    # Rooms themselves keep the flat layout
+    assert any(key.startswith("rooms:") for key in layout.db)
+
+    monkeypatch.setattr(layout, "ROOM_SCOPED_KEYS", True)
+    assert _contents(layout, "1") == ["1.0", "1.1", "1.2"]
+    assert layout.ReplitDB.find_one("participants", {"username": "amy"})["room_id"] == "1"
+
+    assert migrate_keys.migrate_key_layout(room_scoped=False)["turns"] == 6
+    monkeypatch.setattr(layout, "ROOM_SCOPED_KEYS", False)
+    assert _room_keys(layout.db) == [] and not any(k.startswith("_loc:") for k in layout.db)
+    assert _contents(layout, "2") == ["2.0", "2.1", "2.2"]
+
+
+def test_interrupted_migration_can_be_rerun(layout, monkeypatch):
+    _seed(layout)
+    # Crash right after the first turn was written to its new key, before its
+    # flat key was deleted
+    turn = layout.ReplitDB.find_one("turns", {"content": "1.0"})
+    new_key = f"room:1:turn:{turn['id']}"
+    layout.db[new_key] = layout.db[f"turns:{turn['id']}"]
+    layout.db[f"_loc:turns:{turn['id']}"] = new_key
+
+    migrate_keys.migrate_key_layout(room_scoped=True)
+    monkeypatch.setattr(layout, "ROOM_SCOPED_KEYS", True)
+    assert len(_room_keys(layout.db)) == 7
+    assert _contents(layout, "1") == ["1.0", "1.1", "1.2"]
+    # A second run finds nothing left to move
+    assert migrate_keys.migrate_key_layout(room_scoped=True)["turns"] == 0
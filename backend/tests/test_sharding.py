@@ -0,0 +1,161 @@
+"""
+Sharded key-value storage: ring placement, room-pinned listings, bulk
+writes over mixed shards and rebalancing after a shard is added
+"""
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+
+from app.sharding import HashRing, ShardedStore, SQLiteKV, rebalance, shard_key
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _open_worker(paths, start):
+    """Open (and write to) each new shard file within a few ms of the other workers"""
+    try:
+        for path in paths:
+            start.wait()
+            time.sleep(random.random() * 0.003)
+            SQLiteKV(path)[f"opened:{os.getpid()}"] = "1"
+    except Exception:
+        # Release the others rather than leave them waiting out the barrier
+        start.abort()
+        raise
+
+
+def test_appending_a_shard_only_moves_keys_to_it():
+    tokens = [f"turns:{i}" for i in range(5000)]
+    before = HashRing(["a", "b", "c"])
+    after = HashRing(["a", "b", "c", "d"])
+
+    moved = [t for t in tokens if before.shard_for(t) != after.shard_for(t)]
+    assert all(after.shard_for(t) == "d" for t in moved)
+    # Roughly the new shard's share of the keys moves
+    assert 0.1 < len(moved) / len(tokens) < 0.4
+
+
+def test_ring_placement_does_not_depend_on_shard_order():
+    tokens = [f"users:{i}" for i in range(1000)]
+    one, other = HashRing(["a", "b", "c"]), HashRing(["c", "a", "b"])
+    assert [one.shard_for(t) for t in tokens] == [other.shard_for(t) for t in tokens]
+
+
+def test_room_keys_share_one_shard():
+    assert shard_key("room:42:turn:7") == shard_key("room:42:vote:9") == "room:42"
+    assert shard_key("users:5") == "user:5"
+    store = ShardedStore({name: {} for name in ("a", "b", "c", "d")})
+    store.set_bulk({f"room:{room}:turn:{i}": str(i) for room in range(20) for i in range(10)})
+
+    for room in range(20):
+        holders = [name for name, shard in store.shards.items()
+                   if any(key.startswith(f"room:{room}:") for key in shard)]
+        assert holders == [store.shard_of(f"room:{room}:")]
+
+
+def test_room_prefix_listing_reads_one_shard():
+    store = ShardedStore({name: {} for name in ("a", "b", "c")})
+    store.set_bulk({f"room:{room}:turn:{i}": "x" for room in range(10) for i in range(5)})
+    scanned = []
+    for name, shard in store.shards.items():
+        store.shards[name] = _Recording(shard, name, scanned)
+
+    assert sorted(store.prefix("room:3:turn:")) == [f"room:3:turn:{i}" for i in range(5)]
+    assert scanned == [store.shard_of("room:3:")]
+
+    scanned.clear()
+    assert len(store.prefix("room:")) == 50
+    assert sorted(scanned) == ["a", "b", "c"]
+
+
+def test_bulk_writes_and_listings_span_memory_and_sqlite_shards(tmp_path):
+    spec = f"a=memory://,b=sqlite:///{tmp_path / 'b.db'},c=sqlite:///{tmp_path / 'c.db'}"
+    store = ShardedStore.from_setting(spec)
+    values = {f"turns:{i}": f"turn {i}" for i in range(300)}
+    values.update({f"room:{room}:turn:{i}": f"{room}/{i}" for room in range(10) for i in range(10)})
+    store.set_bulk(values)
+
+    assert isinstance(store.shards["b"], SQLiteKV) and store.shared and store.blocking
+    assert all(len(list(shard.keys())) > 0 for shard in store.shards.values())
+    assert sorted(store.prefix("turns:")) == sorted(k for k in values if k.startswith("turns:"))
+    assert all(store.get(key) == value for key, value in values.items())
+
+    del store["turns:7"]
+    assert "turns:7" not in store and store.get("turns:7") is None
+
+    # Another process's view of the SQLite shards sees the same keys
+    reopened = ShardedStore.from_setting(spec.replace("a=memory://", "a=sqlite:///" + str(tmp_path / "a2.db")))
+    on_disk = [k for k in values if store.shard_of(k) != "a" and k != "turns:7"]
+    assert all(reopened.get(key) == values[key] for key in on_disk)
+
+
+def test_rebalance_after_adding_a_shard(tmp_path):
+    shards = {name: SQLiteKV(str(tmp_path / f"{name}.db")) for name in ("a", "b")}
+    values = {f"turns:{i}": f"turn {i}" for i in range(500)}
+    values.update({f"room:{room}:turn:{i}": f"{room}/{i}" for room in range(20) for i in range(5)})
+    ShardedStore(shards).set_bulk(values)
+
+    grown = ShardedStore({**shards, "c": SQLiteKV(str(tmp_path / "c.db"))})
+    moved = rebalance(grown)
+
+    assert moved["a"] + moved["b"] == len(grown.shards["c"].keys()) > 0
+    assert all(grown.get(key) == value for key, value in values.items())
+    for name, shard in grown.shards.items():
+        assert all(grown.shard_of(key) == name for key in shard.keys())
+    assert sum(len(shard.keys()) for shard in grown.shards.values()) == len(values)
+    # Re-running (e.g. after an interruption) has nothing left to move
+    assert sum(rebalance(grown).values()) == 0
+
+
+def test_rebalance_keeps_a_copy_written_to_the_new_shard(tmp_path):
+    old = {"a": {}, "b": {}}
+    ShardedStore(old).set_bulk({f"turns:{i}": "old" for i in range(200)})
+    grown = ShardedStore({**old, "c": {}})
+    key = next(f"turns:{i}" for i in range(200) if grown.shard_of(f"turns:{i}") == "c")
+    grown[key] = "new"  # written through the new shard list before rebalancing
+
+    rebalance(grown)
+    assert grown.get(key) == "new"
+
+
+def test_rebalance_shards_command(tmp_path):
+    urls = {name: f"sqlite:///{tmp_path / name}.db" for name in ("a", "b", "c")}
+    ShardedStore({name: SQLiteKV(urls[name][len("sqlite:///"):]) for name in ("a", "b")}).set_bulk(
+        {f"rooms:{i}": f"room {i}" for i in range(200)})
+
+    spec = ",".join(f"{name}={url}" for name, url in urls.items())
+    env = {**os.environ, "REPLIT_DB_SHARDS": spec}
+    result = subprocess.run([sys.executable, "-m", "app.rebalance_shards"], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+
+    store = ShardedStore.from_setting(spec)
+    assert len(store.shards["c"].keys()) > 0
+    assert all(store.get(f"rooms:{i}") == f"room {i}" for i in range(200))
+
+
+class _Recording:
+    """Shard wrapper recording which shards prefix listings touch"""
+
+    def __init__(self, shard, name, scanned):
+        self.shard, self.name, self.scanned = shard, name, scanned
+
+    def prefix(self, prefix):
+        self.scanned.append(self.name)
+        return [key for key in self.shard if key.startswith(prefix)]
+
+
+def test_workers_can_open_a_new_shard_file_at_once(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    paths = [str(tmp_path / f"shard{i}.db") for i in range(100)]
+    start = context.Barrier(8, timeout=60)
+    processes = [context.Process(target=_open_worker, args=(paths, start)) for _ in range(8)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(120)
+    assert [process.exitcode for process in processes] == [0] * 8
+    assert all(len(SQLiteKV(path).keys()) == 8 for path in paths)
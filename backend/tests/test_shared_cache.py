@@ -0,0 +1,59 @@
+"""
+Shared cache tier: entries and invalidations cross worker processes
+"""
+import multiprocessing
+import os
+import queue
+import time
+
+TIMEOUT_SECONDS = 30
+
+
+def _worker(path: str, role: str, barrier, results):
+    """A worker process with SHARED_CACHE_PATH set, using the app's caches"""
+    os.environ["SHARED_CACHE_PATH"] = path
+    from app.cache import room_cache, invalidate_tag, flush_shared_writes
+
+    if role == "writer":
+        room_cache.set("status_1", {"status": "active"}, tags=["room:1"])
+        flush_shared_writes()
+        barrier.wait()
+        barrier.wait()  # the reader holds the entry in-process
+        invalidate_tag("room:1")
+        return
+
+    barrier.wait()
+    results.put(("read", room_cache.get("status_1"), len(room_cache)))
+    barrier.wait()
+    deadline = time.monotonic() + 10
+    while room_cache.get("status_1") is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    results.put(("after_invalidation", room_cache.get("status_1"), len(room_cache)))
+
+
+def test_invalidate_tag_evicts_entry_in_other_process(tmp_path):
+    path = str(tmp_path / "cache.db")
+    context = multiprocessing.get_context("spawn")
+    barrier, results = context.Barrier(2, timeout=TIMEOUT_SECONDS), context.Queue()
+    processes = [context.Process(target=_worker, args=(path, role, barrier, results))
+                 for role in ("writer", "reader")]
+    for process in processes:
+        process.start()
+    try:
+        messages = {}
+        while len(messages) < 2:
+            kind, *values = results.get(timeout=TIMEOUT_SECONDS)
+            messages[kind] = values
+    except queue.Empty:
+        messages = {}
+    finally:
+        for process in processes:
+            process.join(TIMEOUT_SECONDS)
+            if process.is_alive():
+                process.terminate()
+
+    # The reader found the writer's entry and kept it in-process...
+    assert messages.get("read") == [{"status": "active"}, 1]
+    # ...until the writer's invalidation reached it
+    assert messages.get("after_invalidation") == [None, 0]
+    assert [process.exitcode for process in processes] == [0, 0]
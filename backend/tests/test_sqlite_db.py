@@ -0,0 +1,134 @@
+"""
+SQLite backend: the DB API round trip, atomic updates across processes,
+and migrate_from_kv (re-run after an interrupted migration)
+
+The backend is chosen by DATABASE_URL when app.replit_db is imported, so
+every scenario runs in a spawned process configured through the environment.
+"""
+import multiprocessing
+import os
+
+WORKERS = 4
+INCREMENTS_PER_WORKER = 50
+
+
+def _open(url: str):
+    os.environ["DATABASE_URL"] = url
+    os.environ["VALUE_CHUNK_BYTES"] = "256"
+    from app import replit_db
+    assert replit_db.STORAGE_BACKEND == "sqlite"
+    return replit_db
+
+
+def _round_trip(url: str):
+    replit_db = _open(url)
+    DB = replit_db.DB
+    rooms = [DB.insert("rooms", {"room_code": f"R{i}", "visibility": "public" if i % 2 else "private",
+                                 "topic": f"topic {i}", "max_participants": i}) for i in range(10)]
+    first = rooms[0]["id"]
+    seen = {
+        "get": DB.get("rooms", first)["room_code"],
+        "find": [r["room_code"] for r in DB.find(
+            "rooms", {"visibility": "public"}, sort=[("max_participants", replit_db.DESCENDING)], limit=3)],
+        "projected": DB.find("rooms", {"room_code": "R2"}, fields=["topic"]),
+        "count": DB.count("rooms", {"visibility": "private"}),
+    }
+
+    pages, cursor = [], None
+    while True:
+        page = DB.find_page("rooms", sort=[("max_participants", replit_db.ASCENDING)], limit=4, cursor=cursor)
+        pages.append([r["max_participants"] for r in page["items"]])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    seen["pages"] = pages
+
+    DB.update("rooms", first, {"status": "ongoing"}, expected_version=1)
+    try:
+        DB.update("rooms", first, {"status": "completed"}, expected_version=1)
+        seen["conflict"] = None
+    except replit_db.VersionConflict as e:
+        seen["conflict"] = (e.expected, e.actual)
+    seen["status"] = DB.get("rooms", first)["status"]
+
+    seen["deleted"] = DB.delete("rooms", first), DB.get("rooms", first)
+    return seen
+
+
+def _increment(url: str, user_id: str):
+    DB = _open(url).DB
+    for _ in range(INCREMENTS_PER_WORKER):
+        DB.increment("users", user_id, "xp", 2)
+
+
+def _insert_user(url: str):
+    return _open(url).DB.insert("users", {"username": "amy", "xp": 0})["id"]
+
+
+def _get(url: str, collection: str, id: str):
+    return _open(url).DB.get(collection, id)
+
+
+def _migrate(url: str):
+    replit_db = _open(url)
+    from app.sqlite_db import SQLiteDB, migrate_from_kv
+    kv = replit_db.ReplitDB
+    users = kv.insert_many("users", [{"username": f"u{i}", "xp": i} for i in range(5)])
+    turn = kv.insert("turns", {"room_id": "1", "content": " ".join(["long"] * 200)})
+    # A counter slot written by a worker on a shared store
+    replit_db.db[f"_ctr:users:{users[1]['id']}:xp:12345678"] = "10"
+
+    # Interrupted: only some of the keyspace was copied before the crash
+    partial = {key: value for key, value in replit_db.db.items() if not key.startswith("turns:")}
+    kv.update("users", users[0]["id"], {"username": "renamed"})
+    first = migrate_from_kv(partial)
+    second = migrate_from_kv()
+    return {
+        "first": first,
+        "second": second,
+        "users": sorted((u["username"], u["xp"]) for u in SQLiteDB.find("users", limit=None)),
+        "turn": SQLiteDB.get("turns", turn["id"])["content"] == turn["content"],
+        "next_id": SQLiteDB.insert("users", {"username": "new"})["id"],
+        "migrated_ids": [u["id"] for u in users],
+    }
+
+
+def _in_process(target, *args):
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(target, args)
+
+
+def _url(tmp_path) -> str:
+    return f"sqlite:///{tmp_path / 'oratio.db'}"
+
+
+def test_db_api_round_trip(tmp_path):
+    seen = _in_process(_round_trip, _url(tmp_path))
+    assert seen["get"] == "R0"
+    assert seen["find"] == ["R9", "R7", "R5"]
+    assert seen["projected"] == [{"id": "3", "topic": "topic 2"}]
+    assert seen["count"] == 5
+    assert seen["pages"] == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+    assert seen["conflict"] == (1, 2)
+    assert seen["status"] == "ongoing"
+    assert seen["deleted"] == (True, None)
+
+
+def test_increments_from_several_processes_are_atomic(tmp_path):
+    url = _url(tmp_path)
+    user_id = _in_process(_insert_user, url)
+    with multiprocessing.get_context("spawn").Pool(WORKERS) as pool:
+        pool.starmap(_increment, [(url, user_id)] * WORKERS)
+    assert _in_process(_get, url, "users", user_id)["xp"] == 2 * WORKERS * INCREMENTS_PER_WORKER
+
+
+def test_migration_can_be_rerun_after_an_interruption(tmp_path):
+    seen = _in_process(_migrate, _url(tmp_path))
+    assert seen["first"] == {"users": 5}
+    assert seen["second"] == {"users": 5, "turns": 1}
+    # Upserted by ID: the re-run updated the renamed user instead of adding one,
+    # and counter slots were folded into the documents
+    assert seen["users"] == [("renamed", 0), ("u1", 11), ("u2", 2), ("u3", 3), ("u4", 4)]
+    assert seen["turn"]
+    # New IDs continue after the migrated ones
+    assert int(seen["next_id"]) > max(int(i) for i in seen["migrated_ids"])